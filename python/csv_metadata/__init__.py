@@ -1,2 +1,26 @@
 ##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
 ##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+from .cell_classifier import (
+    classify_number
+    ,number_kind_none
+    ,number_kind_int
+    ,number_kind_float
+    )
+from .table_schema import (
+    TableSchema
+    ,read_table_schema
+    )
+from .profile_table import (
+    profile
+    )
+from .archive_file import (
+    ArchiveFormatError
+    ,read_archive
+    )
+from .typed_rows import (
+    read_typed_table
+    )
+from .table_check import (
+    check_table_rows
+    )
@@ -27,6 +27,22 @@ def decode_delimiter_name(delimiter_name):
         delimiter = ";"
     return delimiter
 
+## Maps a delimiter to the name that decode_delimiter_name maps back to it (e.g. "\t" to "tab"),
+## for writing delimiters where a tab or a comma would be hard to read
+def encode_delimiter_name(delimiter):
+    delimiter_name = delimiter
+    if ("\t" == delimiter):
+        delimiter_name = "tab"
+    elif (" " == delimiter):
+        delimiter_name = "space"
+    elif ("," == delimiter):
+        delimiter_name = "comma"
+    elif ("|" == delimiter):
+        delimiter_name = "pipe"
+    elif (";" == delimiter):
+        delimiter_name = "semicolon"
+    return delimiter_name
+
 def decode_charset_name(in_charset_name):
     out_charset_name = in_charset_name
     if (None != out_charset_name):
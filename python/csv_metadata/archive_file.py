@@ -0,0 +1,254 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Single-file archive format:
+## the table metadata rows, a blank row, the transposed column metadata rows,
+## and then the rows of the primary table (without its header row) with an empty cell prepended.
+
+import codecs
+import csv
+import io
+
+from .parallel_profile import (
+    can_split_table_file
+    ,read_table_header
+    )
+from .table_schema import TableSchema
+from .compressed_input import (
+    open_table_file
+    )
+
+archive_file_ext = ".archive.csv"
+# archives are written (and read) with the csv module's default quote character
+archive_quote_symbol = '"'
+
+
+class ArchiveFormatError(ValueError):
+    """ Raised when the rows of an archive do not have the archive layout.
+    """
+    pass
+
+# size of the buffer used to write data rows to an archive file
+archive_write_buffer_byte_count = 1024*1024
+
+
+def write_archive_head_rows(out_csv, table_meta_row_list, table_schema):
+    """ Write the table metadata and the transposed column metadata of an archive.
+    """
+    for out_row in table_meta_row_list:
+        out_csv.writerow(out_row)
+    out_csv.writerow([])
+    for out_row in table_schema.get_schema_row_list(1):
+        out_csv.writerow(out_row)
+
+
+def copy_archive_data_rows(in_csv, out_csv):
+    """ Copy the data rows of a csv reader to archive rows, each with an empty cell prepended.
+
+        Blank rows (rows with no cells) are copied as blank rows.
+        Returns the number of rows copied.
+    """
+    row_count = 0
+    for in_row in in_csv:
+        if (0 < len(in_row)):
+            out_csv.writerow([None] + in_row)
+        else:
+            out_csv.writerow(in_row)
+        row_count += 1
+    return row_count
+
+
+def can_copy_archive_data_bytes(
+    in_charset_name
+    ,in_delimiter
+    ,in_quote_symbol
+    ,out_charset_name
+    ,out_delimiter
+    ):
+    """ Decide whether data rows can be copied to an archive as bytes (see copy_archive_data_bytes()).
+
+        The input file must also be splittable (see parallel_profile.can_split_table_file()).
+    """
+    if (in_delimiter != out_delimiter
+        or archive_quote_symbol != in_quote_symbol
+    ):
+        return False
+    try:
+        in_codec_name = codecs.lookup(in_charset_name).name
+        out_codec_name = codecs.lookup(out_charset_name).name
+    except LookupError:
+        return False
+    # a BOM signature only comes before the header row, which is not copied
+    return (_remove_sig_suffix(in_codec_name) == _remove_sig_suffix(out_codec_name))
+
+
+def _remove_sig_suffix(codec_name):
+    if (codec_name.endswith("-sig")):
+        return codec_name[:-len("-sig")]
+    return codec_name
+
+
+def copy_archive_data_bytes(
+    in_file
+    ,out_file
+    ,delimiter_byte
+    ,quote_byte
+    ,row_terminator_bytes=b"\n"
+    ):
+    """ Copy the data rows of a binary table file to a binary archive file, prepending an empty cell to each row.
+
+        in_file must be positioned at the start of a row, and its rows must end in LF or CRLF.
+        A delimiter byte is written before each line that starts a row
+        (a line after an even count of quote bytes),
+        and the newline of each line that ends a row is replaced with row_terminator_bytes,
+        as the csv module would write the row;
+        the cells keep their original bytes, including newlines in quoted cells.
+        Blank lines are copied as blank rows.
+        Returns the number of lines copied.
+    """
+    line_count = 0
+    quote_parity = 0
+    line = b""
+    for line in in_file:
+        is_row_start = (0 == quote_parity)
+        quote_parity ^= line.count(quote_byte) & 1
+        line_end_position = len(line)
+        if (0 == quote_parity):
+            if (line.endswith(b"\r\n")):
+                line_end_position -= 2
+            elif (line.endswith(b"\n")):
+                line_end_position -= 1
+        if (is_row_start and 0 < line_end_position):
+            out_file.write(delimiter_byte)
+        if (line_end_position < len(line)):
+            out_file.write(line[:line_end_position])
+            out_file.write(row_terminator_bytes)
+        else:
+            out_file.write(line)
+        line_count += 1
+    if (0 < len(line)
+        and not line.endswith(b"\n")
+    ):
+        out_file.write(row_terminator_bytes)
+    return line_count
+
+
+def write_archive_data(
+    out_file
+    ,table_file_name
+    ,in_charset_name
+    ,in_charset_error_mode
+    ,in_newline
+    ,in_delimiter
+    ,in_quote_symbol
+    ,out_charset_name
+    ,out_charset_error_mode
+    ,out_delimiter
+    ,out_row_terminator
+    ):
+    """ Write the data rows of a table file to a binary archive file.
+
+        Rows are copied as bytes when the table file is splittable
+        and has the same charset, delimiter and quote symbol as the archive;
+        otherwise they are read with the csv module and rewritten in the archive dialect.
+        Returns the number of rows (or lines, when copied as bytes) written.
+    """
+    with open_table_file(table_file_name) as in_file:
+        if (can_split_table_file(table_file_name, in_charset_name, in_newline, in_delimiter, in_quote_symbol)
+            and can_copy_archive_data_bytes(in_charset_name, in_delimiter, in_quote_symbol, out_charset_name, out_delimiter)
+        ):
+            (column_name_list, data_start_offset) = read_table_header(
+                in_file
+                ,in_charset_name
+                ,in_charset_error_mode
+                ,in_newline
+                ,in_delimiter
+                ,in_quote_symbol
+                )
+            if (None == column_name_list):
+                return 0
+            in_file.seek(data_start_offset)
+            return copy_archive_data_bytes(
+                in_file
+                ,out_file
+                ,out_delimiter.encode(out_charset_name)
+                ,in_quote_symbol.encode("ascii")
+                ,out_row_terminator.encode(out_charset_name)
+                )
+        in_text_file = io.TextIOWrapper(
+             in_file
+            ,encoding=in_charset_name
+            ,errors=in_charset_error_mode
+            ,newline=''  # don't translate newline chars
+            )
+        out_text_file = io.TextIOWrapper(
+             out_file
+            ,encoding=out_charset_name
+            ,errors=out_charset_error_mode
+            ,newline=''  # don't translate newline chars
+            )
+        try:
+            in_csv = csv.reader(
+                 in_text_file
+                ,delimiter=in_delimiter
+                ,lineterminator=in_newline
+                ,quotechar=in_quote_symbol
+                )
+            out_csv = csv.writer(
+                 out_text_file
+                ,delimiter=out_delimiter
+                ,lineterminator=out_row_terminator
+                )
+            if (None == next(in_csv, None)):
+                return 0
+            return copy_archive_data_rows(in_csv, out_csv)
+        finally:
+            # leave the files open for their owners
+            out_text_file.flush()
+            out_text_file.detach()
+            in_text_file.detach()
+
+
+def read_archive(in_csv):
+    """ Read the metadata of an archive from a csv reader.
+
+        Only the rows before the first data row are read.
+        Returns a tuple (table_meta_row_list, table_schema, data_row_iter):
+        the table metadata rows (including a ("name", "value") header row if the archive has one),
+        a TableSchema read from the transposed column metadata,
+        and a generator of the data rows of the primary table.
+        The data rows are the lists made by the csv reader,
+        with their leading empty cell deleted in place.
+        Raises ArchiveFormatError if the transposed column metadata header row is missing.
+    """
+    end_row = None
+    table_meta_row_list = list()
+    in_row = next(in_csv, end_row)
+    while (end_row != in_row and 0 < len(in_row)):
+        table_meta_row_list.append(in_row)
+        in_row = next(in_csv, end_row)
+    # optional blank lines
+    while (end_row != in_row and 0 == len(in_row)):
+        in_row = next(in_csv, end_row)
+    if (end_row == in_row or "" != in_row[0]):
+        raise ArchiveFormatError("missing column metadata header row")
+    table_schema = TableSchema(in_row[1:])
+    in_row = next(in_csv, end_row)
+    # metafield rows start with a metafield name, data rows start with an empty cell
+    while (end_row != in_row
+        and (0 == len(in_row) or "" != in_row[0])
+    ):
+        if (0 < len(in_row)):
+            table_schema.add_metafield(in_row[0], in_row[1:])
+        in_row = next(in_csv, end_row)
+    return (table_meta_row_list, table_schema, _iter_archive_data_rows(in_row, in_csv))
+
+
+def _iter_archive_data_rows(first_row, in_csv):
+    end_row = None
+    in_row = first_row
+    while (end_row != in_row):
+        if (0 < len(in_row)):
+            del in_row[0]
+        yield in_row
+        in_row = next(in_csv, end_row)
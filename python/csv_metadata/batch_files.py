@@ -0,0 +1,101 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Helpers for tools that process many files in one run:
+## finding the files named by directories and glob patterns,
+## deciding whether an output file is up to date,
+## and running one task per file with a pool of worker processes.
+
+import concurrent.futures
+import glob
+import os
+
+_glob_char_list = ("*", "?", "[")
+
+
+def is_batch_path(path):
+    """ Decide whether a path names several files (it is a directory or a glob pattern).
+    """
+    if (os.path.isdir(path)):
+        return True
+    for glob_char in _glob_char_list:
+        if (glob_char in path):
+            return True
+    return False
+
+
+def find_batch_file_names(path_list, is_batch_file_name):
+    """ List the files named by a list of file names, directories and glob patterns.
+
+        Directories are searched recursively, and "**" in a glob pattern matches any subdirectory.
+        Files found in directories or by glob patterns are only listed
+        if is_batch_file_name(file_name) is True;
+        file names that are not patterns are always listed.
+        Each file is listed once, in the order found.
+    """
+    file_name_list = list()
+    file_name_set = set()
+    for path in path_list:
+        found_file_name_list = None
+        if (os.path.isdir(path)):
+            found_file_name_list = list()
+            for (dir_path, dir_name_list, dir_file_name_list) in os.walk(path):
+                dir_name_list.sort()
+                for file_name in sorted(dir_file_name_list):
+                    found_file_name_list.append(os.path.join(dir_path, file_name))
+        elif (is_batch_path(path)):
+            found_file_name_list = sorted(glob.glob(path, recursive=True))
+        if (None == found_file_name_list):
+            found_file_name_list = [path]
+        else:
+            found_file_name_list = [
+                file_name for file_name in found_file_name_list
+                if (os.path.isfile(file_name) and is_batch_file_name(file_name))
+                ]
+        for file_name in found_file_name_list:
+            if (file_name not in file_name_set):
+                file_name_set.add(file_name)
+                file_name_list.append(file_name)
+    return file_name_list
+
+
+def is_file_up_to_date(target_file_name, source_file_name):
+    """ Decide whether a target file exists and is not older than its source file.
+    """
+    try:
+        target_mtime_ns = os.stat(target_file_name).st_mtime_ns
+        source_mtime_ns = os.stat(source_file_name).st_mtime_ns
+    except OSError:
+        return False
+    return (target_mtime_ns >= source_mtime_ns)
+
+
+def run_batch_tasks(task_function, task_arg_tuple_list, job_count):
+    """ Call task_function(*task_arg_tuple) for each tuple in a list and generate the results.
+
+        With job_count worker processes (or in this process if job_count is 1),
+        tasks are started in list order and results are generated as tasks finish.
+        Each generated item is a tuple (task_arg_tuple, result, exception),
+        where exception is None if the task returned normally.
+    """
+    if (1 >= job_count
+        or 1 >= len(task_arg_tuple_list)
+    ):
+        for task_arg_tuple in task_arg_tuple_list:
+            try:
+                yield (task_arg_tuple, task_function(*task_arg_tuple), None)
+            except Exception as e:
+                yield (task_arg_tuple, None, e)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=job_count) as executor:
+        future_dict = dict()
+        for task_arg_tuple in task_arg_tuple_list:
+            future = executor.submit(task_function, *task_arg_tuple)
+            future_dict[future] = task_arg_tuple
+        for future in concurrent.futures.as_completed(future_dict):
+            task_arg_tuple = future_dict[future]
+            e = future.exception()
+            if (None == e):
+                yield (task_arg_tuple, future.result(), None)
+            else:
+                yield (task_arg_tuple, None, e)
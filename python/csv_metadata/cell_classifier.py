@@ -0,0 +1,128 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Lexical classification of CSV cell values as numbers.
+## A single regular expression pass decides whether python's int() and float()
+## would accept a cell and what "decimal shape" the cell has,
+## so that non-numeric text never has to go through a failed int()/float() call.
+
+import re
+
+number_kind_none = 0
+number_kind_int = 1    # int(s) and float(s) would both succeed
+number_kind_float = 2  # float(s) would succeed, int(s) would not
+
+# plain decimals are by far the most common numbers, so they are matched first
+_decimal_regex = re.compile(r"\s*([-+])?(\d+)(?:\.(\d+))?\s*")
+# digit runs may contain single underscores between digits, as python literals do
+_digit_part = r"\d(?:_?\d)*"
+_number_regex = re.compile(
+    r"\s*([-+])?"
+    r"(?:(" + _digit_part + r")(\.(" + _digit_part + r")?)?|\.(" + _digit_part + r"))"
+    r"([eE][-+]?" + _digit_part + r")?\s*"
+    )
+_float_word_set = frozenset(("nan", "inf", "infinity"))
+_float_word_len_max = len("+infinity")
+
+# the same patterns for ASCII bytes, where \s and \d match the same characters as int() and float() do
+_decimal_bytes_regex = re.compile(_decimal_regex.pattern.encode("ascii"))
+_number_bytes_regex = re.compile(_number_regex.pattern.encode("ascii"))
+_float_word_bytes_set = frozenset(float_word.encode("ascii") for float_word in _float_word_set)
+_zero_digit_byte = ord("0")
+
+
+def classify_number(cell_value):
+    """ Classify a cell value as an integer, a float, or not a number.
+
+        cell_value may also be a bytes object with only ASCII characters
+        (see classify_number_bytes).
+
+        Returns a tuple (number_kind, sign_char, int_digit_count, frac_digit_count, has_leading_zero).
+
+        number_kind is one of number_kind_none, number_kind_int, number_kind_float
+        and agrees with whether int(cell_value) and float(cell_value) would succeed.
+
+        The remaining items describe the "decimal shape" of the cell:
+        an optional sign, integer digits, and optional fraction digits (e.g. "-12.50"),
+        surrounded by optional whitespace.
+        They are None when the cell does not have that shape
+        (e.g. "1e5", "1_000", ".5", "nan" are floats but not decimal-shaped).
+        has_leading_zero is True for unsigned multi-digit values that start with a '0' digit.
+    """
+    if (bytes is type(cell_value)):
+        return classify_number_bytes(cell_value)
+    if (cell_value.isdecimal()):
+        int_digit_count = len(cell_value)
+        has_leading_zero = (1 < int_digit_count and '0' == cell_value[0])
+        return (number_kind_int, None, int_digit_count, 0, has_leading_zero)
+    decimal_match = _decimal_regex.fullmatch(cell_value)
+    if (None != decimal_match):
+        (sign_char, int_chars, frac_chars) = decimal_match.groups()
+        int_digit_count = len(int_chars)
+        has_leading_zero = (
+            None == sign_char
+            and 1 < int_digit_count
+            and '0' == int_chars[0]
+            )
+        if (None == frac_chars):
+            return (number_kind_int, sign_char, int_digit_count, 0, has_leading_zero)
+        return (number_kind_float, sign_char, int_digit_count, len(frac_chars), has_leading_zero)
+    number_match = _number_regex.fullmatch(cell_value)
+    if (None == number_match):
+        float_word = cell_value.strip()
+        if (len(float_word) <= _float_word_len_max):
+            float_word = float_word.lower()
+            if (float_word[:1] in ("+", "-")):
+                float_word = float_word[1:]
+            if (float_word in _float_word_set):
+                return (number_kind_float, None, None, None, None)
+        return (number_kind_none, None, None, None, None)
+    # a number, but not written as a plain decimal (e.g. "1e5", "1_000", "1.", ".5")
+    (int_chars, point_chars, exponent_chars) = number_match.group(2, 3, 6)
+    if (None != int_chars
+        and None == point_chars
+        and None == exponent_chars
+    ):
+        return (number_kind_int, None, None, None, None)
+    return (number_kind_float, None, None, None, None)
+
+
+def classify_number_bytes(cell_bytes):
+    """ Classify a cell value given as ASCII bytes, like classify_number() does for a string.
+    """
+    if (cell_bytes.isdigit()):
+        int_digit_count = len(cell_bytes)
+        has_leading_zero = (1 < int_digit_count and _zero_digit_byte == cell_bytes[0])
+        return (number_kind_int, None, int_digit_count, 0, has_leading_zero)
+    decimal_match = _decimal_bytes_regex.fullmatch(cell_bytes)
+    if (None != decimal_match):
+        (sign_bytes, int_bytes, frac_bytes) = decimal_match.groups()
+        int_digit_count = len(int_bytes)
+        has_leading_zero = (
+            None == sign_bytes
+            and 1 < int_digit_count
+            and _zero_digit_byte == int_bytes[0]
+            )
+        sign_char = None
+        if (None != sign_bytes):
+            sign_char = sign_bytes.decode("ascii")
+        if (None == frac_bytes):
+            return (number_kind_int, sign_char, int_digit_count, 0, has_leading_zero)
+        return (number_kind_float, sign_char, int_digit_count, len(frac_bytes), has_leading_zero)
+    number_match = _number_bytes_regex.fullmatch(cell_bytes)
+    if (None == number_match):
+        float_word = cell_bytes.strip()
+        if (len(float_word) <= _float_word_len_max):
+            float_word = float_word.lower()
+            if (float_word[:1] in (b"+", b"-")):
+                float_word = float_word[1:]
+            if (float_word in _float_word_bytes_set):
+                return (number_kind_float, None, None, None, None)
+        return (number_kind_none, None, None, None, None)
+    (int_bytes, point_bytes, exponent_bytes) = number_match.group(2, 3, 6)
+    if (None != int_bytes
+        and None == point_bytes
+        and None == exponent_bytes
+    ):
+        return (number_kind_int, None, None, None, None)
+    return (number_kind_float, None, None, None, None)
@@ -0,0 +1,183 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Charset detection: choosing the text encoding of a table file before it is read,
+## from a byte prefix of the file and blocks sampled from across the rest of it.
+## A byte order mark decides at once; otherwise the sample is tried as UTF-8,
+## and text that is not UTF-8 is taken as Windows-1252 (or Latin-1 if it has bytes that Windows-1252 lacks).
+## The same sample checks a charset given by the user,
+## so that a wrong charset fails before the scan starts, rather than gigabytes into it.
+
+import codecs
+import os
+
+from .compressed_input import (
+    detect_file_compression_name
+    ,read_compressed_file_prefix
+    )
+
+# charset name that asks for detection
+charset_name_auto = "auto"
+# charset used when nothing better is known (it reads UTF-8 with or without a byte order mark)
+charset_name_default = "utf_8_sig"
+
+sample_prefix_byte_count = 64*1024
+sample_block_count = 16
+sample_block_byte_count = 4*1024
+
+# longer marks first, since the UTF-32 little-endian mark starts with the UTF-16 one
+_bom_charset_name_list = (
+     (codecs.BOM_UTF32_LE, "utf_32")
+    ,(codecs.BOM_UTF32_BE, "utf_32")
+    ,(codecs.BOM_UTF8, "utf_8_sig")
+    ,(codecs.BOM_UTF16_LE, "utf_16")
+    ,(codecs.BOM_UTF16_BE, "utf_16")
+    )
+# bytes that have no character in Windows-1252 (but are C1 control characters in Latin-1)
+_cp1252_undefined_byte_list = (b"\x81", b"\x8d", b"\x8f", b"\x90", b"\x9d")
+# most bytes skipped to find the start of a character in a sampled block
+_char_start_byte_skip_count_max = 3
+
+
+class CharsetMismatchError(ValueError):
+    """ Raised when a sample of a file can't be decoded with its charset.
+    """
+    pass
+
+
+def read_sample_blocks(in_file):
+    """ Read a prefix of a seekable binary file and blocks at evenly spaced offsets after it.
+
+        Returns a list of (byte_offset, block_bytes) tuples, starting with the prefix at offset 0.
+    """
+    in_file.seek(0)
+    prefix_bytes = in_file.read(sample_prefix_byte_count)
+    sample_block_list = [(0, prefix_bytes)]
+    file_byte_count = os.fstat(in_file.fileno()).st_size
+    rest_byte_count = file_byte_count - len(prefix_bytes)
+    if (len(prefix_bytes) < sample_prefix_byte_count
+        or rest_byte_count <= 0
+    ):
+        return sample_block_list
+    # the last block ends the file (where rows are appended)
+    block_count = min(sample_block_count, 1 + rest_byte_count // sample_block_byte_count)
+    block_spacing_byte_count = 0
+    if (1 < block_count):
+        block_spacing_byte_count = (rest_byte_count - sample_block_byte_count) // (block_count - 1)
+    for block_position in range(block_count):
+        block_offset = len(prefix_bytes) + block_position * block_spacing_byte_count
+        if (block_position + 1 == block_count):
+            block_offset = max(len(prefix_bytes), file_byte_count - sample_block_byte_count)
+        in_file.seek(block_offset)
+        sample_block_list.append((block_offset, in_file.read(sample_block_byte_count)))
+    in_file.seek(0)
+    return sample_block_list
+
+
+def find_charset_error(sample_block_list, charset_name, file_byte_count=None):
+    """ Find the first byte offset of a sample that can't be decoded with a charset.
+
+        Returns a tuple (byte_offset, reason), or None if every sampled block decodes.
+        Blocks after the prefix may start inside a character,
+        so they are decoded from each of their first few bytes, and only fail if every start fails.
+        A block may also end inside a character, unless it ends the file (at file_byte_count).
+    """
+    prefix_decoder_class = codecs.getincrementaldecoder(charset_name)
+    # blocks after the prefix have no byte order mark, so they need the byte order of the prefix
+    block_decoder_class = codecs.getincrementaldecoder(_get_block_charset_name(charset_name, sample_block_list[0][1]))
+    for (block_offset, block_bytes) in sample_block_list:
+        decoder_class = prefix_decoder_class
+        if (0 < block_offset):
+            decoder_class = block_decoder_class
+        is_final = (None != file_byte_count and block_offset + len(block_bytes) >= file_byte_count)
+        skip_count_max = 0
+        if (0 < block_offset):
+            skip_count_max = _char_start_byte_skip_count_max
+        block_error = None
+        for skip_count in range(skip_count_max + 1):
+            try:
+                decoder_class('strict').decode(block_bytes[skip_count:], is_final)
+            except UnicodeDecodeError as e:
+                if (None == block_error):
+                    block_error = (block_offset + skip_count + e.start, e.reason)
+                continue
+            block_error = None
+            break
+        if (None != block_error):
+            return block_error
+    return None
+
+
+def _get_block_charset_name(charset_name, prefix_bytes):
+    """ Get the charset that decodes the blocks after the prefix (the byte order of a UTF-16 or UTF-32 charset).
+    """
+    codec_name = codecs.lookup(charset_name).name
+    if (codec_name in ("utf-16", "utf-32")):
+        if (prefix_bytes.startswith((codecs.BOM_UTF16_BE, codecs.BOM_UTF32_BE))):
+            return codec_name + "-be"
+        return codec_name + "-le"
+    return charset_name
+
+
+def detect_charset_name(sample_block_list, file_byte_count=None):
+    """ Choose the python codec name of a file from its sampled blocks (see read_sample_blocks()).
+    """
+    prefix_bytes = sample_block_list[0][1]
+    for (bom_bytes, charset_name) in _bom_charset_name_list:
+        if (prefix_bytes.startswith(bom_bytes)):
+            return charset_name
+    # mostly-ASCII text in UTF-16 has a zero byte in every other position
+    nul_byte_count = prefix_bytes.count(b"\x00")
+    if (4 <= len(prefix_bytes)
+        and nul_byte_count * 4 > len(prefix_bytes)
+    ):
+        if (prefix_bytes[1::2].count(b"\x00") > prefix_bytes[0::2].count(b"\x00")):
+            return "utf_16_le"
+        return "utf_16_be"
+    if (None == find_charset_error(sample_block_list, "utf_8", file_byte_count)):
+        return charset_name_default
+    for (block_offset, block_bytes) in sample_block_list:
+        for undefined_byte in _cp1252_undefined_byte_list:
+            if (undefined_byte in block_bytes):
+                return "latin_1"
+    return "cp1252"
+
+
+def resolve_file_charset_name(file_name, charset_name, charset_error_mode='strict'):
+    """ Get the charset of a table file, detecting it if charset_name is charset_name_auto.
+
+        With the 'strict' error mode, the sampled blocks must decode with the charset
+        (given or detected), or CharsetMismatchError is raised.
+        Without a file name (e.g. for stdin), or for a file that isn't a regular file,
+        charset_name_auto becomes charset_name_default and nothing is checked.
+        Only the prefix of a compressed file is sampled (see compressed_input).
+    """
+    if (None == file_name
+        or not os.path.isfile(file_name)
+    ):
+        if (charset_name_auto == charset_name):
+            return charset_name_default
+        return charset_name
+    compression_name = detect_file_compression_name(file_name)
+    if (None != compression_name):
+        prefix_bytes = read_compressed_file_prefix(file_name, compression_name, sample_prefix_byte_count)
+        sample_block_list = [(0, prefix_bytes)]
+        file_byte_count = None
+        if (len(prefix_bytes) < sample_prefix_byte_count):
+            file_byte_count = len(prefix_bytes)
+    else:
+        with open(file_name, mode='rb') as in_file:
+            sample_block_list = read_sample_blocks(in_file)
+            file_byte_count = os.fstat(in_file.fileno()).st_size
+    if (charset_name_auto == charset_name):
+        charset_name = detect_charset_name(sample_block_list, file_byte_count)
+    if ('strict' == charset_error_mode):
+        charset_error = find_charset_error(sample_block_list, charset_name, file_byte_count)
+        if (None != charset_error):
+            (byte_offset, reason) = charset_error
+            raise CharsetMismatchError("not {} text at byte {} ({}), try another -E charset".format(
+                charset_name
+                ,byte_offset
+                ,reason
+                ))
+    return charset_name
@@ -0,0 +1,919 @@
+##  Copyright (c) 2017-2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Column statistics accumulator used by csv-mkmeta to infer column datatypes.
+
+import collections
+import itertools
+import math
+import operator
+import struct
+
+from .cell_classifier import (
+    classify_number
+    ,number_kind_none
+    ,number_kind_int
+    )
+from .key_hash_set import (
+    KeyHashSet
+    )
+from .column_sketch import (
+    DistinctSketch
+    ,TopValueSketch
+    ,get_sketch_value_list
+    ,QuantileSketch
+    ,SmallValueSet
+    ,parse_distinct_sketch
+    ,parse_top_value_sketch
+    ,parse_quantile_sketch
+    ,parse_small_value_set
+    )
+from .time_format import (
+    TimeFormatSet
+    ,get_column_time_format_list
+    ,parse_time_format_set
+    )
+from .typed_rows import (
+    as_bool
+    )
+
+column_type_name_str = "varchar"
+column_type_name_fixed_char = "char"
+column_type_name_int = "integer"
+column_type_name_float = "float"
+column_type_name_decimal = "decimal"
+column_type_name_time = "time"
+column_type_name_bool = "boolean"
+column_type_name_default = column_type_name_str
+
+# Statistics fields that are saved in partial-profile files,
+#  with the function that parses a saved value and the value used when nothing is saved.
+column_stat_field_list = (
+     ("null_cell_value_count", int, 0)
+    ,("not_null_cell_value_count", int, 0)
+    ,("blank_cell_count", int, 0)
+    ,("char_count_max", int, None)
+    ,("char_count_min", int, None)
+    ,("not_int_count", int, 0)
+    ,("int_max", int, None)
+    ,("int_min", int, None)
+    ,("not_float_count", int, 0)
+    ,("float_max", float, None)
+    ,("float_min", float, None)
+    ,("float_count", int, 0)
+    ,("float_mean", float, None)
+    ,("float_square_deviation_sum", float, None)
+    ,("float_notation_count", int, 0)
+    ,("not_float32_count", int, 0)
+    ,("decimal_precision_digit_count_max", int, None)
+    ,("decimal_precision_digit_count_min", int, None)
+    ,("decimal_scale_digit_count_max", int, None)
+    ,("decimal_scale_digit_count_min", int, None)
+    ,("leading_zero_count", int, 0)
+    ,("not_key_count", int, 0)
+    ,("distinct_sketch", parse_distinct_sketch, None)
+    ,("top_value_sketch", parse_top_value_sketch, None)
+    ,("quantile_sketch", parse_quantile_sketch, None)
+    ,("time_format_set", parse_time_format_set, None)
+    ,("small_value_set", parse_small_value_set, None)
+    )
+
+# number of cell values collected before they are counted into the sketches
+sketch_block_value_count = 4096
+# number of numbers collected before they are added to the float statistics
+number_block_value_count = 4096
+# integer sizes (in bytes) that finalize() chooses from
+int_byte_count_list = (1, 2, 4, 8)
+# a 4-byte float holds any number of up to 6 significant digits within its range
+float32_digit_count_max = 6
+# a column of few values is a code list if its values are repeated this many times on average
+code_list_value_repeat_count_min = 2
+_float32_max = 3.4028234663852886e+38
+
+
+class ColumnProfile(object):
+    """ Accumulates statistics about the cell values of one table column.
+
+        Call update() once per cell (in row order) or once per distinct value,
+        then call finalize() to decide the column datatype name and size.
+        Cell values are strings, or bytes objects that only have ASCII characters.
+
+        While key_value_set is not None, the cell values are collected in it (see key_hash_set.KeyHashSet)
+        until an empty or repeated cell is found (counted in not_key_count),
+        so that finalize() can decide whether the column is unique (a candidate key).
+        Profiles that don't see every row of a table should call stop_key_tracking().
+
+        After start_sketches(), the not-null cell values are also summarized
+        in a DistinctSketch and a TopValueSketch (see column_sketch),
+        which take the same memory however many rows there are.
+        Cell values are collected in blocks of sketch_block_value_count before they are counted.
+
+        The numbers of a column are collected as floats in blocks of number_block_value_count
+        (see flush_number_values()), which give the float range, the count, mean
+        and sum of squared deviations of the finite numbers (combined block by block, as in Welford's method),
+        and with sketches, a QuantileSketch of them.
+        Numbers that are not written as plain decimals are checked one at a time:
+        float_notation_count counts those with an exponent, or nan and inf,
+        and not_float32_count those that a 4-byte float doesn't hold.
+
+        While small_value_set is not None, it counts the distinct values of the column,
+        until there are too many of them (see column_sketch.SmallValueSet),
+        which is how finalize() finds boolean columns, and get_code_list() finds code list columns.
+        Until then, the statistics that depend only on the value (character counts, numbers, time formats)
+        are updated once per distinct value, by flush_small_values(),
+        which finalize(), merge() and get_stat_value_list() call first.
+
+        While time_format_set is not None, the cell values are checked against the time formats
+        that all the values before them agreed with (see time_format.TimeFormatSet),
+        until no format is left.
+
+        Once the values seen so far guarantee that the column is a varchar,
+        the column is "settled":
+        later cells only update the null counts and the character counts,
+        so the numeric statistics of a settled column are incomplete.
+    """
+    __slots__ = (
+         "column_name"
+        ,"null_cell_value_count"
+        ,"not_null_cell_value_count"
+        ,"blank_cell_count"
+        ,"char_count_max"
+        ,"char_count_min"
+        ,"not_int_count"
+        ,"int_max"
+        ,"int_min"
+        ,"not_float_count"
+        ,"float_max"
+        ,"float_min"
+        ,"float_count"
+        ,"float_mean"
+        ,"float_square_deviation_sum"
+        ,"float_notation_count"
+        ,"not_float32_count"
+        ,"number_value_list"
+        ,"decimal_precision_digit_count_max"
+        ,"decimal_precision_digit_count_min"
+        ,"decimal_scale_digit_count_max"
+        ,"decimal_scale_digit_count_min"
+        ,"leading_zero_count"
+        ,"not_key_count"
+        ,"key_value_set"
+        ,"distinct_sketch"
+        ,"top_value_sketch"
+        ,"quantile_sketch"
+        ,"sketch_value_list"
+        ,"small_value_set"
+        ,"time_format_set"
+        ,"is_settled"
+        ,"data_type_name"
+        ,"data_type_size"
+        ,"data_type_format"
+        ,"is_unique"
+        )
+
+    def __init__(self, column_name):
+        self.column_name = column_name
+        self.null_cell_value_count = 0
+        self.not_null_cell_value_count = 0
+        self.blank_cell_count = 0
+        self.char_count_max = None
+        self.char_count_min = None
+        self.not_int_count = 0
+        self.int_max = None
+        self.int_min = None
+        self.not_float_count = 0
+        self.float_max = None
+        self.float_min = None
+        self.float_count = 0
+        self.float_mean = None
+        self.float_square_deviation_sum = None
+        self.float_notation_count = 0
+        self.not_float32_count = 0
+        self.number_value_list = list()
+        self.decimal_precision_digit_count_max = None
+        self.decimal_precision_digit_count_min = None
+        self.decimal_scale_digit_count_max = None
+        self.decimal_scale_digit_count_min = None
+        self.leading_zero_count = 0
+        self.not_key_count = 0
+        self.key_value_set = KeyHashSet()
+        self.distinct_sketch = None
+        self.top_value_sketch = None
+        self.quantile_sketch = None
+        self.sketch_value_list = None
+        self.small_value_set = SmallValueSet()
+        self.time_format_set = TimeFormatSet(get_column_time_format_list(column_name))
+        self.is_settled = False
+        self.data_type_name = None
+        self.data_type_size = None
+        self.data_type_format = None
+        self.is_unique = False
+
+    def update(self, cell_value, cell_count=1):
+        """ Accumulate statistics from cell_count cells that have the same value.
+        """
+        # treat empty strings as NULL since the CSV reader isn't smart about quoted cells
+        if (not cell_value):
+            self.null_cell_value_count += cell_count
+            if (None != self.key_value_set):
+                self._reject_key(cell_count)
+            return
+        self.not_null_cell_value_count += cell_count
+        if (None != self.key_value_set):
+            key_value = cell_value
+            if (bytes is type(cell_value)):
+                # the same value can come as str in a row that has other non-ASCII cells
+                key_value = cell_value.decode("ascii")
+            if (1 < cell_count
+                or not self.key_value_set.add(key_value)
+            ):
+                self._reject_key(cell_count)
+        sketch_value_list = self.sketch_value_list
+        if (None != sketch_value_list):
+            if (1 == cell_count):
+                sketch_value_list.append(cell_value)
+            else:
+                sketch_value_list.extend(itertools.repeat(cell_value, cell_count))
+            if (sketch_block_value_count <= len(sketch_value_list)):
+                self.flush_sketch_values()
+        small_value_set = self.small_value_set
+        if (None != small_value_set):
+            value_count_dict = small_value_set.value_count_dict
+            if (cell_value in value_count_dict):
+                # the value statistics are updated later by flush_small_values()
+                value_count_dict[cell_value] += cell_count
+                return
+            if (small_value_set.add(cell_value, cell_count)):
+                return
+            # one value too many: count the values so far, and then this one, as values of a large column
+            self.flush_small_values()
+            self.small_value_set = None
+        self._update_value_statistics(cell_value, cell_count)
+
+    def _update_value_statistics(self, cell_value, cell_count):
+        """ Accumulate the statistics that depend only on a cell value (all but the null, key and sketch statistics).
+        """
+        cell_char_len = len(cell_value)
+        if (not cell_value.strip()):
+            self.blank_cell_count += cell_count
+        if (None == self.char_count_max):
+            self.char_count_max = cell_char_len
+            self.char_count_min = cell_char_len
+        elif (self.char_count_max < cell_char_len):
+            self.char_count_max = cell_char_len
+        elif (self.char_count_min > cell_char_len):
+            self.char_count_min = cell_char_len
+        if (self.is_settled):
+            return
+        time_format_set = self.time_format_set
+        if (None != time_format_set):
+            if (not time_format_set.update(cell_value)):
+                self.time_format_set = None
+            elif (not time_format_set.has_number_format):
+                # the value has separators (e.g. "2018-01-05"), so it is not a number
+                self.not_int_count += cell_count
+                self.not_float_count += cell_count
+                return
+        self.update_number_statistics(cell_value, cell_count)
+
+    def update_number_statistics(self, cell_value, cell_count=1):
+        """ Accumulate the number statistics of cell_count cells that have the same (not empty) value,
+            whose character counts and time formats are already counted.
+        """
+        cell_value_float = self.count_number_value(cell_value, cell_count)
+        if (None == cell_value_float):
+            return
+        number_value_list = self.number_value_list
+        if (1 == cell_count):
+            number_value_list.append(cell_value_float)
+        else:
+            number_value_list.extend(itertools.repeat(cell_value_float, cell_count))
+        if (number_block_value_count <= len(number_value_list)):
+            self.flush_number_values()
+
+    def count_number_value(self, cell_value, cell_count=1):
+        """ Accumulate the number statistics of cell_count cells that have the same (not empty) value,
+            except for the float value itself, which is returned (or None if the value is not a number)
+            for the caller to add to number_value_list.
+        """
+        (number_kind, sign_char, int_digit_count, frac_digit_count, has_leading_zero) = classify_number(cell_value)
+        if (number_kind_none == number_kind):
+            self.not_int_count += cell_count
+            self.not_float_count += cell_count
+            self.is_settled = self._can_settle()
+            return None
+
+        cell_value_int = None
+        if (number_kind_int == number_kind):
+            # int() can still refuse very long digit strings
+            try:
+                cell_value_int = int(cell_value)
+            except ValueError:
+                pass
+        if (None == cell_value_int):
+            self.not_int_count += cell_count
+            # columns of non-integer numbers are not chosen as keys (see table_schema.get_pkey_value_list())
+            if (None != self.key_value_set):
+                self.stop_key_tracking()
+        elif (None == self.int_max):
+            self.int_max = cell_value_int
+            self.int_min = cell_value_int
+        elif (self.int_max < cell_value_int):
+            self.int_max = cell_value_int
+        elif (self.int_min > cell_value_int):
+            self.int_min = cell_value_int
+
+        cell_value_float = float(cell_value)
+        # try to guess decimal precision
+        if (None != int_digit_count):
+            # TODO look for thousands separators
+            self._update_decimal_digit_counts(
+                 int_digit_count + frac_digit_count
+                ,frac_digit_count
+                )
+
+            # check for a leading zero, this will help us distinguish code number strings from actual numbers
+            if (has_leading_zero):
+                self.leading_zero_count += cell_count
+                self.is_settled = self._can_settle()
+        else:
+            self._update_float_notation(cell_value, cell_value_float, cell_count)
+        return cell_value_float
+
+    def update_cells(self, cell_value_list):
+        """ Accumulate the statistics of a block of cells (str values, in row order)
+            that don't depend on each value on its own: the null counts, key values, sketches and small value set.
+
+            Returns the list of not-null cell values whose value statistics are still to be counted
+            (with update_char_counts(), update_time_formats(), count_number_value() for the values
+            that are not plain decimals, and then update_decimal_statistics()),
+            which is empty while the values fit in small_value_set.
+            Together, these give the same datatype as calling update() for each cell.
+        """
+        value_list = list(filter(None, cell_value_list))
+        self.null_cell_value_count += len(cell_value_list) - len(value_list)
+        self.not_null_cell_value_count += len(value_list)
+        if (None != self.key_value_set):
+            key_value_block_set = set(value_list)
+            # an empty cell or a value repeated in the block, or one that repeats an earlier value
+            if (len(key_value_block_set) < len(cell_value_list)
+                or not self.key_value_set.update(key_value_block_set)
+            ):
+                self._reject_key(1)
+        if (None != self.sketch_value_list):
+            # flushed after the same values as update() flushes them, for the same sketches
+            value_position = 0
+            while (value_position < len(value_list)):
+                block_value_count = sketch_block_value_count - len(self.sketch_value_list)
+                self.sketch_value_list.extend(value_list[value_position:value_position + block_value_count])
+                value_position += block_value_count
+                if (sketch_block_value_count <= len(self.sketch_value_list)):
+                    self.flush_sketch_values()
+        small_value_set = self.small_value_set
+        if (None != small_value_set and 0 < len(value_list)):
+            block_value_count_dict = collections.Counter(value_list)
+            new_value_count = len(block_value_count_dict.keys() - small_value_set.value_count_dict.keys())
+            if (len(small_value_set.value_count_dict) + new_value_count <= small_value_set.value_count_max):
+                # the value statistics are updated later by flush_small_values()
+                for (cell_value, cell_count) in block_value_count_dict.items():
+                    small_value_set.add(cell_value, cell_count)
+                return list()
+            self.flush_small_values()
+            self.small_value_set = None
+        return value_list
+
+    def update_char_counts(self, char_count_min, char_count_max, blank_cell_count):
+        """ Accumulate the character counts of a block of not-null cells (see update_cells()).
+        """
+        self.blank_cell_count += blank_cell_count
+        self.char_count_max = _max_or_none(self.char_count_max, char_count_max)
+        self.char_count_min = _min_or_none(self.char_count_min, char_count_min)
+
+    def update_time_formats(self, cell_value_list):
+        """ Check a block of not-null cell values against the time formats (see update_cells()).
+
+            Returns True if the values are still to be counted in the number statistics,
+            or False if they agree with time formats that no number has, and so were counted as not numbers.
+        """
+        time_format_set = self.time_format_set
+        if (None == time_format_set):
+            return True
+        if (not time_format_set.update_values(cell_value_list)):
+            self.time_format_set = None
+            return True
+        if (time_format_set.has_number_format):
+            return True
+        self.not_int_count += len(cell_value_list)
+        self.not_float_count += len(cell_value_list)
+        return False
+
+    def update_decimal_statistics(
+        self
+        ,not_number_count
+        ,int_min
+        ,int_max
+        ,fraction_count
+        ,float_value_list
+        ,decimal_precision_digit_count_min
+        ,decimal_precision_digit_count_max
+        ,decimal_scale_digit_count_min
+        ,decimal_scale_digit_count_max
+        ,leading_zero_count
+        ):
+        """ Accumulate the number statistics of a block of cells (see update_cells()):
+            not_number_count cells that are not numbers, and plain decimals (e.g. "-12.50")
+            summarized by their range, the count of those with a fraction and the range of their digit counts.
+            float_value_list has the float values of every number in the block, in row order
+            (including those counted by count_number_value()).
+        """
+        if (0 < not_number_count):
+            self.not_int_count += not_number_count
+            self.not_float_count += not_number_count
+        if (0 < fraction_count):
+            self.not_int_count += fraction_count
+            # columns of non-integer numbers are not chosen as keys (see table_schema.get_pkey_value_list())
+            self.stop_key_tracking()
+        if (None != int_min):
+            self.int_max = _max_or_none(self.int_max, int_max)
+            self.int_min = _min_or_none(self.int_min, int_min)
+        # flushed after the same values as update_number_statistics() flushes them, for the same statistics
+        value_position = 0
+        while (value_position < len(float_value_list)):
+            block_value_count = number_block_value_count - len(self.number_value_list)
+            self.number_value_list.extend(float_value_list[value_position:value_position + block_value_count])
+            value_position += block_value_count
+            if (number_block_value_count <= len(self.number_value_list)):
+                self.flush_number_values()
+        if (None != decimal_precision_digit_count_max):
+            self._update_decimal_digit_counts(decimal_precision_digit_count_max, decimal_scale_digit_count_max)
+            self._update_decimal_digit_counts(decimal_precision_digit_count_min, decimal_scale_digit_count_min)
+        self.leading_zero_count += leading_zero_count
+        if (0 < not_number_count or 0 < leading_zero_count):
+            self.is_settled = self._can_settle()
+
+    def flush_small_values(self):
+        """ Count the values collected in small_value_set into the value statistics.
+        """
+        if (None != self.small_value_set):
+            for (cell_value, cell_count) in self.small_value_set.pop_new_value_counts():
+                self._update_value_statistics(cell_value, cell_count)
+
+    def start_sketches(self):
+        """ Start summarizing the cell values in sketches (see column_sketch).
+        """
+        if (None == self.sketch_value_list):
+            self.distinct_sketch = DistinctSketch()
+            self.top_value_sketch = TopValueSketch()
+            self.sketch_value_list = list()
+            # the numbers collected so far have not been sketched
+            self.flush_number_values()
+            self.quantile_sketch = QuantileSketch()
+
+    def flush_sketch_values(self):
+        """ Count the collected cell values into the sketches.
+        """
+        if (None != self.sketch_value_list
+            and 0 < len(self.sketch_value_list)
+        ):
+            value_count_dict = collections.Counter(get_sketch_value_list(self.sketch_value_list))
+            self.sketch_value_list = list()
+            if (None != self.distinct_sketch):
+                self.distinct_sketch.update_values(value_count_dict)
+            if (None != self.top_value_sketch):
+                self.top_value_sketch.update_counts(value_count_dict)
+
+    def flush_number_values(self):
+        """ Add the collected numbers to the float statistics (and the quantile sketch).
+
+            NaN is left out of every statistic, and infinities are only counted in the range.
+        """
+        number_value_list = self.number_value_list
+        if (0 == len(number_value_list)):
+            return
+        self.number_value_list = list()
+        finite_value_list = list(filter(math.isfinite, number_value_list))
+        range_value_list = finite_value_list
+        if (len(finite_value_list) < len(number_value_list)):
+            range_value_list = [value for value in number_value_list if (value == value)]
+        if (0 < len(range_value_list)):
+            self.float_max = _max_or_none(self.float_max, max(range_value_list))
+            self.float_min = _min_or_none(self.float_min, min(range_value_list))
+        value_count = len(finite_value_list)
+        if (0 < value_count):
+            # the block's own mean and squared deviations, then Chan's formula to combine them
+            value_mean = _sum_floats(finite_value_list) / value_count
+            deviation_list = list(map(operator.sub, finite_value_list, itertools.repeat(value_mean)))
+            self._merge_float_moments(
+                value_count
+                ,value_mean
+                ,sum(map(operator.mul, deviation_list, deviation_list))
+                )
+            if (None != self.quantile_sketch):
+                self.quantile_sketch.update_values(finite_value_list)
+
+    def get_float_mean(self):
+        """ Get the mean of the finite numbers, or None if there are none.
+        """
+        self.flush_number_values()
+        return self.float_mean
+
+    def get_float_variance(self):
+        """ Get the sample variance of the finite numbers, or None if there are fewer than two.
+        """
+        self.flush_number_values()
+        if (2 > self.float_count):
+            return None
+        return self.float_square_deviation_sum / (self.float_count - 1)
+
+    def get_float_quantile_list(self, fraction_list):
+        """ Estimate quantiles of the finite numbers (see QuantileSketch), or None without a sketch or numbers.
+        """
+        self.flush_number_values()
+        if (None == self.quantile_sketch):
+            return None
+        return self.quantile_sketch.get_quantile_list(fraction_list)
+
+    def get_code_list(self):
+        """ Get the sorted distinct values of a column that has few values, each repeated,
+            or None if the column isn't a code list.
+
+            A boolean column is not a code list (its values are in its format, see finalize()).
+        """
+        if (None == self.small_value_set
+            or column_type_name_bool == self.data_type_name
+        ):
+            return None
+        value_count_dict = self.small_value_set.get_value_count_dict()
+        if (2 > len(value_count_dict)
+            or self.not_null_cell_value_count < code_list_value_repeat_count_min * len(value_count_dict)
+        ):
+            return None
+        return sorted(value_count_dict)
+
+    def get_distinct_count(self):
+        """ Get the estimated number of distinct not-null values, or None without a distinct sketch.
+
+            The number is exact while the values are still counted in small_value_set.
+        """
+        self.flush_sketch_values()
+        if (None == self.distinct_sketch):
+            return None
+        if (None != self.small_value_set):
+            return len(self.small_value_set.get_value_count_dict())
+        return self.distinct_sketch.get_distinct_count()
+
+    def get_top_value_count_list(self, value_count_max, value_count_min=1):
+        """ Get (value, count) pairs of the most frequent values (see TopValueSketch), or None without a sketch.
+        """
+        self.flush_sketch_values()
+        if (None == self.top_value_sketch):
+            return None
+        return self.top_value_sketch.get_top_value_count_list(value_count_max, value_count_min)
+
+    def stop_key_tracking(self):
+        """ Stop collecting key values, e.g. because not every row of the table will be seen.
+
+            The column will then not be found unique.
+        """
+        if (None != self.key_value_set):
+            self.key_value_set.close()
+            self.key_value_set = None
+
+    def _reject_key(self, cell_count):
+        # an empty or repeated cell: the column can't be a key, so its values are no longer needed
+        self.not_key_count += cell_count
+        self.stop_key_tracking()
+
+    def _can_settle(self):
+        """ Decide whether no later cell value can change the column datatype name.
+
+            A column with values of different lengths can't be a fixed-length char,
+            and once it has a non-number or a leading-zero digit code,
+            it can't be a number either.
+            A column isn't settled while its values still agree with a time format,
+            or could still be a boolean column.
+        """
+        return (
+            None == self.time_format_set
+            and self.char_count_max != self.char_count_min
+            and (0 < self.not_float_count or 0 < self.leading_zero_count)
+            and (None == self.small_value_set
+                or None == _get_bool_spelling_pair(self.small_value_set.get_value_count_dict())
+            )
+            )
+
+    def _update_float_notation(self, cell_value, cell_value_float, cell_count):
+        """ Count a number that is not written as a plain decimal (e.g. "1e5", "nan", ".5").
+        """
+        if (bytes is type(cell_value)):
+            cell_value = cell_value.decode("ascii")
+        number_chars = cell_value.strip().lower()
+        # a number with an 'e' or an 'n' has an exponent, or is nan or inf
+        if ('e' in number_chars or 'n' in number_chars):
+            self.float_notation_count += cell_count
+        if (not _fits_float32(number_chars, cell_value_float)):
+            self.not_float32_count += cell_count
+
+    def _merge_float_moments(self, float_count, float_mean, float_square_deviation_sum):
+        if (0 == float_count):
+            return
+        if (0 == self.float_count):
+            self.float_count = float_count
+            self.float_mean = float_mean
+            self.float_square_deviation_sum = float_square_deviation_sum
+            return
+        merged_float_count = self.float_count + float_count
+        mean_delta = float_mean - self.float_mean
+        self.float_square_deviation_sum += (
+            float_square_deviation_sum
+            + mean_delta * mean_delta * self.float_count * float_count / merged_float_count
+            )
+        self.float_mean += mean_delta * float_count / merged_float_count
+        self.float_count = merged_float_count
+
+    def _update_decimal_digit_counts(
+        self
+        ,decimal_precision_digit_count
+        ,decimal_scale_digit_count
+        ):
+        if (None == self.decimal_precision_digit_count_max):
+            self.decimal_precision_digit_count_max = decimal_precision_digit_count
+            self.decimal_precision_digit_count_min = decimal_precision_digit_count
+            self.decimal_scale_digit_count_max = decimal_scale_digit_count
+            self.decimal_scale_digit_count_min = decimal_scale_digit_count
+            return
+        if (self.decimal_precision_digit_count_max < decimal_precision_digit_count):
+            self.decimal_precision_digit_count_max = decimal_precision_digit_count
+        elif (self.decimal_precision_digit_count_min > decimal_precision_digit_count):
+            self.decimal_precision_digit_count_min = decimal_precision_digit_count
+        if (self.decimal_scale_digit_count_max < decimal_scale_digit_count):
+            self.decimal_scale_digit_count_max = decimal_scale_digit_count
+        elif (self.decimal_scale_digit_count_min > decimal_scale_digit_count):
+            self.decimal_scale_digit_count_min = decimal_scale_digit_count
+
+    def merge(self, other):
+        """ Combine the statistics of another profile of the same column into this one.
+
+            The merge is associative, so a column can be profiled in pieces
+            (e.g. one piece per chunk of rows) and the pieces combined in any grouping.
+            The key values of the other profile are moved into this one.
+        """
+        self.flush_small_values()
+        other.flush_small_values()
+        self.null_cell_value_count += other.null_cell_value_count
+        self.not_null_cell_value_count += other.not_null_cell_value_count
+        self.blank_cell_count += other.blank_cell_count
+        self.char_count_max = _max_or_none(self.char_count_max, other.char_count_max)
+        self.char_count_min = _min_or_none(self.char_count_min, other.char_count_min)
+        self.not_int_count += other.not_int_count
+        self.int_max = _max_or_none(self.int_max, other.int_max)
+        self.int_min = _min_or_none(self.int_min, other.int_min)
+        self.not_float_count += other.not_float_count
+        self.flush_number_values()
+        other.flush_number_values()
+        self.float_max = _max_or_none(self.float_max, other.float_max)
+        self.float_min = _min_or_none(self.float_min, other.float_min)
+        self._merge_float_moments(other.float_count, other.float_mean, other.float_square_deviation_sum)
+        self.float_notation_count += other.float_notation_count
+        self.not_float32_count += other.not_float32_count
+        self.decimal_precision_digit_count_max = _max_or_none(self.decimal_precision_digit_count_max, other.decimal_precision_digit_count_max)
+        self.decimal_precision_digit_count_min = _min_or_none(self.decimal_precision_digit_count_min, other.decimal_precision_digit_count_min)
+        self.decimal_scale_digit_count_max = _max_or_none(self.decimal_scale_digit_count_max, other.decimal_scale_digit_count_max)
+        self.decimal_scale_digit_count_min = _min_or_none(self.decimal_scale_digit_count_min, other.decimal_scale_digit_count_min)
+        self.leading_zero_count += other.leading_zero_count
+        self.not_key_count += other.not_key_count
+        if (None == self.key_value_set or None == other.key_value_set):
+            self.stop_key_tracking()
+        elif (not self.key_value_set.merge(other.key_value_set)):
+            self._reject_key(1)
+        other.stop_key_tracking()
+        if (0 < self.not_key_count):
+            self.stop_key_tracking()
+        self.flush_sketch_values()
+        other.flush_sketch_values()
+        self.distinct_sketch = _merge_sketches(self.distinct_sketch, other.distinct_sketch)
+        self.top_value_sketch = _merge_sketches(self.top_value_sketch, other.top_value_sketch)
+        self.quantile_sketch = _merge_sketches(self.quantile_sketch, other.quantile_sketch)
+        if (None == self.small_value_set
+            or None == other.small_value_set
+            or not self.small_value_set.merge(other.small_value_set)
+        ):
+            self.small_value_set = None
+        if (None == self.time_format_set or None == other.time_format_set):
+            self.time_format_set = None
+        else:
+            self.time_format_set.merge(other.time_format_set)
+            if (None == self.time_format_set.get_time_format()):
+                self.time_format_set = None
+        if (None == self.distinct_sketch and None == self.top_value_sketch):
+            # a profile without sketches can't be summarized any more
+            self.sketch_value_list = None
+        self.is_settled = (self.is_settled or other.is_settled or self._can_settle())
+        return self
+
+    def get_stat_value_list(self):
+        """ Get the statistics named in column_stat_field_list as a list of strings.
+
+            Statistics that have no value yet are returned as None.
+        """
+        self.flush_small_values()
+        self.flush_sketch_values()
+        self.flush_number_values()
+        stat_value_list = list()
+        for (stat_field_name, parse_stat_value, default_stat_value) in column_stat_field_list:
+            stat_value = getattr(self, stat_field_name)
+            if (None != stat_value):
+                if (float == parse_stat_value):
+                    stat_value = repr(stat_value)
+                else:
+                    stat_value = str(stat_value)
+            stat_value_list.append(stat_value)
+        return stat_value_list
+
+    def set_stat_value(self, stat_field_name, stat_value_str):
+        """ Set one statistic from its saved string form.
+
+            Returns False if the statistic name is not known.
+        """
+        for (known_stat_field_name, parse_stat_value, default_stat_value) in column_stat_field_list:
+            if (known_stat_field_name == stat_field_name):
+                stat_value = default_stat_value
+                if (None != stat_value_str and 0 < len(stat_value_str)):
+                    stat_value = parse_stat_value(stat_value_str)
+                setattr(self, stat_field_name, stat_value)
+                return True
+        return False
+
+    def finalize(self):
+        """ Decide the column datatype from the accumulated statistics.
+
+            Sets data_type_name and data_type_size and returns them as a tuple.
+            Sets data_type_format to the time format of a "time" column,
+            or the values of a "boolean" column (e.g. "Y/N", true value first), and None for other columns.
+            Also sets is_unique, which is True if the column has values and every value is different
+            (which can only be known while the key values are being collected).
+        """
+        self.flush_small_values()
+        column_type_name = None
+        column_format = None
+        cell_char_count_max = self.char_count_max
+        cell_char_count_min = self.char_count_min
+        not_int_count = self.not_int_count
+        not_float_count = self.not_float_count
+        leading_zero_count = self.leading_zero_count
+        bool_spelling_pair = None
+        if (None != self.small_value_set):
+            bool_spelling_pair = _get_bool_spelling_pair(self.small_value_set.get_value_count_dict())
+        if (0 == self.not_null_cell_value_count):
+            column_type_name = column_type_name_default
+        elif (None != bool_spelling_pair
+            and None not in bool_spelling_pair
+        ):
+            # one spelling of true and one of false, e.g. "Y" and "N", or "1" and "0"
+            column_type_name = column_type_name_bool
+            column_format = "/".join(bool_spelling_pair)
+        elif (None != self.time_format_set):
+            # every value agrees with a time format
+            column_type_name = column_type_name_time
+            column_format = self.time_format_set.get_time_format().format_name
+        elif (None != cell_char_count_max
+            and cell_char_count_max == cell_char_count_min
+            and (0 < not_float_count   # something is not a number, so it must be char type
+                or 0 < leading_zero_count  # something starts with a zero digit, so it looks like a digit code string
+            )
+        ):
+            column_type_name = column_type_name_fixed_char
+        elif (0 < leading_zero_count):
+            # assume anything that has a leading zero is a string
+            column_type_name = column_type_name_str
+        elif (0 == not_int_count):
+            column_type_name = column_type_name_int
+        elif (0 == not_float_count
+            and 0 < self.float_notation_count
+        ):
+            # exponents, nan and inf are float notation, which a decimal type doesn't hold
+            column_type_name = column_type_name_float
+        elif (0 == not_float_count
+            and None != cell_char_count_max
+            and 0 < cell_char_count_max
+        ):
+            # it parses as a float, but mark its type as decimal
+            column_type_name = column_type_name_decimal
+        else:
+            column_type_name = column_type_name_str
+
+        column_size_str = None
+        if (column_type_name_fixed_char == column_type_name
+            or column_type_name_str == column_type_name
+        ):
+            # a column without values (e.g. of a table without data rows) has no size
+            if (None != cell_char_count_max):
+                column_size_str = str(cell_char_count_max)
+        elif (column_type_name_decimal == column_type_name):
+            if (None != self.decimal_precision_digit_count_max
+                and None != self.decimal_scale_digit_count_max
+            ):
+                column_size_str = "{},{}".format(
+                    self.decimal_precision_digit_count_max
+                    ,self.decimal_scale_digit_count_max
+                )
+        elif (column_type_name_int == column_type_name):
+            int_byte_count = _get_int_byte_count(self.int_min, self.int_max)
+            if (None != int_byte_count):
+                column_size_str = str(int_byte_count)
+        elif (column_type_name_float == column_type_name):
+            column_size_str = "8"
+            if (0 == self.not_float32_count
+                and (None == self.decimal_precision_digit_count_max
+                    or float32_digit_count_max >= self.decimal_precision_digit_count_max
+                )
+            ):
+                column_size_str = "4"
+
+        self.data_type_name = column_type_name
+        self.data_type_size = column_size_str
+        self.data_type_format = column_format
+        self.is_unique = (
+            0 < self.not_null_cell_value_count
+            and 0 == self.not_key_count
+            and None != self.key_value_set
+            and not self.key_value_set.has_repeated_hash()
+            )
+        return (column_type_name, column_size_str)
+
+
+def _get_bool_spelling_pair(value_count_dict):
+    """ Get a tuple (true_spelling, false_spelling) of the most common spellings of the boolean values of a column,
+        or None if the values are not all spellings of one true value and one false value (e.g. "Y" and "y", "N").
+
+        Either spelling is None if the column has no such value (yet).
+    """
+    spelling_pair = [None, None]
+    spelling_count_pair = [0, 0]
+    bool_value_key_pair = [None, None]
+    for (value, value_count) in value_count_dict.items():
+        try:
+            bool_value = as_bool(value)
+        except ValueError:
+            return None
+        bool_value_position = int(not bool_value)
+        bool_value_key = value.strip().lower()
+        if (None == bool_value_key_pair[bool_value_position]):
+            bool_value_key_pair[bool_value_position] = bool_value_key
+        elif (bool_value_key != bool_value_key_pair[bool_value_position]):
+            # e.g. both "Y" and "1"
+            return None
+        if (spelling_count_pair[bool_value_position] < value_count):
+            spelling_pair[bool_value_position] = value.strip()
+            spelling_count_pair[bool_value_position] = value_count
+    return tuple(spelling_pair)
+
+
+def _merge_sketches(sketch, other_sketch):
+    # a sketch of only some of the cells is of no use
+    if (None == sketch or None == other_sketch):
+        return None
+    return sketch.merge(other_sketch)
+
+def _get_int_byte_count(int_min, int_max):
+    """ Get the fewest bytes (of int_byte_count_list) of a signed integer that holds int_min and int_max.
+    """
+    if (None == int_min or None == int_max):
+        return None
+    for int_byte_count in int_byte_count_list:
+        int_bound = 1 << (8*int_byte_count - 1)
+        if (-int_bound <= int_min and int_max < int_bound):
+            return int_byte_count
+    return None
+
+def _fits_float32(number_chars, number):
+    """ Decide whether a 4-byte float holds a number to as many significant digits as it is written with.
+    """
+    if (not math.isfinite(number)):
+        return True
+    if (abs(number) > _float32_max):
+        return False
+    digit_chars = number_chars.split("e")[0].lstrip("+-").replace(".", "").replace("_", "").strip("0")
+    float32_number = struct.unpack("f", struct.pack("f", number))[0]
+    return (number == float("{:.{}g}".format(float32_number, max(1, len(digit_chars)))))
+
+def _sum_floats(float_list):
+    try:
+        return math.fsum(float_list)
+    except OverflowError:
+        # fsum() refuses sums past the float range, which sum() makes infinite
+        return sum(float_list)
+
+def _max_or_none(a, b):
+    if (None == a):
+        return b
+    if (None != b and a < b):
+        return b
+    return a
+
+def _min_or_none(a, b):
+    if (None == a):
+        return b
+    if (None != b and a > b):
+        return b
+    return a
@@ -0,0 +1,449 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Column sketches: fixed-size summaries of the values of a column
+## that can be merged across chunks of rows (and worker processes).
+## DistinctSketch is a HyperLogLog estimate of the number of distinct values,
+## and TopValueSketch is a Misra-Gries summary of the most frequent values (the "heavy hitters").
+## Both are updated with the distinct values of a block of cells and their counts,
+## so that the per-cell work is done by collections.Counter.
+## QuantileSketch is a KLL summary of the numbers of a column, for approximate quantiles,
+## updated with a block of floats at a time.
+## SmallValueSet counts the distinct values of a column exactly, as long as there are only a few,
+## and is dropped (by its owner) once there are more.
+
+import base64
+import csv
+import heapq
+import io
+import itertools
+import math
+import zlib
+
+# 2**12 registers of one byte, for a standard error of about 1.6%
+distinct_sketch_register_bit_count = 12
+# number of values counted by a TopValueSketch
+top_value_count_max_default = 64
+# capacity of the top compactor of a QuantileSketch, for a rank error of about 1%
+quantile_sketch_capacity_default = 200
+# most distinct values counted by a SmallValueSet
+small_value_count_max_default = 16
+
+_hash_bit_count = 32
+_hash_mask = (1 << _hash_bit_count) - 1
+_hash_multiplier = 0x9E3779B1
+_utf8_charset_name_iter = itertools.repeat("utf_8")
+_surrogatepass_error_mode_iter = itertools.repeat("surrogatepass")
+
+
+def get_sketch_value_list(cell_value_list):
+    """ Get cell values as str (bytes cells only have ASCII characters, see ColumnProfile).
+    """
+    if (bytes in set(map(type, cell_value_list))):
+        return [
+            (cell_value.decode("ascii") if (bytes is type(cell_value)) else cell_value)
+            for cell_value in cell_value_list
+            ]
+    return cell_value_list
+
+
+class DistinctSketch(object):
+    """ A HyperLogLog sketch of the distinct values of a column.
+
+        Values are hashed with CRC-32 (the same in every process),
+        and each of the 2**register_bit_count registers keeps the highest rank seen.
+        Merging two sketches keeps the larger of each register.
+    """
+    __slots__ = (
+         "register_bit_count"
+        ,"register_array"
+        )
+
+    def __init__(self, register_bit_count=distinct_sketch_register_bit_count, register_array=None):
+        self.register_bit_count = register_bit_count
+        if (None == register_array):
+            register_array = bytearray(1 << register_bit_count)
+        self.register_array = register_array
+
+    def update_values(self, distinct_value_iter):
+        """ Add str values (repeats do no harm, but cost time).
+        """
+        register_array = self.register_array
+        rank_bit_count = _hash_bit_count - self.register_bit_count
+        rank_mask = (1 << rank_bit_count) - 1
+        rank_max = rank_bit_count + 1
+        value_byte_iter = map(str.encode, distinct_value_iter, _utf8_charset_name_iter, _surrogatepass_error_mode_iter)
+        # a CRC-32 times an odd constant (modulo 2**32), computed without a python loop;
+        # the multiplication mixes every bit of the CRC into the high bits, which choose the register
+        value_hash_iter = map(_hash_mask.__and__, map(_hash_multiplier.__mul__, map(zlib.crc32, value_byte_iter)))
+        for value_hash in value_hash_iter:
+            register_position = value_hash >> rank_bit_count
+            rank = rank_max - (value_hash & rank_mask).bit_length()
+            if (register_array[register_position] < rank):
+                register_array[register_position] = rank
+
+    def merge(self, other):
+        if (self.register_bit_count != other.register_bit_count):
+            raise ValueError("cannot merge distinct sketches of different sizes")
+        self.register_array = bytearray(map(max, self.register_array, other.register_array))
+        return self
+
+    def get_distinct_count(self):
+        """ Estimate the number of distinct values, with the usual small and large range corrections.
+        """
+        register_count = len(self.register_array)
+        alpha = 0.7213 / (1.0 + 1.079 / register_count)
+        estimate = alpha * register_count * register_count / math.fsum(
+            math.ldexp(1.0, -rank) for rank in self.register_array
+            )
+        zero_register_count = self.register_array.count(0)
+        if (estimate <= 2.5 * register_count and 0 < zero_register_count):
+            # linear counting is better while many registers are still empty
+            estimate = register_count * math.log(register_count / zero_register_count)
+        elif (estimate > (1 << _hash_bit_count) / 30.0):
+            estimate = -(1 << _hash_bit_count) * math.log(1.0 - estimate / (1 << _hash_bit_count))
+        return int(round(estimate))
+
+    def __str__(self):
+        # saved in partial-profile files
+        return "{}:{}".format(
+            self.register_bit_count
+            ,base64.b64encode(zlib.compress(bytes(self.register_array))).decode("ascii")
+            )
+
+
+def parse_distinct_sketch(s):
+    """ Read a DistinctSketch saved with str().
+    """
+    (register_bit_count_str, register_str) = s.split(":", 1)
+    register_bit_count = int(register_bit_count_str)
+    register_array = bytearray(zlib.decompress(base64.b64decode(register_str)))
+    if (len(register_array) != (1 << register_bit_count)):
+        raise ValueError("invalid distinct sketch: {!r}".format(s))
+    return DistinctSketch(register_bit_count, register_array)
+
+
+class TopValueSketch(object):
+    """ A Misra-Gries summary of the most frequent values of a column.
+
+        Holds at most value_count_max counters.
+        When more values are seen, the (value_count_max+1)-th largest count
+        is subtracted from every counter (and added to error_count),
+        and counters that reach zero are dropped.
+        So the true count of a value is between its counter and its counter plus error_count,
+        and any value that fills more than 1/(value_count_max+1) of the cells is kept.
+        Merging two summaries this way has the same guarantee for the combined cells.
+    """
+    __slots__ = (
+         "value_count_max"
+        ,"value_count_dict"
+        ,"error_count"
+        )
+
+    def __init__(self, value_count_max=top_value_count_max_default):
+        self.value_count_max = value_count_max
+        self.value_count_dict = dict()
+        self.error_count = 0
+
+    def update_counts(self, value_count_dict):
+        """ Add exact counts of distinct values (e.g. a collections.Counter of a block of cells).
+        """
+        value_count_max = self.value_count_max
+        # values that have no more cells than the (value_count_max+1)-th largest count of the block
+        # are dropped below by any merge, unless they already have a counter
+        block_count_min = 0
+        if (value_count_max < len(value_count_dict)):
+            block_count_min = heapq.nlargest(value_count_max + 1, value_count_dict.values())[-1]
+        merged_value_count_dict = dict()
+        for (value, value_count) in self.value_count_dict.items():
+            merged_value_count_dict[value] = value_count + value_count_dict.get(value, 0)
+        if (0 == block_count_min):
+            for (value, value_count) in value_count_dict.items():
+                if (value not in merged_value_count_dict):
+                    merged_value_count_dict[value] = value_count
+        else:
+            for (value, value_count) in value_count_dict.items():
+                if (block_count_min < value_count
+                    and value not in merged_value_count_dict
+                ):
+                    merged_value_count_dict[value] = value_count
+        self._set_counts(merged_value_count_dict, block_count_min)
+
+    def merge(self, other):
+        self.update_counts(other.value_count_dict)
+        self.error_count += other.error_count
+        return self
+
+    def get_top_value_count_list(self, value_count_max=None, value_count_min=1):
+        """ Get (value, count) pairs of the most frequent values, most frequent first.
+
+            Counts are lower bounds.
+            Only values with a count of at least value_count_min are returned,
+            and only if their count is larger than error_count
+            (so that the true count is less than twice the count);
+            the counters of values that are not much more frequent than the others say little.
+        """
+        error_count = self.error_count
+        value_count_list = [
+            (value, value_count)
+            for (value, value_count) in self.value_count_dict.items()
+            if (value_count_min <= value_count and error_count < value_count)
+            ]
+        value_count_list.sort(key=_get_negative_count)
+        return value_count_list[:value_count_max]
+
+    def __str__(self):
+        # saved in partial-profile files as a csv row: value_count_max, error_count, then value and count pairs
+        out_row = [self.value_count_max, self.error_count]
+        for (value, value_count) in self.value_count_dict.items():
+            out_row += [value, value_count]
+        out_io = io.StringIO()
+        csv.writer(out_io, lineterminator="").writerow(out_row)
+        return out_io.getvalue()
+
+    def _set_counts(self, merged_value_count_dict, count_min):
+        value_count_max = self.value_count_max
+        if (value_count_max < len(merged_value_count_dict)):
+            count_min = max(
+                count_min
+                ,heapq.nlargest(value_count_max + 1, merged_value_count_dict.values())[-1]
+                )
+        if (0 < count_min):
+            merged_value_count_dict = {
+                value: value_count - count_min
+                for (value, value_count) in merged_value_count_dict.items()
+                if (count_min < value_count)
+                }
+            self.error_count += count_min
+        self.value_count_dict = merged_value_count_dict
+
+
+def parse_top_value_sketch(s):
+    """ Read a TopValueSketch saved with str().
+    """
+    in_row = next(csv.reader(io.StringIO(s)), [])
+    if (2 > len(in_row) or 0 != len(in_row) % 2):
+        raise ValueError("invalid top value sketch: {!r}".format(s))
+    top_value_sketch = TopValueSketch(int(in_row[0]))
+    top_value_sketch.error_count = int(in_row[1])
+    for cell_position in range(2, len(in_row), 2):
+        top_value_sketch.value_count_dict[in_row[cell_position]] = int(in_row[cell_position + 1])
+    return top_value_sketch
+
+
+class QuantileSketch(object):
+    """ A KLL sketch of the numbers of a column, for approximate quantiles (e.g. the median).
+
+        compactor_list holds one list of numbers per level; each number of level h stands for 2**h numbers.
+        When a level holds more numbers than its capacity, it is sorted
+        and every other number (starting at the first or the second, in turns) moves up one level.
+        The top level holds up to compactor_capacity numbers,
+        and each level below holds 2/3 as many (but at least 2),
+        so the sketch holds about 3*compactor_capacity numbers however many it has seen.
+        Merging two sketches joins their levels and compacts them again.
+    """
+    __slots__ = (
+         "compactor_capacity"
+        ,"compactor_list"
+        ,"compaction_count"
+        )
+
+    def __init__(self, compactor_capacity=quantile_sketch_capacity_default):
+        self.compactor_capacity = compactor_capacity
+        self.compactor_list = [list()]
+        self.compaction_count = 0
+
+    def update_values(self, value_list):
+        """ Add a list of finite floats.
+        """
+        self.compactor_list[0].extend(value_list)
+        self._compact()
+
+    def merge(self, other):
+        if (self.compactor_capacity != other.compactor_capacity):
+            raise ValueError("cannot merge quantile sketches of different sizes")
+        for (level, other_compactor) in enumerate(other.compactor_list):
+            if (level < len(self.compactor_list)):
+                self.compactor_list[level].extend(other_compactor)
+            else:
+                self.compactor_list.append(list(other_compactor))
+        self.compaction_count += other.compaction_count
+        self._compact()
+        return self
+
+    def get_value_count(self):
+        """ Get the number of values the sketch has seen.
+        """
+        return sum(len(compactor) << level for (level, compactor) in enumerate(self.compactor_list))
+
+    def get_quantile_list(self, fraction_list):
+        """ Estimate the quantiles at fractions between 0 and 1 (e.g. 0.5 for the median).
+
+            Returns a list with a value for each fraction, or None if the sketch has seen no values.
+        """
+        weighted_value_list = sorted(
+            (value, 1 << level)
+            for (level, compactor) in enumerate(self.compactor_list)
+            for value in compactor
+            )
+        if (0 == len(weighted_value_list)):
+            return None
+        value_count = sum(value_weight for (value, value_weight) in weighted_value_list)
+        quantile_list = list()
+        for fraction in fraction_list:
+            rank = fraction * value_count
+            weight_sum = 0
+            quantile = weighted_value_list[-1][0]
+            for (value, value_weight) in weighted_value_list:
+                weight_sum += value_weight
+                if (rank <= weight_sum):
+                    quantile = value
+                    break
+            quantile_list.append(quantile)
+        return quantile_list
+
+    def __str__(self):
+        # saved in partial-profile files: capacity, compaction count, then the numbers of each level
+        return "{}:{}:{}".format(
+            self.compactor_capacity
+            ,self.compaction_count
+            ,"/".join(" ".join(map(repr, compactor)) for compactor in self.compactor_list)
+            )
+
+    def _get_level_capacity(self, level):
+        level_count = len(self.compactor_list)
+        return max(2, int(self.compactor_capacity * (2.0/3.0) ** (level_count - 1 - level)))
+
+    def _compact(self):
+        compactor_list = self.compactor_list
+        level = 0
+        while (level < len(compactor_list)):
+            compactor = compactor_list[level]
+            if (self._get_level_capacity(level) < len(compactor)):
+                if (level + 1 == len(compactor_list)):
+                    compactor_list.append(list())
+                compactor.sort()
+                kept_value_list = list()
+                if (1 == len(compactor) % 2):
+                    # an odd number stays on this level
+                    kept_value_list.append(compactor.pop())
+                compactor_list[level + 1].extend(compactor[(self.compaction_count % 2)::2])
+                self.compaction_count += 1
+                compactor_list[level] = kept_value_list
+            level += 1
+
+
+def parse_quantile_sketch(s):
+    """ Read a QuantileSketch saved with str().
+    """
+    try:
+        (compactor_capacity_str, compaction_count_str, compactor_list_str) = s.split(":", 2)
+        quantile_sketch = QuantileSketch(int(compactor_capacity_str))
+        quantile_sketch.compaction_count = int(compaction_count_str)
+        quantile_sketch.compactor_list = [
+            list(map(float, compactor_str.split()))
+            for compactor_str in compactor_list_str.split("/")
+            ]
+    except ValueError:
+        raise ValueError("invalid quantile sketch: {!r}".format(s))
+    return quantile_sketch
+
+
+class SmallValueSet(object):
+    """ Exact counts of the distinct values of a column that has at most value_count_max of them.
+
+        Values are counted in value_count_dict as they come (str, or bytes with only ASCII characters),
+        so a caller can count a value that is already there with one dict lookup,
+        and only call add() for a new value.
+        add() and merge() return False once there are more than value_count_max values,
+        and the set should then be dropped.
+        pop_new_value_counts() hands out the counts added since it was last called,
+        so that a caller can work on each distinct value once instead of once per cell.
+    """
+    __slots__ = (
+         "value_count_max"
+        ,"value_count_dict"
+        ,"popped_value_count_dict"
+        )
+
+    def __init__(self, value_count_max=small_value_count_max_default):
+        self.value_count_max = value_count_max
+        self.value_count_dict = dict()
+        self.popped_value_count_dict = dict()
+
+    def add(self, value, value_count=1):
+        """ Count a value, unless it would be one value too many.
+        """
+        value_count_dict = self.value_count_dict
+        # the same value can come as str in a row that has other non-ASCII cells
+        other_value = None
+        if (bytes is type(value)):
+            other_value = value.decode("ascii")
+        elif (value.isascii()):
+            other_value = value.encode("ascii")
+        if (value in value_count_dict):
+            value_count_dict[value] += value_count
+        elif (other_value in value_count_dict):
+            value_count_dict[other_value] += value_count
+        elif (self.value_count_max > len(value_count_dict)):
+            value_count_dict[value] = value_count
+        else:
+            return False
+        return True
+
+    def merge(self, other):
+        """ Count the values of another set (the new counts of both sets should have been popped).
+        """
+        for (value, value_count) in other.value_count_dict.items():
+            if (not self.add(value, value_count)):
+                return False
+        self.pop_new_value_counts()
+        return True
+
+    def pop_new_value_counts(self):
+        """ Get a list of (value, count) pairs of the values counted since the last call.
+        """
+        popped_value_count_dict = self.popped_value_count_dict
+        new_value_count_list = list()
+        for (value, value_count) in self.value_count_dict.items():
+            popped_value_count = popped_value_count_dict.get(value, 0)
+            if (popped_value_count < value_count):
+                new_value_count_list.append((value, value_count - popped_value_count))
+        self.popped_value_count_dict = dict(self.value_count_dict)
+        return new_value_count_list
+
+    def get_value_count_dict(self):
+        """ Get the count of each distinct value, with every value as str.
+        """
+        value_count_dict = dict()
+        for (value, value_count) in self.value_count_dict.items():
+            if (bytes is type(value)):
+                value = value.decode("ascii")
+            value_count_dict[value] = value_count_dict.get(value, 0) + value_count
+        return value_count_dict
+
+    def __str__(self):
+        # saved in partial-profile files as a csv row: value_count_max, then value and count pairs
+        out_row = [self.value_count_max]
+        for (value, value_count) in self.get_value_count_dict().items():
+            out_row += [value, value_count]
+        out_io = io.StringIO()
+        csv.writer(out_io, lineterminator="").writerow(out_row)
+        return out_io.getvalue()
+
+
+def parse_small_value_set(s):
+    """ Read a SmallValueSet saved with str() (its counts are taken as already popped).
+    """
+    in_row = next(csv.reader(io.StringIO(s)), [])
+    if (1 > len(in_row) or 1 != len(in_row) % 2):
+        raise ValueError("invalid small value set: {!r}".format(s))
+    small_value_set = SmallValueSet(int(in_row[0]))
+    for cell_position in range(1, len(in_row), 2):
+        small_value_set.value_count_dict[in_row[cell_position]] = int(in_row[cell_position + 1])
+    small_value_set.pop_new_value_counts()
+    return small_value_set
+
+
+def _get_negative_count(value_count_item):
+    return -value_count_item[1]
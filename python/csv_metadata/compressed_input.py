@@ -0,0 +1,170 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Compressed input: reading table files that are compressed with gzip, bzip2 or xz (e.g. "x.csv.gz").
+## The compression is recognized by the magic bytes at the start of the file, not by its name.
+## A compressed file is decompressed by a background thread into a bounded queue of chunks,
+## so that decompression (which releases the GIL) overlaps with the csv reader and the profiling.
+## Compressed files have no random access, so they are always read from start to end.
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import queue
+import threading
+import zlib
+
+# compression name, the bytes that start a compressed file, and the function that opens it
+_compression_list = (
+     ("gzip", b"\x1f\x8b", gzip.open)
+    ,("bz2", b"BZh", bz2.open)
+    ,("xz", b"\xfd7zXZ\x00", lzma.open)
+    )
+# errors of damaged or cut compressed data
+_decompression_error_class_tuple = (OSError, EOFError, zlib.error, lzma.LZMAError)
+_magic_byte_count_max = max(len(magic_bytes) for (compression_name, magic_bytes, open_file) in _compression_list)
+# file name extensions of compressed files, removed (with the table extension) to name the metadata files
+compressed_file_ext_list = (".gz", ".bz2", ".xz")
+
+# size of the chunks that the background thread decompresses,
+# and the most chunks that it decompresses ahead of the reader
+background_chunk_byte_count = 256*1024
+background_chunk_count_max = 16
+
+
+class CompressedFileError(ValueError):
+    """ Raised when a compressed file can't be decompressed (e.g. it is damaged or cut short).
+    """
+    pass
+
+
+def detect_file_compression_name(file_name):
+    """ Get the compression name of a file ("gzip", "bz2" or "xz") from its first bytes,
+        or None if it is not compressed (or is not a regular file).
+    """
+    if (None == file_name
+        or not os.path.isfile(file_name)
+    ):
+        return None
+    with open(file_name, mode='rb') as in_file:
+        magic_bytes = in_file.read(_magic_byte_count_max)
+    for (compression_name, compression_magic_bytes, open_file) in _compression_list:
+        if (magic_bytes.startswith(compression_magic_bytes)):
+            return compression_name
+    return None
+
+
+def strip_compressed_file_ext(file_name):
+    """ Remove a compressed file extension from a file name (e.g. "x.csv.gz" becomes "x.csv").
+    """
+    (file_base_name, file_ext) = os.path.splitext(file_name)
+    if (file_ext.lower() in compressed_file_ext_list):
+        return file_base_name
+    return file_name
+
+
+def open_compressed_file(file_name, compression_name):
+    """ Open a compressed file as a binary file of its decompressed bytes.
+    """
+    for (known_compression_name, compression_magic_bytes, open_file) in _compression_list:
+        if (known_compression_name == compression_name):
+            return open_file(file_name, mode='rb')
+    raise CompressedFileError("unknown compression {!r}".format(compression_name))
+
+
+def read_compressed_file_prefix(file_name, compression_name, byte_count):
+    """ Read up to byte_count decompressed bytes from the start of a compressed file.
+    """
+    try:
+        with open_compressed_file(file_name, compression_name) as in_file:
+            return in_file.read(byte_count)
+    except _decompression_error_class_tuple as e:
+        raise CompressedFileError("cannot decompress {} data ({})".format(compression_name, e))
+
+
+def open_table_file(file_name):
+    """ Open a table file as a binary file, decompressing it in a background thread if it is compressed.
+    """
+    compression_name = detect_file_compression_name(file_name)
+    if (None == compression_name):
+        return io.open(file_name, mode='rb')
+    return io.BufferedReader(
+        BackgroundReader(open_compressed_file(file_name, compression_name), compression_name)
+        ,buffer_size=background_chunk_byte_count
+        )
+
+
+class BackgroundReader(io.RawIOBase):
+    """ A raw binary stream of the bytes of another binary stream, which a background thread reads ahead.
+
+        The thread reads chunks of background_chunk_byte_count bytes
+        into a queue of at most background_chunk_count_max chunks,
+        and blocks while the queue is full.
+        An error of the other stream is raised by the next read of this stream
+        (as a CompressedFileError if the compressed data is damaged).
+        Closing this stream stops the thread and closes the other stream.
+    """
+
+    def __init__(self, in_file, compression_name=None):
+        io.RawIOBase.__init__(self)
+        self.in_file = in_file
+        self.compression_name = compression_name
+        self.chunk_queue = queue.Queue(background_chunk_count_max)
+        self.chunk_view = memoryview(b"")
+        self.is_at_end = False
+        self.stop_event = threading.Event()
+        self.read_thread = threading.Thread(target=self._read_chunks, daemon=True)
+        self.read_thread.start()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk_view = self.chunk_view
+        while (0 == len(chunk_view)):
+            if (self.is_at_end):
+                return 0
+            chunk = self.chunk_queue.get()
+            if (isinstance(chunk, Exception)):
+                self.is_at_end = True
+                if (isinstance(chunk, _decompression_error_class_tuple)):
+                    raise CompressedFileError("cannot decompress {} data ({})".format(self.compression_name, chunk))
+                raise chunk
+            if (0 == len(chunk)):
+                self.is_at_end = True
+                return 0
+            chunk_view = memoryview(chunk)
+        byte_count = min(len(buffer), len(chunk_view))
+        buffer[:byte_count] = chunk_view[:byte_count]
+        self.chunk_view = chunk_view[byte_count:]
+        return byte_count
+
+    def close(self):
+        if (not self.closed):
+            self.stop_event.set()
+            # make room in the queue for a thread that is waiting to add a chunk
+            while (self.read_thread.is_alive()):
+                try:
+                    self.chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            self.read_thread.join()
+            self.chunk_view = memoryview(b"")
+            self.in_file.close()
+        io.RawIOBase.close(self)
+
+    def _read_chunks(self):
+        # runs in the background thread; an empty chunk marks the end of the stream
+        chunk_queue = self.chunk_queue
+        stop_event = self.stop_event
+        try:
+            while (not stop_event.is_set()):
+                chunk = self.in_file.read(background_chunk_byte_count)
+                chunk_queue.put(chunk)
+                if (0 == len(chunk)):
+                    break
+        except Exception as e:
+            # the reader raises it, rather than waiting for a chunk that never comes
+            chunk_queue.put(e)
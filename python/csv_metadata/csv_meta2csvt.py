@@ -10,11 +10,16 @@ help_text = (
     "Creates a .csvt file from a CSV-Meta schema file.\n"
     "\n"
     "csv-meta2csvt [OPTIONS] InputFile\n"
+    "csv-meta2csvt [OPTIONS] InputFile|Directory|GlobPattern ...\n"
+    "\n"
+    "Given a directory, a glob pattern (e.g. 'data/**/*.schema.csv') or several input files,\n"
+    "converts every .schema.csv file found, skipping .csvt files that are newer than their schema.\n"
     "\n"
     "OPTIONS\n"
     "    -c      Write .csvt file to stdout\n"
     "    -E {E}  Input file text encoding (e.g. 'utf-8', 'windows-1252')\n"
-    "    --overwrite   Overwrite existing files\n"
+    "    -j {N}  Convert several files with N worker processes (default=1)\n"
+    "    --overwrite   Overwrite existing files (including up-to-date files in batch mode)\n"
     "\n"
 )
 
@@ -29,6 +34,26 @@ from ._csv_helpers import (
     ,decode_charset_name
     ,decode_newline
     )
+from .table_schema import (
+    read_table_schema
+    )
+from .batch_files import (
+    is_batch_path
+    ,find_batch_file_names
+    ,is_file_up_to_date
+    ,run_batch_tasks
+    )
+
+column_meta_file_ext = ".schema"
+csvt_file_ext = ".csvt"
+# .csvt types of the time formats that OGR reads
+csvt_time_type_name_dict = {
+     "YYYY-MM-DD": "Date"
+    ,"hh:mm:ss": "Time"
+    ,"YYYY-MM-DD hh:mm:ss": "DateTime"
+    ,"YYYY-MM-DDThh:mm:ss": "DateTime"
+    ,"YYYY-MM-DDThh:mm:ssZ": "DateTime"
+    }
 
 def main(arg_list, stdin, stdout, stderr):
     in_io = stdin
@@ -39,6 +64,7 @@ def main(arg_list, stdin, stdout, stderr):
     should_overwrite = False
     should_write_stdout =False
     input_file_name = None
+    input_file_name_list = list()
     output_file_name = None
     input_delimiter = ','
     input_quote_symbol = '"'
@@ -55,6 +81,7 @@ def main(arg_list, stdin, stdout, stderr):
     input_charset_error_mode = 'strict'
     csv_cell_width_limit = 4*1024*1024  # python default is 131072 = 0x00020000
     in_row_count_max = None
+    job_count = 1
     # [20160916 [db] I avoided using argparse in order to retain some flexibility for command syntax]
     arg_error = None
     arg_count = len(arg_list)
@@ -165,6 +192,13 @@ def main(arg_list, stdin, stdout, stderr):
             or arg == "--stdout"
         ):
             should_write_stdout = True
+        elif (arg == "-j"
+            or arg == "--jobs"
+        ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                job_count = int(arg)
         elif (arg == "-f"
             or arg == "--overwrite"
         ):
@@ -174,25 +208,25 @@ def main(arg_list, stdin, stdout, stderr):
           ):
             if (None == input_file_name):
                 input_file_name = arg
+            input_file_name_list.append(arg)
         arg_index += 1
     
+    should_run_batch = (
+        1 < len(input_file_name_list)
+        or (None != input_file_name and is_batch_path(input_file_name))
+        )
     if (None == input_file_name):
         show_help = True
         arg_error = "missing input file"
+    elif (should_run_batch):
+        if (should_write_stdout or None != output_file_name):
+            arg_error = "cannot use -c or -o with several input files"
     else:
-        column_meta_file_ext = ".schema"
-        csvt_file_ext = ".csvt"
-        (table_path, input_file_ext) = os.path.splitext(input_file_name)
-        #maybe assert input_file_ext == ".csv"
-        if (table_path.endswith(column_meta_file_ext)):
-            table_path = table_path[:-len(column_meta_file_ext)]
-        else:
-            # The user gave us the main table file,
-            #  but we want the .schema file:
-            input_file_name = table_path + column_meta_file_ext + input_file_ext
+        (input_file_name, csvt_file_name) = get_schema_file_names(input_file_name)
         if (None == output_file_name and not should_write_stdout):
-            output_file_name = table_path + csvt_file_ext
+            output_file_name = csvt_file_name
     if (None == arg_error
+        and not should_run_batch
         and None != output_file_name
         and os.path.exists(output_file_name) 
         and not should_overwrite
@@ -219,10 +253,30 @@ def main(arg_list, stdin, stdout, stderr):
         output_delimiter = decode_delimiter_name(output_delimiter) 
         in_file = None
         out_file = None
+        if (should_run_batch):
+            execute_batch(
+                 input_file_name_list
+                ,err_io
+                ,be_quiet
+                ,should_overwrite
+                ,job_count
+                ,(
+                     input_charset_name
+                    ,input_charset_error_mode
+                    ,input_row_terminator
+                    ,input_delimiter
+                    ,input_quote_symbol
+                    ,output_charset_name
+                    ,output_charset_error_mode
+                    ,output_row_terminator
+                    ,output_delimiter
+                    ,output_quote_symbol
+                    )
+                )
+            return
         try:
             read_text_io_mode = 'rt'
-            #in_newline_mode = ''  # don't translate newline chars
-            in_newline_mode = input_row_terminator
+            in_newline_mode = ''  # don't translate newline chars
             in_file_id = input_file_name
             in_close_file = True
             if (None == in_file_id):
@@ -289,12 +343,16 @@ def execute(
     ,err_io
     ,be_quiet
     ):
-    (column_name_list, schema_dict) = read_schema_dict(in_csv)
-    if (None != column_name_list and None != schema_dict):
+    table_schema = read_table_schema(in_csv)
+    if (None != table_schema):
         out_row = list()
-        for column_name in column_name_list:
-            column_info = schema_dict[column_name]
-            in_datatype_name = column_info.get("type", None)
+        datatype_name_list = table_schema.get_metafield_value_list("type")
+        if (None == datatype_name_list):
+            datatype_name_list = [None] * table_schema.column_count
+        format_list = table_schema.get_metafield_value_list("format")
+        if (None == format_list):
+            format_list = [None] * table_schema.column_count
+        for (in_datatype_name, in_format) in zip(datatype_name_list, format_list):
             out_datatype_name = "String"
             if (None == in_datatype_name):
                 out_datatype_name = "String"
@@ -302,105 +360,163 @@ def execute(
                 out_datatype_name = "Integer"
             elif (in_datatype_name in ("float", "numeric", "decimal")):
                 out_datatype_name = "Real"
+            elif (in_datatype_name in ("bool", "boolean")
+                and "1/0" == in_format
+            ):
+                # OGR reads other boolean values as strings
+                out_datatype_name = "Integer(Boolean)"
+            elif ("time" == in_datatype_name):
+                # other time formats are not read by OGR, so they stay strings
+                out_datatype_name = csvt_time_type_name_dict.get(in_format, "String")
             out_row.append(out_datatype_name)
         out_csv.writerow(out_row)
 
 
+def get_schema_file_names(input_file_name):
+    """ Get the names of the schema file and the .csvt file for a schema file name or a table file name.
+
+        Returns a tuple (schema_file_name, csvt_file_name).
+    """
+    (table_path, input_file_ext) = os.path.splitext(input_file_name)
+    #maybe assert input_file_ext == ".csv"
+    if (table_path.endswith(column_meta_file_ext)):
+        table_path = table_path[:-len(column_meta_file_ext)]
+    else:
+        # The user gave us the main table file,
+        #  but we want the .schema file:
+        input_file_name = table_path + column_meta_file_ext + input_file_ext
+    return (input_file_name, table_path + csvt_file_ext)
+
+
+def is_schema_file_name(file_name):
+    return file_name.endswith(column_meta_file_ext + ".csv")
+
+
+def convert_schema_file(
+    schema_file_name
+    ,csvt_file_name
+    ,input_charset_name
+    ,input_charset_error_mode
+    ,input_row_terminator
+    ,input_delimiter
+    ,input_quote_symbol
+    ,output_charset_name
+    ,output_charset_error_mode
+    ,output_row_terminator
+    ,output_delimiter
+    ,output_quote_symbol
+    ):
+    """ Write a .csvt file for a schema file.
+
+        The schema file is read before the .csvt file is created,
+        and a .csvt file that could not be written completely is removed,
+        so that it is not mistaken for an up-to-date file later.
+    """
+    with io.open(
+         schema_file_name
+        ,mode='rt'
+        ,encoding=input_charset_name
+        ,newline=''  # don't translate newline chars
+        ,errors=input_charset_error_mode
+    ) as in_file:
+        in_csv = csv.reader(
+            in_file
+            ,delimiter=input_delimiter
+            ,lineterminator=input_row_terminator
+            ,quotechar=input_quote_symbol
+            )
+        in_row_list = list(in_csv)
+    # an incomplete .csvt file is removed, also when the conversion is interrupted (e.g. by KeyboardInterrupt)
+    is_complete = False
+    try:
+        with io.open(
+             csvt_file_name
+            ,mode='wt'
+            ,encoding=output_charset_name
+            ,newline=''  # don't translate newline chars
+            ,errors=output_charset_error_mode
+        ) as out_file:
+            out_csv = csv.writer(
+                out_file
+                ,delimiter=output_delimiter
+                ,lineterminator=output_row_terminator
+                ,quotechar=output_quote_symbol
+                )
+            execute(
+                 iter(in_row_list)
+                ,out_csv
+                ,None
+                ,True
+                )
+        is_complete = True
+    finally:
+        if (not is_complete
+            and os.path.exists(csvt_file_name)
+        ):
+            os.remove(csvt_file_name)
+
+
+def execute_batch(
+     input_file_name_list
+    ,err_io
+    ,be_quiet
+    ,should_overwrite
+    ,job_count
+    ,conversion_arg_tuple
+    ):
+    """ Convert the schema files named by a list of file names, directories and glob patterns.
+
+        conversion_arg_tuple holds the charset, delimiter and quote arguments of convert_schema_file().
+        .csvt files that are newer than their schema file are skipped unless should_overwrite is True.
+        Returns a tuple of counts (converted_file_count, skipped_file_count, failed_file_count).
+    """
+    task_arg_tuple_list = list()
+    skipped_file_count = 0
+    for input_file_name in find_batch_file_names(input_file_name_list, is_schema_file_name):
+        (schema_file_name, csvt_file_name) = get_schema_file_names(input_file_name)
+        if (not should_overwrite
+            and is_file_up_to_date(csvt_file_name, schema_file_name)
+        ):
+            skipped_file_count += 1
+            continue
+        task_arg_tuple_list.append((schema_file_name, csvt_file_name) + conversion_arg_tuple)
+    converted_file_count = 0
+    failed_file_count = 0
+    for (task_arg_tuple, task_result, e) in run_batch_tasks(convert_schema_file, task_arg_tuple_list, job_count):
+        (schema_file_name, csvt_file_name) = task_arg_tuple[:2]
+        if (None != e):
+            failed_file_count += 1
+            err_io.write("Error: {}: {}\n".format(schema_file_name, e))
+        else:
+            converted_file_count += 1
+            if (not be_quiet):
+                err_io.write("Created file: {}\n".format(csvt_file_name))
+    if (not be_quiet):
+        err_io.write("Converted {} files, skipped {} up-to-date files, {} failed.\n".format(
+            converted_file_count
+            ,skipped_file_count
+            ,failed_file_count
+            ))
+    return (converted_file_count, skipped_file_count, failed_file_count)
+
+
 def read_schema_dict(in_csv):
     """ Read table schema information into a dict of metafield dicts. 
     
         Returns an ordered list of table column names
         And a dictionary of column names to metafield dicts.
+        When a metafield name is repeated, the dicts hold its last value;
+        use table_schema.read_table_schema() to keep every value.
     """
-    end_row = None
-    in_header_row = next(in_csv, end_row)
-    in_column_position = 0
-    in_column_count = 0
-    if (None != in_header_row):
-        in_column_count = len(in_header_row)
-    initial_cell_value = None
-    if (in_column_count > in_column_position):
-        initial_cell_value = in_header_row[in_column_position]
-        in_column_position += 1
-    schema_dict = None
-    table_column_name_list = None
-    if (None == in_header_row):
-        pass
-    elif (None == initial_cell_value or 0 == len(initial_cell_value)):
-        # transposed format: table columns declared in subsequent columns of schema
-        table_column_name_list = list()
-        table_column_count = 0
-        while (in_column_count > in_column_position):
-            column_name = in_header_row[in_column_position]
-            table_column_name_list.append(column_name)
-            in_column_position += 1
-            table_column_count += 1
-        column_info_list = list()
-        for column_name in table_column_name_list:
-            column_info_list.append(dict())
-        in_row = next(in_csv, end_row)
-        while (end_row != in_row):
-            in_column_position = 0
-            in_column_count = len(in_row)
-            metafield_name = None
-            if (in_column_count > in_column_position):
-                metafield_name = in_row[in_column_position]
-            in_column_position += 1
-            table_column_position = 0
-            while (in_column_count > in_column_position
-                    and table_column_count > table_column_position
-                ):
-                column_info = column_info_list[table_column_position]
-                metafield_value = in_row[in_column_position]
-                column_info[metafield_name] = metafield_value
-                table_column_position += 1
-                in_column_position += 1
-            in_row = next(in_csv, end_row)
-        schema_dict = dict()
-        table_column_position = 0
-        while (table_column_count > table_column_position):
-            column_name = table_column_name_list[table_column_position]
-            column_info = column_info_list[table_column_position]
-            schema_dict[column_name] = column_info
-            table_column_position += 1
-    elif ("name" == initial_cell_value):
-        # canonical format: table columns declared per row of schema
-        metafield_name_list = list()
-        metafield_column_count = 0
-        while (in_column_count > in_column_position):
-            metafield_name = in_header_row[in_column_position]
-            metafield_name_list.append(metafield_name)
-            metafield_column_count += 1
-            in_column_position += 1
-        schema_dict = dict()
-        table_column_name_list = list()
-        in_row = next(in_csv, end_row)
-        while (end_row != in_row):
-            in_column_count = len(in_row)
-            in_column_position = 0
-            column_name = None
-            column_info = None
-            if (in_column_count > in_column_position):
-                column_name = in_row[in_column_position]
-                column_info = dict()
-            in_column_position += 1
-            metafield_column_position = 0
-            while (in_column_count > in_column_position
-                    and metafield_column_count > metafield_column_position
-                ):
-                metafield_name = metafield_name_list[metafield_column_position]
-                metafield_value = in_row[in_column_position]
-                column_info[metafield_name] = metafield_value
-                metafield_column_position += 1
-                in_column_position += 1
-            if (None != column_info):
-                table_column_name_list.append(column_name)
-                schema_dict[column_name] = column_info
-            in_row = next(in_csv, end_row)
-    else:
-        # unknown format
-        pass
-    return (table_column_name_list, schema_dict)
+    table_schema = read_table_schema(in_csv)
+    if (None == table_schema):
+        return (None, None)
+    schema_dict = dict()
+    column_position = 0
+    for column_name in table_schema.column_name_list:
+        schema_dict[column_name] = table_schema.get_column_dict_at(column_position)
+        column_position += 1
+    return (table_schema.column_name_list, schema_dict)
 
 
 def console_main():
@@ -0,0 +1,380 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## #python-3.x
+## python 2 does not work due mostly to issues with csv and io modules with unicode data
+
+help_text = (
+    "CSV-METACHECK tool version 20181014:20181014\n"
+    "Checks a CSV table file against its CSV-Meta schema file.\n"
+    "\n"
+    "csv-metacheck [OPTIONS] InputFile\n"
+    "\n"
+    "Reads the table once and checks each cell against the type, size and format\n"
+    "of its column in the .schema.csv file, and each key ('pkey' or 'key' metafield) for unique values.\n"
+    "Writes the violations found as CSV rows (row,column,value,problem) to stdout,\n"
+    "and exits with status 1 if there are any (2 if the table or schema can't be read).\n"
+    "\n"
+    "The input file is read like csv-mkmeta reads it: its charset and dialect are detected by default,\n"
+    "and a compressed file (e.g. 'x.csv.gz') is decompressed as it is read.\n"
+    "\n"
+    "OPTIONS\n"
+    "    -E {E}  Input file text encoding (e.g. 'utf-8', 'windows-1252'),\n"
+    "            or 'auto' to detect it from a sample of the file (default='auto')\n"
+    "    -S {S}  Input file delimiter (e.g. ',', 'tab', 'pipe', 'semicolon'),\n"
+    "            or 'auto' to detect it (and the quote) from the first rows of the file (default='auto')\n"
+    "    -W {W}  Input file newline ('lf', 'crlf', 'cr'), or 'auto' (default='auto')\n"
+    "    -K {K}  Report the first K violations of each column (default=10, or 'all')\n"
+    "    -N {N}  Check the first N rows of the input file (default='all')\n"
+    "    -q      Quiet mode (don't write a summary to stderr)\n"
+    "    --schema {F}  Schema file (default is the .schema.csv file of the input file);\n"
+    "                  it is read with the charset of the input file, and its own dialect\n"
+    "\n"
+)
+
+import sys
+import csv
+import io
+import os
+
+from ._csv_helpers import (
+    decode_delimiter_name
+    ,decode_charset_name
+    ,decode_newline
+    )
+from .charset_detection import (
+    charset_name_auto
+    ,resolve_file_charset_name
+    )
+from .dialect_detection import (
+    dialect_name_auto
+    ,resolve_file_dialect
+    )
+from .compressed_input import (
+    open_table_file
+    ,strip_compressed_file_ext
+    )
+from .table_schema import (
+    read_table_schema
+    )
+from .table_check import (
+    check_table_rows
+    )
+
+column_meta_file_ext = ".schema.csv"
+utf8_sig_charset_name = 'utf_8_sig'
+utf8_nosig_charset_name = 'utf_8'
+
+exit_status_ok = 0
+exit_status_violation = 1
+exit_status_error = 2
+
+def main(arg_list, stdin, stdout, stderr):
+    """ Run the tool and return its exit status.
+    """
+    out_io = stdout
+    err_io = stderr
+    show_help = False
+    be_quiet = False
+    input_file_name = None
+    schema_file_name = None
+    input_delimiter = dialect_name_auto
+    output_delimiter = ','
+    # 'std' will be translated to the standard line break decided by csv_helpers.decode_newline
+    input_row_terminator = dialect_name_auto
+    output_row_terminator = 'std'
+    input_charset_name = charset_name_auto
+    output_charset_name = None
+    input_charset_error_mode = 'strict'
+    in_row_count_max = None
+    reported_violation_count_max = 10
+    arg_error = None
+    arg_count = len(arg_list)
+    arg_index = 1
+    while (arg_index < arg_count):
+        arg = arg_list[arg_index]
+        if (arg == "--help"
+          or arg == "-?"
+          ):
+            show_help = True
+        if (arg == "-q"
+            or arg == "--quiet"
+        ):
+            be_quiet = True
+        elif (arg == "-E"
+          or arg == "--charset-in"
+          or arg == "--encoding-in"
+          ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                input_charset_name = arg
+        elif (arg == "-e"
+          or arg == "--charset-out"
+          or arg == "--encoding-out"
+          ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                output_charset_name = arg
+        elif (arg == "--charset-in-error-mode"
+        ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                input_charset_error_mode = arg
+        elif (arg == "-S"
+          or arg == "--separator-in"
+          or arg == "--delimiter-in"
+          ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                input_delimiter = arg
+        elif (arg == "-s"
+          or arg == "--separator-out"
+          or arg == "--delimiter-out"
+          ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                output_delimiter = arg
+        elif (arg == "-W"
+          or arg == "--terminator-in"
+          or arg == "--newline-in"
+          or arg == "--endline-in"
+          ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                input_row_terminator = arg
+        elif (arg == "-w"
+          or arg == "--terminator-out"
+          or arg == "--newline-out"
+          or arg == "--endline-out"
+          ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                output_row_terminator = arg
+        elif (arg == "-N"
+            or arg == "--max-rows-in"
+        ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                if ("all" == arg.lower()):
+                    in_row_count_max = None
+                else:
+                    in_row_count_max = int(arg)
+        elif (arg == "-K"
+            or arg == "--max-violations"
+        ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                if ("all" == arg.lower()):
+                    reported_violation_count_max = None
+                else:
+                    reported_violation_count_max = int(arg)
+        elif (arg == "--schema"):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                schema_file_name = arg
+        elif (None != arg
+          and 0 < len(arg)
+          ):
+            if (None == input_file_name):
+                input_file_name = arg
+            else:
+                arg_error = "unexpected argument: {}".format(arg)
+        arg_index += 1
+
+    if (None == input_file_name):
+        show_help = True
+        arg_error = "missing input file"
+    elif (None == schema_file_name):
+        (table_base_name, table_file_ext) = os.path.splitext(strip_compressed_file_ext(input_file_name))
+        schema_file_name = table_base_name + column_meta_file_ext
+    if (None != arg_error):
+        if (show_help):
+            err_io.write(help_text)
+        err_io.write("Error: {}\n".format(arg_error))
+        return exit_status_error
+    if (show_help):
+        out_io.write(help_text)
+        return exit_status_ok
+    input_charset_name = decode_charset_name(input_charset_name)
+    output_charset_name = decode_charset_name(output_charset_name)
+    input_row_terminator = decode_newline(input_row_terminator)
+    output_row_terminator = decode_newline(output_row_terminator)
+    input_delimiter = decode_delimiter_name(input_delimiter)
+    output_delimiter = decode_delimiter_name(output_delimiter)
+    try:
+        return execute(
+             out_io
+            ,err_io
+            ,be_quiet
+            ,input_file_name
+            ,schema_file_name
+            ,input_charset_name
+            ,input_charset_error_mode
+            ,input_row_terminator
+            ,input_delimiter
+            ,output_charset_name
+            ,output_delimiter
+            ,output_row_terminator
+            ,in_row_count_max
+            ,reported_violation_count_max
+            )
+    except BrokenPipeError:
+        return exit_status_error
+    except (OSError, ValueError) as e:
+        err_io.write("Error: {}\n".format(e))
+        return exit_status_error
+
+
+def execute(
+     out_io
+    ,err_io
+    ,be_quiet
+    ,input_file_name
+    ,schema_file_name
+    ,input_charset_name
+    ,input_charset_error_mode
+    ,input_row_terminator
+    ,input_delimiter
+    ,output_charset_name
+    ,output_delimiter
+    ,output_row_terminator
+    ,in_row_count_max
+    ,reported_violation_count_max
+    ):
+    """ Check a table file against a schema file and report the violations.
+
+        An input charset, delimiter or newline of 'auto' is detected from the input file
+        (the quote symbol is detected along with the delimiter),
+        and an output charset of None follows the input charset.
+    """
+    input_charset_name = resolve_file_charset_name(
+        input_file_name
+        ,input_charset_name
+        ,input_charset_error_mode
+        )
+    if (None == output_charset_name):
+        output_charset_name = input_charset_name
+        # special case to avoid BOM signatures in output
+        if (utf8_sig_charset_name == output_charset_name):
+            output_charset_name = utf8_nosig_charset_name
+    (input_delimiter, input_quote_symbol, input_row_terminator) = resolve_file_dialect(
+        input_file_name
+        ,input_charset_name
+        ,input_delimiter
+        ,input_row_terminator
+        )
+    (schema_delimiter, schema_quote_symbol, schema_row_terminator) = resolve_file_dialect(
+        schema_file_name
+        ,input_charset_name
+        ,dialect_name_auto
+        ,dialect_name_auto
+        )
+    with io.open(
+         schema_file_name
+        ,mode='rt'
+        ,encoding=input_charset_name
+        ,newline=''  # don't translate newline chars
+        ,errors=input_charset_error_mode
+    ) as in_file:
+        table_schema = read_table_schema(csv.reader(
+             in_file
+            ,delimiter=schema_delimiter
+            ,lineterminator=schema_row_terminator
+            ,quotechar=schema_quote_symbol
+            ))
+    if (None == table_schema):
+        err_io.write("Error: {}: not a schema file\n".format(schema_file_name))
+        return exit_status_error
+    with io.TextIOWrapper(
+         open_table_file(input_file_name)
+        ,encoding=input_charset_name
+        ,newline=''  # don't translate newline chars
+        ,errors=input_charset_error_mode
+    ) as in_file:
+        check_result = check_table_rows(
+             csv.reader(
+                 in_file
+                ,delimiter=input_delimiter
+                ,lineterminator=input_row_terminator
+                ,quotechar=input_quote_symbol
+                )
+            ,table_schema
+            ,reported_violation_count_max
+            ,in_row_count_max
+            )
+    violation_count = check_result.violation_count
+    if (0 < violation_count):
+        out_file = None
+        if (_has_file_descriptor(out_io)):
+            # write the output charset to the file under a real text file (e.g. stdout),
+            #  but write str rows to other text streams (e.g. a StringIO)
+            out_io.flush()
+            out_io = out_file = io.open(
+                 out_io.fileno()
+                ,mode='wt'
+                ,encoding=output_charset_name
+                ,newline=''  # don't translate newline chars
+                ,closefd=False
+                )
+        try:
+            out_csv = csv.writer(
+                 out_io
+                ,delimiter=output_delimiter
+                ,lineterminator=output_row_terminator
+                )
+            out_csv.writerow(["row", "column", "value", "problem"])
+            for violation in check_result.violation_list:
+                out_csv.writerow([
+                     violation.row_number
+                    ,violation.column_name
+                    ,violation.cell_value
+                    ,violation.message
+                    ])
+        finally:
+            if (None != out_file):
+                out_file.close()
+    if (not be_quiet):
+        if (0 == violation_count):
+            err_io.write("{}: {} rows agree with {}\n".format(
+                 input_file_name
+                ,check_result.row_count
+                ,schema_file_name
+                ))
+        else:
+            err_io.write("{}: {} violations in {} columns ({} reported) in {} rows\n".format(
+                 input_file_name
+                ,violation_count
+                ,len(check_result.violation_count_dict)
+                ,len(check_result.violation_list)
+                ,check_result.row_count
+                ))
+    if (0 < violation_count):
+        return exit_status_violation
+    return exit_status_ok
+
+
+def _has_file_descriptor(out_io):
+    try:
+        out_io.fileno()
+    except (AttributeError, OSError):
+        # (io.UnsupportedOperation is an OSError)
+        return False
+    return True
+
+
+def console_main():
+    sys.exit(main(sys.argv, sys.stdin, sys.stdout, sys.stderr))
+
+
+if __name__ == "__main__":
+    console_main()
@@ -11,26 +11,129 @@ help_text = (
     "Creates CSV Metadata supplementary files by analyzing a CSV table file\n"
     "\n"
     "csv-mkmeta [OPTIONS] InputFile\n"
+    "csv-mkmeta [OPTIONS] --merge-profile ProfileFile [ProfileFile ...]\n"
+    "csv-mkmeta [OPTIONS] InputFile|Directory|GlobPattern ...\n"
+    "csv-mkmeta [OPTIONS] --file-list {F}\n"
+    "\n"
+    "Given a directory, a glob pattern (e.g. 'data/**/*.csv'), a file list or several input files,\n"
+    "analyzes every .csv table file found, largest first, with -j worker processes,\n"
+    "skipping tables whose .meta.csv and .schema.csv files are newer than the table\n"
+    "(or whose .archive.csv file is, with --format archive).\n"
+    "\n"
+    "Input files compressed with gzip, bzip2 or xz (e.g. 'x.csv.gz') are decompressed as they are read,\n"
+    "and their metadata files are named without the compressed extension (e.g. 'x.schema.csv');\n"
+    "a compressed file is always read from start to end (-j, --sample, --incremental and mmap don't apply).\n"
     "\n"
     "OPTIONS\n"
-    "    -E {E}  Input file text encoding (e.g. 'utf-8', 'windows-1252')\n"
+    "    -E {E}  Input file text encoding (e.g. 'utf-8', 'windows-1252'),\n"
+    "            or 'auto' to detect it from a sample of the file (default='auto')\n"
+    "    -S {S}  Input file delimiter (e.g. ',', 'tab', 'pipe', 'semicolon'),\n"
+    "            or 'auto' to detect it (and the quote) from the first rows of the file (default='auto')\n"
+    "    -W {W}  Input file newline ('lf', 'crlf', 'cr'), or 'auto' (default='auto')\n"
     "    -N {N}  Analyze the first N rows of the input file (default='all')\n"
+    "    -j {N}  Analyze the input file with N worker processes (default=1)\n"
+    "            (or analyze N input files at a time in batch mode)\n"
+    "    --file-list {F}  Analyze the table files named on the lines of file F ('-' for stdin)\n"
+    "    --sample {N}  Analyze about N rows sampled from across the input file\n"
+    "                  (or its first N rows, if it can't be split, e.g. a UTF-16 or compressed file)\n"
+    "    --approx-size Stop reading once every column is known to be varchar\n"
+    "                  (varchar sizes are then only a lower bound)\n"
+    "    --sketch      Also estimate the number of distinct values and the most frequent values\n"
+    "                  of each column (distinct_approx, top_values and top_value_counts metafields),\n"
+    "                  the values of columns that have only a few (code_list metafield)\n"
+    "                  and the range, mean, standard deviation and quartiles of number columns\n"
+    "                  (min, max, mean, stddev and quartiles metafields)\n"
+    "    --engine {E}  Row scanner: 'csv' (default), 'mmap' (scan file bytes directly)\n"
+    "                  or 'numpy' (profile batches of rows with NumPy)\n"
     "    -q      Quiet mode\n"
-    "    --overwrite   Overwrite existing files\n"
+    "    --overwrite   Overwrite existing files (including up-to-date files in batch mode)\n"
+    "    --format {F}  'transposed' schema file, or 'archive' to write the metadata and the data\n"
+    "                  to one .archive.csv file (reusing an existing .schema.csv file)\n"
+    "    --profile     Also write column statistics to a .profile.csv file (utf-8, ',' delimited)\n"
+    "    --merge-profile  Merge .profile.csv files instead of reading a table\n"
+    "    --incremental    Only analyze rows appended since the last --incremental run\n"
     "\n"
 )
 
 import sys
 import csv
+import functools
 import io
 import os
-import re
 
 from ._csv_helpers import (
     decode_delimiter_name
+    ,encode_delimiter_name
     ,decode_charset_name
     ,decode_newline
     )
+from .table_profile import (
+    ProfileFormatError
+    ,profile_file_charset_name
+    ,profile_file_delimiter
+    ,read_table_profile
+    ,read_profile_file_list
+    )
+from .charset_detection import (
+    CharsetMismatchError
+    ,charset_name_auto
+    ,resolve_file_charset_name
+    )
+from .dialect_detection import (
+    dialect_name_auto
+    ,resolve_file_dialect
+    )
+from .compressed_input import (
+    CompressedFileError
+    ,detect_file_compression_name
+    ,open_table_file
+    ,strip_compressed_file_ext
+    )
+from .parallel_profile import (
+    can_split_table_file
+    ,read_table_profile_parallel
+    )
+from .incremental_profile import (
+    read_table_profile_incremental
+    )
+from .sample_profile import (
+    read_table_profile_sample
+    )
+from .table_schema import (
+    read_table_schema
+    ,table_schema_from_profile
+    )
+from .archive_file import (
+    archive_file_ext
+    ,archive_write_buffer_byte_count
+    ,write_archive_head_rows
+    ,write_archive_data
+    )
+from .batch_files import (
+    is_batch_path
+    ,find_batch_file_names
+    ,is_file_up_to_date
+    ,run_batch_tasks
+    )
+from .profile_table import (
+    engine_name_csv
+    ,engine_name_mmap
+    ,engine_name_numpy
+    ,engine_name_list
+    )
+from .mmap_profile import (
+    read_table_profile_mmap
+    )
+from .numpy_profile import (
+    is_numpy_available
+    ,read_table_profile_numpy
+    )
+
+column_meta_file_ext = ".schema.csv"
+table_meta_file_ext = ".meta.csv"
+profile_file_ext_prefix = ".profile"
+profile_file_ext = profile_file_ext_prefix + ".csv"
+table_file_ext = ".csv"
 
 def main(arg_list, stdin, stdout, stderr):
     in_io = stdin
@@ -40,15 +143,15 @@ def main(arg_list, stdin, stdout, stderr):
     be_quiet = False
     should_overwrite = False
     input_file_name = None
+    input_file_name_list = list()
+    input_list_file_name = None
     output_file_name = None
-    input_delimiter = ','
+    input_delimiter = dialect_name_auto
     output_delimiter = ','
     # 'std' will be translated to the standard line break decided by csv_helpers.decode_newline
-    input_row_terminator = 'std'
+    input_row_terminator = dialect_name_auto
     output_row_terminator = 'std'
-    utf8_sig_charset_name = 'utf_8_sig'
-    utf8_nosig_charset_name = 'utf_8'
-    input_charset_name = utf8_sig_charset_name
+    input_charset_name = charset_name_auto
     output_charset_name = None
     output_charset_error_mode = 'strict'
     input_charset_error_mode = 'strict'
@@ -56,6 +159,14 @@ def main(arg_list, stdin, stdout, stderr):
     file_format_name = None
     file_format_variant = 0
     in_row_count_max = None
+    job_count = 1
+    sample_row_count = None
+    should_stop_when_settled = False
+    should_sketch_values = False
+    should_write_profile_file = False
+    should_merge_profile_files = False
+    should_profile_incrementally = False
+    engine_name = engine_name_csv
     # [20160916 [db] I avoided using argparse in order to retain some flexibility for command syntax]
     arg_error = None
     arg_count = len(arg_list)
@@ -162,10 +273,42 @@ def main(arg_list, stdin, stdout, stderr):
                     in_row_count_max = None
                 else:
                     in_row_count_max = int(arg)
+        elif (arg == "-j"
+            or arg == "--jobs"
+        ):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                job_count = int(arg)
+        elif (arg == "--sample"):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                sample_row_count = int(arg)
+        elif (arg == "--approx-size"):
+            should_stop_when_settled = True
+        elif (arg == "--sketch"):
+            should_sketch_values = True
+        elif (arg == "--engine"):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                engine_name = arg
         elif (arg == "-f"
             or arg == "--overwrite"
         ):
             should_overwrite = True
+        elif (arg == "--profile"):
+            should_write_profile_file = True
+        elif (arg == "--merge-profile"):
+            should_merge_profile_files = True
+        elif (arg == "--incremental"):
+            should_profile_incrementally = True
+        elif (arg == "--file-list"):
+            if (arg_index < arg_count):
+                arg_index += 1
+                arg = arg_list[arg_index]
+                input_list_file_name = arg
         elif (arg == "--format"):
             if (arg_index < arg_count):
                 arg_index += 1
@@ -176,16 +319,39 @@ def main(arg_list, stdin, stdout, stderr):
           ):
             if (None == input_file_name):
                 input_file_name = arg
+            input_file_name_list.append(arg)
         arg_index += 1
     
+    if (None != input_list_file_name):
+        input_file_name_list += read_file_name_list(input_list_file_name, in_io)
+        if (None == input_file_name and 0 < len(input_file_name_list)):
+            input_file_name = input_file_name_list[0]
+    should_run_batch = (
+        not should_merge_profile_files
+        and (
+            None != input_list_file_name
+            or 1 < len(input_file_name_list)
+            or (None != input_file_name and is_batch_path(input_file_name))
+            )
+        )
     if (None == input_file_name):
         show_help = True
         arg_error = "missing input file"
+    elif (should_run_batch
+        and (None != output_file_name or should_profile_incrementally)
+    ):
+        arg_error = "cannot use -o or --incremental with several input files"
+    if (engine_name not in engine_name_list):
+        arg_error = "unknown engine: {}".format(engine_name)
     if (None != file_format_name):
         if ("transposed" == file_format_name):
             file_format_variant = 1
         if ("archive" == file_format_name):
             file_format_variant = 2
+    if (2 == file_format_variant
+        and should_merge_profile_files
+    ):
+        arg_error = "cannot write an archive from profile files"
 
     if (None != arg_error):
         if (show_help):
@@ -194,68 +360,490 @@ def main(arg_list, stdin, stdout, stderr):
     elif (show_help):
         out_io.write(help_text)
     else:
-        if (None == output_charset_name):
-            # special case to avoid BOM signatures in output files
-            if (utf8_sig_charset_name == input_charset_name):
-                output_charset_name = utf8_nosig_charset_name
-            else:
-                output_charset_name = input_charset_name
+        if (None == output_charset_name
+            and charset_name_auto != input_charset_name
+        ):
+            # (a detected input charset decides the output charset of each file, see execute_file())
+            output_charset_name = get_output_charset_name(input_charset_name)
         input_charset_name = decode_charset_name(input_charset_name)
         output_charset_name = decode_charset_name(output_charset_name)
         input_row_terminator = decode_newline(input_row_terminator)
         output_row_terminator = decode_newline(output_row_terminator)
         input_delimiter = decode_delimiter_name(input_delimiter)
         output_delimiter = decode_delimiter_name(output_delimiter) 
-        in_file = None
-        out_file = None
+        if (should_run_batch):
+            execute_batch(
+                 input_file_name_list
+                ,err_io
+                ,be_quiet
+                ,should_overwrite
+                ,job_count
+                ,(
+                     file_format_variant
+                    ,input_charset_name
+                    ,input_charset_error_mode
+                    ,input_row_terminator
+                    ,input_delimiter
+                    ,output_charset_name
+                    ,output_delimiter
+                    ,output_row_terminator
+                    ,in_row_count_max
+                    ,sample_row_count
+                    ,should_stop_when_settled
+                    ,should_write_profile_file
+                    ,engine_name
+                    ,should_sketch_values
+                    )
+                )
+            return
         try:
+            execute_file(
+                 in_io
+                ,err_io
+                ,be_quiet
+                ,should_overwrite
+                ,file_format_variant
+                ,input_file_name
+                ,input_file_name_list
+                ,output_file_name
+                ,input_charset_name
+                ,input_charset_error_mode
+                ,input_row_terminator
+                ,input_delimiter
+                ,output_charset_name
+                ,output_delimiter
+                ,output_row_terminator
+                ,in_row_count_max
+                ,job_count
+                ,sample_row_count
+                ,should_stop_when_settled
+                ,should_write_profile_file
+                ,should_merge_profile_files
+                ,should_profile_incrementally
+                ,engine_name
+                ,should_sketch_values
+                )
+        except BrokenPipeError:
+            pass
+        except ProfileFormatError as e:
+            err_io.write("Error: {}\n".format(e))
+        except (CharsetMismatchError, CompressedFileError) as e:
+            err_io.write("Error: {}: {}\n".format(input_file_name, e))
+
+def execute_file(
+    in_io
+    ,err_io
+    ,be_quiet
+    ,should_overwrite
+    ,file_format_variant
+    ,input_file_name
+    ,input_file_name_list
+    ,output_file_name
+    ,input_charset_name
+    ,input_charset_error_mode
+    ,input_row_terminator
+    ,input_delimiter
+    ,output_charset_name
+    ,output_delimiter
+    ,output_row_terminator
+    ,in_row_count_max
+    ,job_count
+    ,sample_row_count
+    ,should_stop_when_settled
+    ,should_write_profile_file
+    ,should_merge_profile_files
+    ,should_profile_incrementally
+    ,engine_name
+    ,should_sketch_values
+    ):
+    """ Create the metadata files of one input table (or of merged partial profiles).
+
+        Charset, delimiter and newline names must already be decoded.
+        An input delimiter or newline of 'auto' is detected from the first rows of the input file
+        (see dialect_detection), and so is the quote symbol along with the delimiter.
+        An input charset of 'auto' is detected from a sample of the input file
+        (and then also decides the output charset, if output_charset_name is None);
+        with the 'strict' error mode, a charset that doesn't decode the sample
+        raises CharsetMismatchError before the file is read.
+    """
+    in_file = None
+    out_file = None
+    try:
+        input_charset_name = resolve_file_charset_name(
+            input_file_name
+            ,input_charset_name
+            ,input_charset_error_mode
+            )
+        if (None == output_charset_name):
+            output_charset_name = get_output_charset_name(input_charset_name)
+        in_csv = None
+        table_file_name = input_file_name
+        if (should_merge_profile_files):
+            table_profile_reader = functools.partial(
+                read_profile_file_list
+                ,input_file_name_list
+                )
+            # name the table after the first profile file, without its .profile.csv extension
+            (table_base_name, table_file_ext) = os.path.splitext(input_file_name)
+            if (table_base_name.endswith(profile_file_ext_prefix)):
+                table_base_name = table_base_name[:-len(profile_file_ext_prefix)]
+            table_file_name = table_base_name + table_file_ext
+        else:
+            (input_delimiter, input_quote_symbol, input_row_terminator) = resolve_file_dialect(
+                input_file_name
+                ,input_charset_name
+                ,input_delimiter
+                ,input_row_terminator
+                )
             read_text_io_mode = 'rt'
-            #in_newline_mode = ''  # don't translate newline chars
+            # the input newline only decides where byte ranges of the file are split:
+            #  the csv module splits the rows on any newline itself,
+            #  so a file whose rows don't all end like its first line is still read
             in_newline_mode = input_row_terminator
             in_file_id = input_file_name
             in_close_file = True
             if (None == in_file_id):
                 in_file_id = in_io.fileno()
                 in_close_file = False
-            in_io = io.open(
-                 in_file_id
-                ,mode=read_text_io_mode
-                ,encoding=input_charset_name
-                ,newline=in_newline_mode
-                ,errors=input_charset_error_mode
-                ,closefd=in_close_file
-                )
+            if (None != detect_file_compression_name(input_file_name)):
+                # decompressed by a background thread while the rows are read
+                in_io = io.TextIOWrapper(
+                     open_table_file(input_file_name)
+                    ,encoding=input_charset_name
+                    ,newline=''  # don't translate newline chars
+                    ,errors=input_charset_error_mode
+                    )
+            else:
+                in_io = io.open(
+                     in_file_id
+                    ,mode=read_text_io_mode
+                    ,encoding=input_charset_name
+                    ,newline=''  # don't translate newline chars
+                    ,errors=input_charset_error_mode
+                    ,closefd=in_close_file
+                    )
             if (in_close_file):
                 in_file = in_io
 
             in_csv = csv.reader(
                  in_io
                 ,delimiter=input_delimiter
+                ,quotechar=input_quote_symbol
                 ,lineterminator=input_row_terminator
                 )
 
-            table_file_name = input_file_name
-            if (None != output_file_name):
-                table_file_name = output_file_name
-            execute(
-                 in_csv
-                ,err_io
+            can_split_input_file = can_split_table_file(
+                input_file_name
+                ,input_charset_name
+                ,input_row_terminator
+                ,input_delimiter
+                ,input_quote_symbol
+                )
+            if (None != sample_row_count
+                and not can_split_input_file
+            ):
+                # without random access, the best we can do is the head of the input
+                if (not be_quiet):
+                    err_io.write("Cannot sample this input, analyzing the first {} rows.\n".format(sample_row_count))
+                in_row_count_max = sample_row_count
+                sample_row_count = None
+            can_map_input_file = can_split_input_file
+            if (None != in_row_count_max):
+                can_split_input_file = False
+            if (engine_name_mmap == engine_name
+                and not can_map_input_file
+            ):
+                engine_name = engine_name_csv
+                if (not be_quiet):
+                    err_io.write("Cannot scan this input with the mmap engine, using the csv engine.\n")
+            if (engine_name_numpy == engine_name
+                and not is_numpy_available()
+            ):
+                engine_name = engine_name_csv
+                if (not be_quiet):
+                    err_io.write("NumPy is not installed, using the csv engine.\n")
+            if (should_profile_incrementally
+                and not can_split_input_file
+            ):
+                should_profile_incrementally = False
+                if (not be_quiet):
+                    err_io.write("Cannot analyze this input incrementally, analyzing all rows.\n")
+            if (should_profile_incrementally):
+                # the partial-profile file keeps the state between runs, and is always rewritten
+                should_write_profile_file = True
+                should_overwrite = True
+                profile_table_file_name = input_file_name
+                if (None != output_file_name):
+                    profile_table_file_name = output_file_name
+                (table_base_name, table_file_ext) = os.path.splitext(strip_compressed_file_ext(profile_table_file_name))
+                table_profile_reader = functools.partial(
+                    read_table_profile_incremental
+                    ,input_file_name
+                    ,table_base_name + profile_file_ext
+                    ,job_count
+                    ,input_charset_name
+                    ,input_charset_error_mode
+                    ,in_newline_mode
+                    ,input_delimiter
+                    ,input_quote_symbol
+                    ,should_sketch_values
+                    )
+            elif (None != sample_row_count):
+                table_profile_reader = functools.partial(
+                    read_table_profile_sample
+                    ,input_file_name
+                    ,sample_row_count
+                    ,input_charset_name
+                    ,input_charset_error_mode
+                    ,in_newline_mode
+                    ,input_delimiter
+                    ,input_quote_symbol
+                    ,should_sketch_values=should_sketch_values
+                    )
+            elif (1 < job_count
+                and can_split_input_file
+            ):
+                table_profile_reader = functools.partial(
+                    read_table_profile_parallel
+                    ,input_file_name
+                    ,job_count
+                    ,input_charset_name
+                    ,input_charset_error_mode
+                    ,in_newline_mode
+                    ,input_delimiter
+                    ,input_quote_symbol
+                    ,should_sketch_values
+                    )
+            elif (engine_name_mmap == engine_name):
+                table_profile_reader = functools.partial(
+                    read_table_profile_mmap
+                    ,input_file_name
+                    ,in_row_count_max
+                    ,should_stop_when_settled
+                    ,input_charset_name
+                    ,input_charset_error_mode
+                    ,in_newline_mode
+                    ,input_delimiter
+                    ,input_quote_symbol
+                    ,should_sketch_values
+                    )
+            elif (engine_name_numpy == engine_name):
+                table_profile_reader = functools.partial(
+                    read_table_profile_numpy
+                    ,in_csv
+                    ,in_row_count_max
+                    ,should_stop_when_settled
+                    ,should_sketch_values=should_sketch_values
+                    )
+            else:
+                table_profile_reader = functools.partial(
+                    read_table_profile
+                    ,in_csv
+                    ,in_row_count_max
+                    ,should_stop_when_settled
+                    ,should_sketch_values
+                    )
+
+        if (None != output_file_name):
+            table_file_name = output_file_name
+        if (2 == file_format_variant):
+            archive_data_writer = functools.partial(
+                write_archive_data
+                ,table_file_name=input_file_name
+                ,in_charset_name=input_charset_name
+                ,in_charset_error_mode=input_charset_error_mode
+                ,in_newline=in_newline_mode
+                ,in_delimiter=input_delimiter
+                ,in_quote_symbol=input_quote_symbol
+                ,out_charset_name=output_charset_name
+                ,out_charset_error_mode='strict'
+                ,out_delimiter=output_delimiter
+                ,out_row_terminator=output_row_terminator
+                )
+            table_header_reader = functools.partial(
+                read_table_header_row
+                ,input_file_name
+                ,input_charset_name
+                ,input_charset_error_mode
+                ,in_newline_mode
+                ,input_delimiter
+                ,input_quote_symbol
+                )
+            execute_archive(
+                 err_io
                 ,be_quiet
                 ,should_overwrite
-                ,file_format_variant
                 ,table_file_name
                 ,output_charset_name
                 ,output_delimiter
                 ,output_row_terminator
-                ,in_row_count_max
+                ,table_header_reader
+                ,table_profile_reader
+                ,should_write_profile_file
+                ,archive_data_writer
                 )
-        except BrokenPipeError:
-            pass
-        finally:
-            if (None != in_file):
-                in_file.close()
-            if (None != out_file):
-                out_file.close()
+            return
+        execute(
+             in_csv
+            ,err_io
+            ,be_quiet
+            ,should_overwrite
+            ,file_format_variant
+            ,table_file_name
+            ,output_charset_name
+            ,output_delimiter
+            ,output_row_terminator
+            ,in_row_count_max
+            ,table_profile_reader
+            ,should_write_profile_file
+            )
+    finally:
+        if (None != in_file):
+            in_file.close()
+        if (None != out_file):
+            out_file.close()
+
+
+def read_file_name_list(list_file_name, in_io):
+    """ Read file names, one per line, from a file (or from in_io if list_file_name is '-').
+    """
+    list_io = in_io
+    if ("-" != list_file_name):
+        list_io = io.open(list_file_name, mode='rt')
+    try:
+        return [line.strip() for line in list_io if (0 < len(line.strip()))]
+    finally:
+        if (list_io is not in_io):
+            list_io.close()
+
+
+def is_table_file_name(file_name):
+    """ Decide whether a file found in batch mode is a table file (and not a metadata file),
+        which may be compressed (e.g. "x.csv.gz").
+    """
+    file_name = strip_compressed_file_ext(file_name)
+    return (
+        file_name.endswith(table_file_ext)
+        and not file_name.endswith(column_meta_file_ext)
+        and not file_name.endswith(table_meta_file_ext)
+        and not file_name.endswith(profile_file_ext)
+        and not file_name.endswith(archive_file_ext)
+        )
+
+
+def get_batch_output_file_ext_list(file_format_variant):
+    """ List the extensions of the files written for each table file in batch mode,
+        which are up to date if they are all newer than the table file.
+    """
+    if (2 == file_format_variant):
+        return [archive_file_ext]
+    return [table_meta_file_ext, column_meta_file_ext]
+
+
+def execute_batch_file(
+    input_file_name
+    ,be_quiet
+    ,file_format_variant
+    ,input_charset_name
+    ,input_charset_error_mode
+    ,input_row_terminator
+    ,input_delimiter
+    ,output_charset_name
+    ,output_delimiter
+    ,output_row_terminator
+    ,in_row_count_max
+    ,sample_row_count
+    ,should_stop_when_settled
+    ,should_write_profile_file
+    ,engine_name
+    ,should_sketch_values
+    ):
+    """ Create (or replace) the metadata files of one table file of a batch.
+    """
+    execute_file(
+         None
+        ,sys.stderr
+        ,be_quiet
+        ,True
+        ,file_format_variant
+        ,input_file_name
+        ,[input_file_name]
+        ,None
+        ,input_charset_name
+        ,input_charset_error_mode
+        ,input_row_terminator
+        ,input_delimiter
+        ,output_charset_name
+        ,output_delimiter
+        ,output_row_terminator
+        ,in_row_count_max
+        ,1
+        ,sample_row_count
+        ,should_stop_when_settled
+        ,should_write_profile_file
+        ,False
+        ,False
+        ,engine_name
+        ,should_sketch_values
+        )
+
+
+def execute_batch(
+     input_file_name_list
+    ,err_io
+    ,be_quiet
+    ,should_overwrite
+    ,job_count
+    ,batch_arg_tuple
+    ):
+    """ Create the metadata files of the tables named by a list of file names, directories and glob patterns.
+
+        batch_arg_tuple holds the arguments of execute_batch_file() after be_quiet.
+        Tables whose .meta.csv and .schema.csv files (or .archive.csv file, when writing archives)
+        are newer than the table are skipped unless should_overwrite is True.
+        The largest tables are started first, so that a large table started last
+        doesn't keep one worker busy after the others are done.
+        Returns a tuple of counts (analyzed_file_count, skipped_file_count, failed_file_count).
+    """
+    task_arg_tuple_list = list()
+    skipped_file_count = 0
+    failed_file_count = 0
+    # the first batch argument is file_format_variant
+    output_file_ext_list = get_batch_output_file_ext_list(batch_arg_tuple[0])
+    for input_file_name in find_batch_file_names(input_file_name_list, is_table_file_name):
+        (table_base_name, input_file_ext) = os.path.splitext(strip_compressed_file_ext(input_file_name))
+        if (not should_overwrite
+            and all(
+                is_file_up_to_date(table_base_name + output_file_ext, input_file_name)
+                for output_file_ext in output_file_ext_list
+                )
+        ):
+            skipped_file_count += 1
+            continue
+        try:
+            input_file_size = os.path.getsize(input_file_name)
+        except OSError as e:
+            failed_file_count += 1
+            err_io.write("Error: {}: {}\n".format(input_file_name, e))
+            continue
+        task_arg_tuple_list.append((input_file_size, (input_file_name, be_quiet) + batch_arg_tuple))
+    task_arg_tuple_list.sort(key=_get_first_item, reverse=True)
+    task_arg_tuple_list = [task_arg_tuple for (input_file_size, task_arg_tuple) in task_arg_tuple_list]
+    analyzed_file_count = 0
+    for (task_arg_tuple, task_result, e) in run_batch_tasks(execute_batch_file, task_arg_tuple_list, job_count):
+        if (None != e):
+            failed_file_count += 1
+            err_io.write("Error: {}: {}\n".format(task_arg_tuple[0], e))
+        else:
+            analyzed_file_count += 1
+    if (not be_quiet):
+        err_io.write("Analyzed {} files, skipped {} up-to-date files, {} failed.\n".format(
+            analyzed_file_count
+            ,skipped_file_count
+            ,failed_file_count
+            ))
+    return (analyzed_file_count, skipped_file_count, failed_file_count)
+
 
 def execute(
     in_csv
@@ -268,16 +856,32 @@ def execute(
     ,table_delimiter
     ,table_row_terminator
     ,in_row_count_max
+    ,table_profile_reader
+    ,should_write_profile_file
     ):
-    column_meta_file_ext = ".schema.csv"
-    table_meta_file_ext = ".meta.csv"
-
-    (table_base_name, table_file_ext) = os.path.splitext(table_file_name)
+    # "x.csv.gz" is named "x" too
+    (table_base_name, table_file_ext) = os.path.splitext(strip_compressed_file_ext(table_file_name))
 
     column_meta_file_name = table_base_name + column_meta_file_ext
     table_meta_file_name = table_base_name + table_meta_file_ext
+    profile_file_name = table_base_name + profile_file_ext
     table_name = os.path.basename(table_base_name)
 
+    if (should_write_profile_file):
+        table_profile = write_profile_file(
+            table_profile_reader
+            ,err_io
+            ,be_quiet
+            ,should_overwrite
+            ,profile_file_name
+            ,table_row_terminator
+            )
+        if (None != table_profile):
+            # rows that were incomplete when the profile was saved still count for the schema
+            table_profile.merge_pending()
+            # don't read the table a second time for the schema file
+            table_profile_reader = functools.partial(_get_value, table_profile)
+
     write_table_meta_file(
         in_csv
         ,err_io
@@ -292,7 +896,7 @@ def execute(
         ,in_row_count_max
     )
     write_column_meta_file(
-        in_csv
+        table_profile_reader
         ,err_io
         ,be_quiet
         ,should_overwrite
@@ -306,24 +910,255 @@ def execute(
     )
 
 
-def write_table_meta_file(
-    in_csv
-    ,err_io
+def execute_archive(
+    err_io
     ,be_quiet
     ,should_overwrite
-    ,file_format_variant
-    ,table_meta_file_name
-    ,table_name
+    ,table_file_name
     ,table_charset_name
     ,table_delimiter
     ,table_row_terminator
-    ,in_row_count_max
+    ,table_header_reader
+    ,table_profile_reader
+    ,should_write_profile_file
+    ,archive_data_writer
     ):
-    end_row = None
+    """ Write the metadata and the data rows of a table to a single .archive.csv file.
+
+        If the table already has a .schema.csv file with the same columns
+        (and no profile file is wanted), the schema is copied from it
+        and the table is read only once, to copy its rows;
+        otherwise the table is profiled first.
+        An existing .meta.csv file is also copied.
+        table_header_reader() returns the header row of the table (or None),
+        and archive_data_writer(out_file) writes the data rows to the binary archive file.
+    """
+    (table_base_name, table_file_ext) = os.path.splitext(strip_compressed_file_ext(table_file_name))
+    archive_file_name = table_base_name + archive_file_ext
+    column_meta_file_name = table_base_name + column_meta_file_ext
+    table_meta_file_name = table_base_name + table_meta_file_ext
+    profile_file_name = table_base_name + profile_file_ext
+    table_name = os.path.basename(table_base_name)
+
+    if (os.path.exists(archive_file_name)):
+        if (not should_overwrite):
+            if (not be_quiet):
+                err_io.write("File already exists {}, will not overwrite.\n".format(archive_file_name))
+            return
+        if (not be_quiet):
+            err_io.write("Overwriting existing file {}\n".format(archive_file_name))
+
+    table_schema = None
+    if (should_write_profile_file):
+        table_profile = write_profile_file(
+            table_profile_reader
+            ,err_io
+            ,be_quiet
+            ,should_overwrite
+            ,profile_file_name
+            ,table_row_terminator
+            )
+        if (None != table_profile):
+            table_profile.merge_pending()
+            table_profile_reader = functools.partial(_get_value, table_profile)
+    elif (os.path.exists(column_meta_file_name)):
+        table_schema = read_table_schema_file(
+            column_meta_file_name
+            ,table_charset_name
+            ,table_delimiter
+            ,table_row_terminator
+            )
+        if (None == table_schema
+            or table_schema.column_name_list != table_header_reader()
+        ):
+            if (not be_quiet):
+                err_io.write("Schema file {} does not match the table, analyzing the table.\n".format(column_meta_file_name))
+            table_schema = None
+    if (None == table_schema):
+        # analyze input table to try and infer column datatypes
+        table_profile = table_profile_reader()
+        if (None == table_profile):
+            return
+        table_schema = table_schema_from_profile(table_profile)
+
+    table_meta_row_list = None
+    if (os.path.exists(table_meta_file_name)):
+        table_meta_row_list = read_table_meta_file(
+            table_meta_file_name
+            ,table_charset_name
+            ,table_delimiter
+            ,table_row_terminator
+            )
+    if (None == table_meta_row_list):
+        # the archive data rows are written with the output delimiter
+        table_meta_row_list = get_table_meta_row_list(table_name, table_charset_name, table_delimiter)
+
+    out_file = io.open(
+         archive_file_name
+        ,mode='wb'
+        ,buffering=archive_write_buffer_byte_count
+        )
+    if (not be_quiet):
+        err_io.write("Created file: {}\n".format(archive_file_name))
+    try:
+        out_text_file = io.TextIOWrapper(
+             out_file
+            ,encoding=table_charset_name
+            ,newline=''  # don't translate newline chars
+            )
+        out_csv = csv.writer(
+             out_text_file
+            ,delimiter=table_delimiter
+            ,lineterminator=table_row_terminator
+            )
+        write_archive_head_rows(out_csv, table_meta_row_list, table_schema)
+        out_text_file.flush()
+        out_text_file.detach()
+        archive_data_writer(out_file)
+    finally:
+        out_file.close()
+        out_file = None
+
+
+def read_table_schema_file(
+    column_meta_file_name
+    ,table_charset_name
+    ,table_delimiter
+    ,table_row_terminator
+    ):
+    with io.open(
+         column_meta_file_name
+        ,mode='rt'
+        ,encoding=table_charset_name
+        ,newline=''  # don't translate newline chars
+    ) as in_file:
+        return read_table_schema(csv.reader(
+             in_file
+            ,delimiter=table_delimiter
+            ,lineterminator=table_row_terminator
+            ))
+
+
+def read_table_header_row(
+    table_file_name
+    ,table_charset_name
+    ,table_charset_error_mode
+    ,table_newline
+    ,table_delimiter
+    ,table_quote_symbol
+    ):
+    with io.TextIOWrapper(
+         open_table_file(table_file_name)
+        ,encoding=table_charset_name
+        ,newline=''  # don't translate newline chars
+        ,errors=table_charset_error_mode
+    ) as in_file:
+        return next(csv.reader(
+             in_file
+            ,delimiter=table_delimiter
+            ,lineterminator=table_newline
+            ,quotechar=table_quote_symbol
+            ), None)
+
+
+def read_table_meta_file(
+    table_meta_file_name
+    ,table_charset_name
+    ,table_delimiter
+    ,table_row_terminator
+    ):
+    """ Read the rows of a table metadata file, starting with a ("name", "value") header row.
+    """
+    with io.open(
+         table_meta_file_name
+        ,mode='rt'
+        ,encoding=table_charset_name
+        ,newline=''  # don't translate newline chars
+    ) as in_file:
+        table_meta_row_list = list(csv.reader(
+             in_file
+            ,delimiter=table_delimiter
+            ,lineterminator=table_row_terminator
+            ))
+    # a blank row would end the table metadata block of the archive
+    table_meta_row_list = [in_row for in_row in table_meta_row_list if (0 < len(in_row))]
+    if (0 == len(table_meta_row_list)
+        or ["name", "value"] != table_meta_row_list[0][:2]
+    ):
+        table_meta_row_list.insert(0, ["name", "value"])
+    return table_meta_row_list
+
+
+def write_profile_file(
+    table_profile_reader
+    ,err_io
+    ,be_quiet
+    ,should_overwrite
+    ,profile_file_name
+    ,table_row_terminator
+    ):
+    """ Write a .profile.csv partial-profile file with the table column statistics.
+
+        Partial profiles of several tables with the same columns
+        can later be merged into one schema with the --merge-profile option.
+        The file is always written as utf-8 with ',' delimiters (whatever the table charset and delimiter),
+        which is how read_profile_file_list() reads it back.
+        Returns the table profile, or None if no profile was read.
+    """
+    table_profile = None
+    should_write_profile_file = False
+    profile_file_exists = os.path.exists(profile_file_name)
+    if (profile_file_exists):
+        if (should_overwrite):
+            should_write_profile_file = True
+            if (not be_quiet):
+                err_io.write("Overwriting existing file {}\n".format(profile_file_name))
+        else:
+            if (not be_quiet):
+                err_io.write("File already exists {}, will not overwrite.\n".format(profile_file_name))
+    else:
+        should_write_profile_file = True
+    if (should_write_profile_file):
+        table_profile = table_profile_reader()
+        if (None != table_profile):
+            out_file_name = profile_file_name
+            out_charset_name = profile_file_charset_name
+            write_text_io_mode = 'wt'
+            out_newline_mode=''  # don't translate newline chars
+            out_file = io.open(
+                 out_file_name
+                ,mode=write_text_io_mode
+                ,encoding=out_charset_name
+                ,newline=out_newline_mode
+            )
+            if (not be_quiet):
+                err_io.write("Created file: {}\n".format(out_file_name))
+            try:
+                out_csv = csv.writer(
+                     out_file
+                    ,delimiter=profile_file_delimiter
+                    ,lineterminator=table_row_terminator
+                )
+                table_profile.write_profile_rows(out_csv)
+            finally:
+                out_file.close()
+                out_file = None
+    return table_profile
+
+
+def get_table_meta_row_list(
+    table_name
+    ,table_charset_name
+    ,table_data_delimiter=None
+    ):
+    """ Get the rows of a new table metadata file, starting with a ("name", "value") header row.
 
+        table_data_delimiter is the delimiter of the table data (None if it is not known).
+    """
     table_meta_field_name_list = [
          "charset"
         ,"name"
+        ,"delimiter"
         ,"title"
         ,"subject"
         ,"subject_title"
@@ -346,6 +1181,45 @@ def write_table_meta_file(
     table_meta_charset_name = meta_charset_name_from_py_charset(table_charset_name)
     table_meta_field_dict["charset"] = table_meta_field_dict.get("charset", table_meta_charset_name)
     table_meta_field_dict["name"] = table_meta_field_dict.get("name", table_name)
+    if (None != table_data_delimiter):
+        table_meta_field_dict["delimiter"] = encode_delimiter_name(table_data_delimiter)
+
+    table_meta_row_list = [
+        [
+             "name"
+            ,"value"
+        ]
+    ]
+    for field_name in table_meta_field_name_list:
+        field_value = table_meta_field_dict.get(field_name, table_meta_value_default)
+        out_row = [
+            field_name
+            ,field_value
+        ]
+        table_meta_row_list.append(out_row)
+    return table_meta_row_list
+
+
+def write_table_meta_file(
+    in_csv
+    ,err_io
+    ,be_quiet
+    ,should_overwrite
+    ,file_format_variant
+    ,table_meta_file_name
+    ,table_name
+    ,table_charset_name
+    ,table_delimiter
+    ,table_row_terminator
+    ,in_row_count_max
+    ):
+    end_row = None
+
+    # the delimiter of the table is that of its reader (there is no reader for merged profile files)
+    table_data_delimiter = None
+    if (None != in_csv):
+        table_data_delimiter = in_csv.dialect.delimiter
+    table_meta_row_list = get_table_meta_row_list(table_name, table_charset_name, table_data_delimiter)
 
     # Write .meta.csv file
     should_write_table_meta_file = False
@@ -383,17 +1257,8 @@ def write_table_meta_file(
                 or 1 == file_format_variant
                 ):
                 # write a header row
-                header_row = [
-                    "name"
-                    ,"value"
-                ]
-                out_csv.writerow(header_row)
-            for field_name in table_meta_field_name_list:
-                field_value = table_meta_field_dict.get(field_name, table_meta_value_default)
-                out_row = [
-                    field_name
-                    ,field_value
-                ]
+                out_csv.writerow(table_meta_row_list[0])
+            for out_row in table_meta_row_list[1:]:
                 out_csv.writerow(out_row)
         finally:
             out_file.close()
@@ -401,7 +1266,7 @@ def write_table_meta_file(
 
 
 def write_column_meta_file(
-    in_csv
+    table_profile_reader
     ,err_io
     ,be_quiet
     ,should_overwrite
@@ -429,308 +1294,19 @@ def write_column_meta_file(
     else:
         should_write_column_meta_file = True
     if (should_write_column_meta_file):
-        decimal_separator = '.'
-        decimal_regex = re.compile( r"\s*([-+])?(\d+)(\.\d+)?\s*")
-        column_name_list = None
-        column_meta_list = list()
-        in_header_row = next(in_csv, end_row)
-        if (end_row != in_header_row):
-            column_name_list = list(in_header_row)
-            column_position = 0
-            while (column_position < len(column_name_list)):
-                column_name = column_name_list[column_position]
-                column_meta = dict()
-                column_meta["column_name"] = column_name
-                column_meta_list.append(column_meta)
-                column_position += 1
-            
-            # analyze input table to try and infer column datatypes
-            example_row = None
-            in_row_count = 0
-            in_row = next (in_csv, end_row)
-            while (end_row != in_row
-                and (None == in_row_count_max  or in_row_count < in_row_count_max)
-            ):
-                # remember an example row for later
-                if (None == example_row):
-                    example_row = list(in_row)
-                column_position = 0
-                while (column_position < len(column_meta_list)
-                    and column_position < len(in_row)
-                ):
-                    column_meta = column_meta_list[column_position]
-                    cell_value = in_row[column_position]
-
-                    # treat empty strings as NULL since the CSV reader isn't smart about quoted cells
-                    # maybe the csv dialect can be changed?
-                    if (None != cell_value
-                        and 0 == len(cell_value)
-                    ):
-                        cell_value = None
-
-                    if (None == cell_value):
-                        null_cell_value_count = column_meta.get("null_cell_value_count",0)
-                        column_meta["null_cell_value_count"] = null_cell_value_count + 1
-                    else:
-                        not_null_cell_value_count = column_meta.get("not_null_cell_value_count",0)
-                        column_meta["not_null_cell_value_count"] = not_null_cell_value_count + 1
-
-                        cell_char_len = len(cell_value)
-                        if (0 == cell_char_len):
-                            empty_cell_count = column_meta.get("empty_cell_count",0)
-                            column_meta["empty_cell_count"] = empty_cell_count + 1
-                        else:
-                            if (0 == len(cell_value.strip())):
-                                blank_cell_count = column_meta.get("blank_cell_count",0)
-                                column_meta["blank_cell_count"] = blank_cell_count + 1
-                            cell_char_len_max = column_meta.get("char_count_max", cell_char_len)
-                            if (cell_char_len_max < cell_char_len):
-                                cell_char_len_max = cell_char_len
-                            cell_char_len_min = column_meta.get("char_count_min", cell_char_len)
-                            if (cell_char_len_min > cell_char_len):
-                                cell_char_len_min = cell_char_len
-                            column_meta["char_count_max"] = cell_char_len_max
-                            column_meta["char_count_min"] = cell_char_len_min
-
-                        cell_value_int = as_int(cell_value)
-                        if (None == cell_value_int):
-                            not_int_count = column_meta.get("not_int_count",0)
-                            column_meta["not_int_count"] = not_int_count + 1
-                        else:
-                            cell_int_max = column_meta.get("int_max", cell_value_int)
-                            if (cell_int_max < cell_value_int):
-                                cell_int_max = cell_value_int
-                            column_meta["int_max"] = cell_int_max
-
-                        cell_value_float = as_float(cell_value)
-                        if (None == cell_value_float):
-                            not_float_count = column_meta.get("not_float_count",0)
-                            column_meta["not_float_count"] = not_float_count + 1
-                        else:
-                            cell_float_max = column_meta.get("float_max", cell_value_float)
-                            if (cell_float_max < cell_value_float):
-                                cell_float_max = cell_value_float
-                            column_meta["float_max"] = cell_float_max
-
-                        # try to guess decimal precision
-                        (sign_char,int_chars,frac_chars) = (None,None,None)
-                        decimal_regex_match = decimal_regex.fullmatch(cell_value)
-                        if (None != decimal_regex_match):
-                            (sign_char,int_chars,frac_chars) = decimal_regex_match.group(1,2,3)
-                        if (None != int_chars 
-                            and 0 < len(int_chars)
-                        ):
-                            # 20170323 [db] TODO This block of code isn't working, need to figure out why
-                            # TODO look for thousands separators
-                            decimal_int_digit_count = len(int_chars)
-                            decimal_frac_digit_count = 0
-                            if (None != frac_chars
-                                and len(frac_chars) > len(decimal_separator)
-                            ):
-                                decimal_frac_digit_count = len(frac_chars) - len(decimal_separator)
-                            decimal_precision_digit_count = decimal_int_digit_count + decimal_frac_digit_count
-                            decimal_scale_digit_count = decimal_frac_digit_count
-                            decimal_precision_digit_count_max = column_meta.get("decimal_precision_digit_count_max",decimal_precision_digit_count)
-                            decimal_precision_digit_count_min = column_meta.get("decimal_precision_digit_count_min",decimal_precision_digit_count)
-                            decimal_scale_digit_count_max = column_meta.get("decimal_scale_digit_count_max",decimal_scale_digit_count)
-                            decimal_scale_digit_count_min = column_meta.get("decimal_scale_digit_count_min",decimal_scale_digit_count)
-                            if (decimal_precision_digit_count_max < decimal_precision_digit_count):
-                                decimal_precision_digit_count_max = decimal_precision_digit_count
-                            if (decimal_precision_digit_count_min > decimal_precision_digit_count):
-                                decimal_precision_digit_count_min = decimal_precision_digit_count
-                            if (decimal_scale_digit_count_max < decimal_scale_digit_count):
-                                decimal_scale_digit_count_max = decimal_scale_digit_count
-                            if (decimal_scale_digit_count_min > decimal_scale_digit_count):
-                                decimal_scale_digit_count_min = decimal_scale_digit_count
-                            column_meta["decimal_precision_digit_count_max"] = decimal_precision_digit_count_max
-                            column_meta["decimal_precision_digit_count_min"] = decimal_precision_digit_count_min
-                            column_meta["decimal_scale_digit_count_max"] = decimal_scale_digit_count_max
-                            column_meta["decimal_scale_digit_count_min"] = decimal_scale_digit_count_min
-                        
-                        # check for a leading zero, this will help us distinguish code number strings from actual numbers
-                        if (None == sign_char
-                            and None != int_chars
-                            and 1 < len(int_chars)
-                            and int_chars[0] == '0'
-                        ):
-                            leading_zero_count = column_meta.get("leading_zero_count",0)
-                            column_meta["leading_zero_count"] = leading_zero_count + 1
-
-                        # end if (cell_value not None)
-                    column_position += 1
-                    # end while (column)
-                in_row_count += 1
-                in_row = next (in_csv, end_row)
-                # end while (row)
-            
-            # Modify the column_meta_list with some datatype guesses
-
-            column_type_name_str = "varchar"
-            column_type_name_fixed_char = "char"
-            column_type_name_int = "integer"
-            column_type_name_float = "float"
-            column_type_name_decimal = "decimal"
-            column_type_name_default = column_type_name_str
-
-            for column_meta in column_meta_list:
-                column_type_name = None
-                null_cell_value_count = column_meta.get("null_cell_value_count",0)
-                not_null_cell_value_count = column_meta.get("not_null_cell_value_count",0)
-                empty_cell_count = column_meta.get("empty_cell_count", None)
-                cell_char_count_max = column_meta.get("char_count_max", None)
-                cell_char_count_min = column_meta.get("char_count_min", None)
-                not_int_count = column_meta.get("not_int_count",0)
-                not_float_count = column_meta.get("not_float_count",0)
-                leading_zero_count = column_meta.get("leading_zero_count",0)
-                decimal_precision_digit_count_max = column_meta.get("decimal_precision_digit_count_max",None)
-                decimal_precision_digit_count_min = column_meta.get("decimal_precision_digit_count_min",None)
-                decimal_scale_digit_count_max = column_meta.get("decimal_scale_digit_count_max",None)
-                decimal_scale_digit_count_min = column_meta.get("decimal_scale_digit_count_min",None)
-                #not_null_count = column_meta.get("not_null_cell_value_count",0)
-                if (0 == in_row_count
-                    or 0 == not_null_cell_value_count
-                ):
-                    column_type_name = column_type_name_default
-                elif (None != cell_char_count_max
-                    and None != cell_char_count_min
-                    and cell_char_count_max == cell_char_count_min
-                    and (0 < not_float_count   # something is not a number, so it must be char type
-                        or 0 < leading_zero_count  # something starts with a zero digit, so it looks like a digit code string
-                    )
-                ):
-                    column_type_name = column_type_name_fixed_char
-                elif (0 < leading_zero_count):
-                    # assume anything that has a leading zero is a string
-                    column_type_name = column_type_name_str
-                elif (0 == not_int_count):
-                    column_type_name = column_type_name_int
-                elif (0 == not_float_count
-                    and 0 < not_int_count
-                    and None != cell_char_count_max
-                    and 0 < cell_char_count_max
-                ):
-                    # it parses as a float, but mark its type as decimal
-                    column_type_name = column_type_name_decimal
-                else:
-                    column_type_name = column_type_name_str
-
-                column_size_str = None
-                if (column_type_name_fixed_char == column_type_name):
-                    column_size_str = str(cell_char_count_max)
-                elif (column_type_name_str == column_type_name):
-                    column_size_str = str(cell_char_count_max)
-                elif (column_type_name_decimal == column_type_name):
-                    if (None != decimal_precision_digit_count_max
-                        and None != decimal_scale_digit_count_max
-                    ):
-                        column_size_str = "{},{}".format(
-                            decimal_precision_digit_count_max
-                            ,decimal_scale_digit_count_max
-                        )
-
-                # TODO finish adding int, float, decimal sizes
-                
-                # add new column_meta fields that computed above
-                column_meta["data_type_name"] = column_type_name
-                column_meta["data_type_size"] = column_size_str
-
+        # analyze input table to try and infer column datatypes
+        table_profile = table_profile_reader()
+        if (None != table_profile):
+            table_schema = table_schema_from_profile(table_profile)
 
             # Construct schema file contents
             out_row_list = list()
-
-            if (0 == file_format_variant):
+            if (0 == file_format_variant
+                or 1 == file_format_variant
+            ):
                 # for variant 0, fields are rows in the schema file
-                header_row = [
-                    "name"
-                    ,"type"
-                    ,"size"
-                    ,"pkey"
-                    ,"unit"
-                    ,"format"
-                    ,"title"
-                    ,"example"
-                ]
-                out_row_list.append(header_row)
-                column_position = 0
-                while (column_position < len(column_meta_list)):
-                    column_meta = column_meta_list[column_position]
-                    column_name = column_meta["column_name"]
-                    column_type_name = column_meta["data_type_name"]
-                    column_size_str = column_meta["data_type_size"]
-                    column_key_state = None
-                    column_unit_name = None
-                    column_format_spec = None
-                    column_title = None
-                    example_value = example_row[column_position]
-                    out_row = [
-                        column_name
-                        ,column_type_name
-                        ,column_size_str
-                        ,column_key_state
-                        ,column_unit_name
-                        ,column_format_spec
-                        ,column_title
-                        ,example_value
-                    ]
-                    out_row_list.append(out_row)
-                    column_position += 1
-            elif (1 == file_format_variant):
                 # for variant 1, fields are columns in the schema file
-
-                # header row, first cell is empty
-                row_head_cell_value = None
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_name = column_meta["column_name"]
-                    out_row.append(column_name)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "type"
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_type_name = column_meta["data_type_name"]
-                    out_row.append(column_type_name)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "size"
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_size_str = column_meta["data_type_size"]
-                    out_row.append(column_size_str)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "pkey"
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_key_state = None
-                    out_row.append(column_key_state)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "unit"
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_unit_name = None
-                    out_row.append(column_unit_name)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "format"
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_format_spec = None
-                    out_row.append(column_format_spec)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "title"
-                out_row = [row_head_cell_value]
-                for column_meta in column_meta_list:
-                    column_title = None
-                    out_row.append(column_title)
-                out_row_list.append(out_row)
-
-                row_head_cell_value = "example"
-                out_row = [row_head_cell_value]
-                out_row += example_row
-                out_row_list.append(out_row)
+                out_row_list = table_schema.get_schema_row_list(file_format_variant)
 
             out_file_name = column_meta_file_name
             out_charset_name = table_charset_name
@@ -760,6 +1336,15 @@ def write_column_meta_file(
             # end if (header row)
         # end if (schema file does not exist)
 
+def get_output_charset_name(input_charset_name):
+    """ Get the charset of the output files of an input charset.
+    """
+    # special case to avoid BOM signatures in output files
+    if ("utf_8_sig" == decode_charset_name(input_charset_name)):
+        return "utf_8"
+    return input_charset_name
+
+
 def meta_charset_name_from_py_charset(py_charset_name):
     '''
     Translate a python encoding name to a meta-csv charset name
@@ -777,24 +1362,19 @@ def meta_charset_name_from_py_charset(py_charset_name):
             meta_charset_name = "LATIN1"
         elif ("latin_1" == meta_charset_name):
             meta_charset_name = "LATIN1"
+        elif (meta_charset_name.startswith(("utf_16", "utf_32"))):
+            # e.g. "UTF-16", "UTF-16LE"
+            meta_charset_name = meta_charset_name.replace("_", "-", 1).replace("_", "")
         meta_charset_name = meta_charset_name.upper()
     return meta_charset_name
 
-def as_int(s):
-    n = None
-    try:
-        n = int(s)
-    except ValueError:
-        pass
-    return n
 
-def as_float(s):
-    n = None
-    try:
-        n = float(s)
-    except ValueError:
-        pass
-    return n
+def _get_value(value):
+    return value
+
+
+def _get_first_item(item_tuple):
+    return item_tuple[0]
 
 
 def console_main():
@@ -0,0 +1,173 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Dialect detection: choosing the delimiter, quote and newline of a table file before it is read,
+## from the rows in a bounded prefix of the file.
+## Each candidate delimiter splits the sample rows with the csv module (and the quote),
+## and the delimiter that splits the header row and the data rows most consistently,
+## without splitting quoted cells, is chosen (of those, the one that gives the most columns),
+## so the sample is read a few times over, but never more than sample_byte_count of it.
+
+import codecs
+import collections
+import csv
+import io
+import itertools
+import os
+
+from .compressed_input import (
+    detect_file_compression_name
+    ,read_compressed_file_prefix
+    )
+
+# delimiter, or newline, name that asks for detection
+dialect_name_auto = "auto"
+
+sample_byte_count = 256*1024
+# most rows of the sample that are split with each delimiter
+sample_row_count_max = 200
+# candidates in order of preference, when they split the rows equally well
+delimiter_candidate_list = (",", "\t", ";", "|")
+quote_symbol_default = '"'
+# share of rows that must have the most common number of cells for a delimiter to be consistent
+consistent_row_fraction_min = 0.9
+
+delimiter_default = delimiter_candidate_list[0]
+newline_default = "\n"
+
+
+def read_sample_text(file_name, charset_name):
+    """ Read up to sample_byte_count bytes of a file (decompressed, if it is compressed) as text,
+        without the last (possibly cut) line.
+    """
+    compression_name = detect_file_compression_name(file_name)
+    if (None != compression_name):
+        sample_bytes = read_compressed_file_prefix(file_name, compression_name, sample_byte_count)
+        is_final = (len(sample_bytes) < sample_byte_count)
+    else:
+        with open(file_name, mode='rb') as in_file:
+            sample_bytes = in_file.read(sample_byte_count)
+            is_final = (os.fstat(in_file.fileno()).st_size <= len(sample_bytes))
+    sample_text = codecs.getincrementaldecoder(charset_name)('replace').decode(sample_bytes, is_final)
+    if (not is_final):
+        line_end_position = max(sample_text.rfind("\n"), sample_text.rfind("\r"))
+        if (0 < line_end_position):
+            sample_text = sample_text[:line_end_position + 1]
+    return sample_text
+
+
+def detect_newline(sample_text):
+    """ Get the newline of the first line of a sample ("\\n", "\\r\\n" or "\\r").
+    """
+    line_end_position = -1
+    for line_end_char in ("\n", "\r"):
+        line_end_char_position = sample_text.find(line_end_char)
+        if (0 <= line_end_char_position
+            and (0 > line_end_position or line_end_char_position < line_end_position)
+        ):
+            line_end_position = line_end_char_position
+    if (0 > line_end_position):
+        return newline_default
+    if ("\r" == sample_text[line_end_position]):
+        if ("\n" == sample_text[line_end_position + 1:line_end_position + 2]):
+            return "\r\n"
+        return "\r"
+    return "\n"
+
+
+def detect_quote_symbol(sample_text, delimiter, newline):
+    """ Get the quote character of a sample: '"' unless only single quotes enclose cells.
+    """
+    if (quote_symbol_default in sample_text):
+        return quote_symbol_default
+    quote_symbol = "'"
+    opening_quote_count = (
+        sample_text.count(delimiter + quote_symbol)
+        + sample_text.count(newline + quote_symbol)
+        + int(sample_text.startswith(quote_symbol))
+        )
+    closing_quote_count = (
+        sample_text.count(quote_symbol + delimiter)
+        + sample_text.count(quote_symbol + newline)
+        )
+    if (2 <= opening_quote_count and 2 <= closing_quote_count):
+        return quote_symbol
+    return quote_symbol_default
+
+
+def detect_delimiter(sample_text, quote_symbol=quote_symbol_default):
+    """ Choose the candidate delimiter that splits the rows of a sample most consistently.
+
+        A delimiter is consistent if most rows have the same number of cells (more than one)
+        and the first (header) row has that number too.
+        Of the consistent delimiters, the one that splits the fewest quoted cells is chosen
+        (a cell left with an odd number of quotes is a piece of a quoted cell,
+        e.g. '1,"a;b;c"' split on ';'), and then the one that gives the most cells.
+        Without a consistent delimiter, the one whose rows agree best is chosen,
+        and without any delimiter that splits a row, delimiter_default.
+    """
+    best_delimiter = delimiter_default
+    best_score = None
+    for delimiter in delimiter_candidate_list:
+        if (delimiter not in sample_text):
+            continue
+        in_csv = csv.reader(
+             io.StringIO(sample_text, newline='')
+            ,delimiter=delimiter
+            ,quotechar=quote_symbol
+            )
+        try:
+            row_list = list(itertools.islice(in_csv, sample_row_count_max))
+        except csv.Error:
+            continue
+        if (0 == len(row_list)):
+            continue
+        (cell_count, row_count) = collections.Counter(map(len, row_list)).most_common(1)[0]
+        if (1 >= cell_count):
+            continue
+        row_fraction = float(row_count) / len(row_list)
+        whole_row_count = 0
+        for in_row in row_list:
+            if (not any(1 & cell_value.count(quote_symbol) for cell_value in in_row)):
+                whole_row_count += 1
+        whole_row_fraction = float(whole_row_count) / len(row_list)
+        if (row_fraction >= consistent_row_fraction_min
+            and cell_count == len(row_list[0])
+        ):
+            score = (True, whole_row_fraction, cell_count, row_fraction)
+        else:
+            score = (False, row_fraction, cell_count, whole_row_fraction)
+        if (None == best_score or best_score < score):
+            best_delimiter = delimiter
+            best_score = score
+    return best_delimiter
+
+
+def resolve_file_dialect(file_name, charset_name, delimiter, newline):
+    """ Get a tuple (delimiter, quote_symbol, newline) for a table file,
+        detecting the delimiter or the newline if it is dialect_name_auto.
+
+        The quote symbol is detected along with an automatic delimiter
+        (and is quote_symbol_default otherwise).
+        Without a file name (e.g. for stdin), or for a file that isn't a regular file,
+        automatic values become delimiter_default and newline_default.
+    """
+    quote_symbol = quote_symbol_default
+    if (dialect_name_auto != delimiter
+        and dialect_name_auto != newline
+    ):
+        return (delimiter, quote_symbol, newline)
+    sample_text = ""
+    if (None != file_name
+        and os.path.isfile(file_name)
+    ):
+        sample_text = read_sample_text(file_name, charset_name)
+    if (dialect_name_auto == newline):
+        newline = detect_newline(sample_text)
+    if (dialect_name_auto == delimiter):
+        delimiter = detect_delimiter(sample_text)
+        quote_symbol = detect_quote_symbol(sample_text, delimiter, newline)
+        if (quote_symbol_default != quote_symbol):
+            # quoted cells can hold delimiters, so split the rows again with the right quote
+            delimiter = detect_delimiter(sample_text, quote_symbol)
+    return (delimiter, quote_symbol, newline)
@@ -0,0 +1,146 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Incremental profiling of append-only CSV table files.
+## The partial-profile file of a table remembers how far the table was profiled,
+## so the next run only has to read the rows that were appended since.
+
+import io
+import os
+import zlib
+
+from .table_profile import (
+    ProfileFormatError
+    ,TableProfile
+    ,read_profile_file_list
+    )
+from .parallel_profile import (
+    find_row_end_offset
+    ,get_chunk_byte_count
+    ,read_table_header
+    ,read_table_profile_byte_range_list
+    ,split_row_byte_ranges
+    )
+
+# number of bytes before the saved offset that must be unchanged
+tail_checksum_byte_count = 64*1024
+
+
+def get_byte_range_checksum(in_file, start_offset, end_offset):
+    in_file.seek(start_offset)
+    return zlib.crc32(in_file.read(end_offset - start_offset))
+
+
+def _get_tail_checksum(in_file, data_start_offset, byte_offset):
+    tail_start_offset = max(data_start_offset, byte_offset - tail_checksum_byte_count)
+    return get_byte_range_checksum(in_file, tail_start_offset, byte_offset)
+
+
+def read_table_profile_incremental(
+    file_name
+    ,profile_file_name
+    ,job_count
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol='"'
+    ,should_sketch_values=False
+    ):
+    """ Profile a table file, reusing a saved partial profile of its earlier rows.
+
+        The saved profile is used only if the header row and the bytes just before
+        the saved byte offset are unchanged;
+        otherwise the whole table is profiled again.
+        Returns a finalized TableProfile (with byte_offset and checksums set),
+        or None if the file has no header row.
+        Rows after the last complete row are returned in pending_table_profile.
+        With should_sketch_values, a saved profile without value sketches is not reused.
+    """
+    quote_byte = quote_symbol.encode("ascii")
+    saved_table_profile = None
+    if (os.path.exists(profile_file_name)):
+        try:
+            saved_table_profile = read_profile_file_list([profile_file_name])
+        except ProfileFormatError:
+            # an unreadable profile is no worse than a missing one
+            saved_table_profile = None
+    with io.open(file_name, mode='rb') as in_file:
+        (column_name_list, data_start_offset) = read_table_header(
+            in_file
+            ,charset_name
+            ,charset_error_mode
+            ,newline
+            ,delimiter
+            ,quote_symbol
+            )
+        if (None == column_name_list):
+            return None
+        file_byte_count = os.fstat(in_file.fileno()).st_size
+        header_checksum = get_byte_range_checksum(in_file, 0, data_start_offset)
+
+        start_offset = data_start_offset
+        if (None != saved_table_profile
+            and None != saved_table_profile.byte_offset
+            and header_checksum == saved_table_profile.header_checksum
+            and column_name_list == saved_table_profile.column_name_list
+            and (not should_sketch_values or saved_table_profile.has_sketches())
+            and data_start_offset <= saved_table_profile.byte_offset
+            and file_byte_count >= saved_table_profile.byte_offset
+            and saved_table_profile.tail_checksum == _get_tail_checksum(
+                in_file
+                ,data_start_offset
+                ,saved_table_profile.byte_offset
+                )
+        ):
+            start_offset = saved_table_profile.byte_offset
+        else:
+            saved_table_profile = None
+
+        chunk_byte_count = get_chunk_byte_count(file_byte_count - start_offset, job_count)
+        byte_range_list = split_row_byte_ranges(in_file, start_offset, chunk_byte_count, quote_byte)
+        pending_byte_range_list = list()
+        row_end_offset = start_offset
+        if (0 < len(byte_range_list)):
+            # the last row may still be being written
+            (last_start_offset, last_end_offset) = byte_range_list.pop()
+            row_end_offset = find_row_end_offset(in_file, last_start_offset, last_end_offset, quote_byte)
+            if (row_end_offset > last_start_offset):
+                byte_range_list.append((last_start_offset, row_end_offset))
+            if (last_end_offset > row_end_offset):
+                pending_byte_range_list.append((row_end_offset, last_end_offset))
+        tail_checksum = _get_tail_checksum(in_file, data_start_offset, row_end_offset)
+
+    table_profile = saved_table_profile
+    if (None == table_profile):
+        table_profile = TableProfile(column_name_list, should_sketch_values)
+    table_profile.merge(read_table_profile_byte_range_list(
+        file_name
+        ,byte_range_list
+        ,column_name_list
+        ,job_count
+        ,charset_name
+        ,charset_error_mode
+        ,newline
+        ,delimiter
+        ,quote_symbol
+        ,should_sketch_values
+        ))
+    table_profile.byte_offset = row_end_offset
+    table_profile.header_checksum = header_checksum
+    table_profile.tail_checksum = tail_checksum
+    if (0 < len(pending_byte_range_list)):
+        table_profile.pending_table_profile = read_table_profile_byte_range_list(
+            file_name
+            ,pending_byte_range_list
+            ,column_name_list
+            ,1
+            ,charset_name
+            ,charset_error_mode
+            ,newline
+            ,delimiter
+            ,quote_symbol
+            ,should_sketch_values
+            )
+    table_profile.finalize()
+    return table_profile
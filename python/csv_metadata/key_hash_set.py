@@ -0,0 +1,273 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Key hash sets: the values seen in a (possible) key column,
+## used to find out whether any value is repeated.
+## Values are kept in a python set up to a budget and then spilled, as 64-bit hashes, to run files
+## in disk partitions (chosen by the high bits of the hash),
+## which are only read back, one partition at a time, when the set is checked.
+
+import array
+import hashlib
+import os
+import shutil
+import tempfile
+import weakref
+
+# number of values kept in memory before their hashes are spilled to disk
+key_value_count_max_default = 1 << 20
+
+_hash_bit_count = 64
+_partition_bit_count = 6
+_partition_count = 1 << _partition_bit_count
+_short_value_byte_count_max = 7
+_hash_array_typecode = 'Q'
+_hash_byte_count = array.array(_hash_array_typecode).itemsize
+_hash_mask = (1 << _hash_bit_count) - 1
+# multipliers of the MurmurHash3 64-bit finalizer
+_mix_multiplier_1 = 0xff51afd7ed558ccd
+_mix_multiplier_2 = 0xc4ceb9fe1a85ec53
+
+
+def get_value_hash(cell_value):
+    """ Get a 64-bit hash of a cell value (a string, or the same value as UTF-8 bytes).
+
+        Values of up to 7 bytes are packed into 64 bits with their length and then mixed
+        (one to one, so they never collide, but e.g. integer IDs still spread over every partition),
+        and longer values are hashed with BLAKE2b,
+        so every process gets the same hash (unlike hash(), which python seeds at random).
+        A collision can only make distinct values look repeated, never the reverse.
+    """
+    if (str is type(cell_value)):
+        cell_value = cell_value.encode("utf_8", "surrogatepass")
+    value_byte_count = len(cell_value)
+    if (value_byte_count <= _short_value_byte_count_max):
+        return _mix_hash(int.from_bytes(cell_value, "little") | (value_byte_count << 56))
+    return int.from_bytes(hashlib.blake2b(cell_value, digest_size=8).digest(), "little")
+
+
+def _mix_hash(value_hash):
+    """ Scramble a 64-bit value one to one, so that every bit of it affects the high (partition) bits.
+    """
+    value_hash ^= value_hash >> 33
+    value_hash = (value_hash * _mix_multiplier_1) & _hash_mask
+    value_hash ^= value_hash >> 33
+    value_hash = (value_hash * _mix_multiplier_2) & _hash_mask
+    value_hash ^= value_hash >> 33
+    return value_hash
+
+
+def get_row_value_hash(cell_value_tuple):
+    """ Get a 64-bit hash of the cell values of a multi-column key.
+    """
+    return get_value_hash("\x1f".join(cell_value_tuple))
+
+
+def get_key_hash(key_value):
+    """ Get a 64-bit hash of a key value: a cell value, or a tuple of cell values.
+    """
+    if (tuple is type(key_value)):
+        return get_row_value_hash(key_value)
+    return get_value_hash(key_value)
+
+
+class KeyHashSet(object):
+    """ A set of key values that spills their 64-bit hashes to disk when it grows past value_count_max.
+
+        Key values are cell values, or tuples of cell values for multi-column keys.
+        add() finds values that repeat a value still held in memory
+        (comparing the values themselves, so the per-value cost is that of a python set);
+        has_repeated_hash() also compares the hashes spilled to disk.
+        Spill files are removed by close(), or when the set is garbage collected;
+        a pickled copy (e.g. the result of a worker process) takes over the spill files.
+    """
+    __slots__ = (
+         "value_count_max"
+        ,"value_set"
+        ,"_spill_dir_name_list"
+        ,"_run_file_name_list_list"
+        ,"_spill_finalizer"
+        ,"__weakref__"
+        )
+
+    def __init__(self, value_count_max=key_value_count_max_default):
+        self.value_count_max = value_count_max
+        self.value_set = set()
+        self._spill_dir_name_list = list()
+        self._run_file_name_list_list = [list() for partition_position in range(_partition_count)]
+        self._spill_finalizer = None
+
+    def add(self, key_value):
+        """ Add a key value, returning False if it repeats a value held in memory.
+        """
+        value_set = self.value_set
+        if (key_value in value_set):
+            return False
+        value_set.add(key_value)
+        if (len(value_set) >= self.value_count_max):
+            self._spill()
+        return True
+
+    def update(self, key_value_set):
+        """ Add a set of distinct key values, returning False if any of them repeats a value held in memory.
+        """
+        if (not self.value_set.isdisjoint(key_value_set)):
+            return False
+        self.value_set |= key_value_set
+        if (len(self.value_set) >= self.value_count_max):
+            self._spill()
+        return True
+
+    def merge(self, other):
+        """ Move the values of another set into this one, returning False if they repeat a value held in memory.
+
+            The other set is left empty.
+        """
+        is_disjoint = self.update(other.value_set)
+        other.value_set = set()
+        if (0 < len(other._spill_dir_name_list)):
+            self._get_spill_dir_name_list()
+            self._spill_dir_name_list.extend(other._spill_dir_name_list)
+            del other._spill_dir_name_list[:]
+            for (run_file_name_list, other_run_file_name_list) in zip(self._run_file_name_list_list, other._run_file_name_list_list):
+                run_file_name_list.extend(other_run_file_name_list)
+                del other_run_file_name_list[:]
+        return is_disjoint
+
+    def has_repeated_hash(self):
+        """ Decide whether any value was added twice, comparing the spilled hashes too.
+
+            Reads one partition at a time (splitting partitions that are still too large),
+            so no more than about value_count_max spilled hashes are held in memory.
+            Once hashes were spilled, a hash collision can make distinct values look repeated.
+        """
+        if (not any(self._run_file_name_list_list)):
+            # every value was compared when it was added
+            return False
+        partition_hash_array_list = _partition_hashes(map(get_key_hash, self.value_set), _hash_bit_count - _partition_bit_count)
+        for (run_file_name_list, hash_array) in zip(self._run_file_name_list_list, partition_hash_array_list):
+            if (self._has_repeated_partition_hash(run_file_name_list, hash_array, _hash_bit_count - _partition_bit_count)):
+                return True
+        return False
+
+    def close(self):
+        """ Remove the spill files and forget every value.
+        """
+        self.value_set = set()
+        for run_file_name_list in self._run_file_name_list_list:
+            del run_file_name_list[:]
+        if (None != self._spill_finalizer):
+            self._spill_finalizer()
+            self._spill_finalizer = None
+        else:
+            _remove_dir_list(self._spill_dir_name_list)
+
+    def __getstate__(self):
+        # the copy takes over the spill files, so this set must not remove them
+        if (None != self._spill_finalizer):
+            self._spill_finalizer.detach()
+            self._spill_finalizer = None
+        state = (
+             self.value_count_max
+            ,self.value_set
+            ,list(self._spill_dir_name_list)
+            ,self._run_file_name_list_list
+            )
+        # close() then leaves the spill directories to the copy (a later spill makes a new one)
+        del self._spill_dir_name_list[:]
+        return state
+
+    def __setstate__(self, state):
+        (
+             self.value_count_max
+            ,self.value_set
+            ,self._spill_dir_name_list
+            ,self._run_file_name_list_list
+            ) = state
+        self._spill_finalizer = None
+        if (0 < len(self._spill_dir_name_list)):
+            self._spill_finalizer = weakref.finalize(self, _remove_dir_list, self._spill_dir_name_list)
+
+    def _get_spill_dir_name_list(self):
+        if (None == self._spill_finalizer):
+            self._spill_finalizer = weakref.finalize(self, _remove_dir_list, self._spill_dir_name_list)
+        return self._spill_dir_name_list
+
+    def _spill(self):
+        spill_dir_name_list = self._get_spill_dir_name_list()
+        if (0 == len(spill_dir_name_list)):
+            spill_dir_name_list.append(tempfile.mkdtemp(prefix="csv_metadata_keys_"))
+        spill_dir_name = spill_dir_name_list[0]
+        for (run_file_name_list, hash_array) in zip(
+            self._run_file_name_list_list
+            ,_partition_hashes(map(get_key_hash, self.value_set), _hash_bit_count - _partition_bit_count)
+        ):
+            if (0 < len(hash_array)):
+                run_file_name_list.append(_write_hash_array(spill_dir_name, hash_array))
+        self.value_set = set()
+
+    def _has_repeated_partition_hash(self, run_file_name_list, hash_array, hash_bit_shift):
+        hash_count = len(hash_array)
+        for run_file_name in run_file_name_list:
+            hash_count += os.path.getsize(run_file_name) // _hash_byte_count
+        if (hash_count <= self.value_count_max
+            or hash_bit_shift < _partition_bit_count
+        ):
+            for run_file_name in run_file_name_list:
+                hash_array.extend(_read_hash_array(run_file_name))
+            return (len(set(hash_array)) != len(hash_array))
+        # split the partition by the next bits of the hash, one run at a time
+        sub_hash_bit_shift = hash_bit_shift - _partition_bit_count
+        sub_run_file_name_list_list = [list() for partition_position in range(_partition_count)]
+        spill_dir_name = self._spill_dir_name_list[0]
+        try:
+            for run_file_name in [None] + run_file_name_list:
+                run_hash_array = hash_array
+                if (None != run_file_name):
+                    run_hash_array = _read_hash_array(run_file_name)
+                for (sub_run_file_name_list, sub_hash_array) in zip(
+                    sub_run_file_name_list_list
+                    ,_partition_hashes(run_hash_array, sub_hash_bit_shift)
+                ):
+                    if (0 < len(sub_hash_array)):
+                        sub_run_file_name_list.append(_write_hash_array(spill_dir_name, sub_hash_array))
+            for sub_run_file_name_list in sub_run_file_name_list_list:
+                if (self._has_repeated_partition_hash(sub_run_file_name_list, array.array(_hash_array_typecode), sub_hash_bit_shift)):
+                    return True
+            return False
+        finally:
+            for sub_run_file_name_list in sub_run_file_name_list_list:
+                for sub_run_file_name in sub_run_file_name_list:
+                    os.remove(sub_run_file_name)
+
+
+def _partition_hashes(value_hash_iter, hash_bit_shift):
+    """ Split hashes into one array per partition, by the partition bits starting at hash_bit_shift.
+    """
+    partition_hash_array_list = [array.array(_hash_array_typecode) for partition_position in range(_partition_count)]
+    partition_mask = _partition_count - 1
+    for value_hash in value_hash_iter:
+        partition_hash_array_list[(value_hash >> hash_bit_shift) & partition_mask].append(value_hash)
+    return partition_hash_array_list
+
+
+def _write_hash_array(dir_name, hash_array):
+    """ Write hashes to a new run file in a directory and return the file name.
+    """
+    (file_id, file_name) = tempfile.mkstemp(suffix=".bin", dir=dir_name)
+    with open(file_id, mode='wb') as out_file:
+        hash_array.tofile(out_file)
+    return file_name
+
+
+def _read_hash_array(file_name):
+    hash_array = array.array(_hash_array_typecode)
+    with open(file_name, mode='rb') as in_file:
+        hash_array.frombytes(in_file.read())
+    return hash_array
+
+
+def _remove_dir_list(dir_name_list):
+    for dir_name in dir_name_list:
+        shutil.rmtree(dir_name, ignore_errors=True)
+    del dir_name_list[:]
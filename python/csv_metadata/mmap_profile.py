@@ -0,0 +1,141 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Memory-mapped profiling of a CSV table file.
+## Rows are split on the raw bytes of the file and ASCII cells are profiled as bytes,
+## so most cells are never decoded into str objects or parsed by the csv module.
+
+import csv
+import io
+import mmap
+import os
+import re
+
+from .table_profile import TableProfile
+from .parallel_profile import read_table_header
+
+
+def _iter_mapped_rows(
+    in_map
+    ,start_offset
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol
+    ):
+    """ Generate the data rows of a memory-mapped table file, starting at start_offset.
+
+        Cells of lines that only have ASCII characters are generated as bytes;
+        other lines are decoded and generated as lists of str.
+        Lines with quote characters or other characters that the csv module
+        treats specially are parsed by the csv module,
+        together with the following lines until the quotes are balanced.
+    """
+    quote_byte = quote_symbol.encode("ascii")
+    delimiter_byte = delimiter.encode("ascii")
+    special_byte_regex = re.compile(b"[\\r\\x00" + re.escape(quote_byte) + b"]")
+    in_map.seek(start_offset)
+    for line in iter(in_map.readline, b""):
+        line_text_end = len(line)
+        if (line.endswith(b"\n")):
+            line_text_end -= 1
+            if (line.endswith(b"\r\n")):
+                line_text_end -= 1
+        elif (line.endswith(b"\r")):
+            line_text_end -= 1
+        if (0 == line_text_end):
+            yield []
+            continue
+        line_text = line[:line_text_end]
+        if (None != special_byte_regex.search(line_text)):
+            # let the csv module deal with quoted cells, which can hold newlines
+            line_list = [line]
+            quote_parity = line.count(quote_byte) & 1
+            while (0 != quote_parity):
+                line = in_map.readline()
+                if (0 == len(line)):
+                    break
+                line_list.append(line)
+                quote_parity ^= line.count(quote_byte) & 1
+            in_text = b"".join(line_list).decode(charset_name, charset_error_mode)
+            in_csv = csv.reader(
+                 io.StringIO(in_text, newline='')
+                ,delimiter=delimiter
+                ,quotechar=quote_symbol
+                )
+            for in_row in in_csv:
+                yield in_row
+        elif (line_text.isascii()):
+            yield line_text.split(delimiter_byte)
+        else:
+            yield line_text.decode(charset_name, charset_error_mode).split(delimiter)
+
+
+def read_table_profile_mmap(
+    file_name
+    ,in_row_count_max
+    ,should_stop_when_settled
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol='"'
+    ,should_sketch_values=False
+    ):
+    """ Profile a table file by scanning a memory map of its bytes.
+
+        The file must be splittable (see parallel_profile.can_split_table_file),
+        so that delimiter, quote and newline characters are single ASCII bytes.
+        The statistics are the same as those of read_table_profile().
+        Returns a finalized TableProfile, or None if the file has no header row.
+    """
+    with io.open(file_name, mode='rb') as in_file:
+        (column_name_list, data_start_offset) = read_table_header(
+            in_file
+            ,charset_name
+            ,charset_error_mode
+            ,newline
+            ,delimiter
+            ,quote_symbol
+            )
+        if (None == column_name_list):
+            return None
+        table_profile = TableProfile(column_name_list, should_sketch_values)
+        if (data_start_offset < os.fstat(in_file.fileno()).st_size):
+            with mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as in_map:
+                in_row_iter = _iter_mapped_rows(
+                    in_map
+                    ,data_start_offset
+                    ,charset_name
+                    ,charset_error_mode
+                    ,newline
+                    ,delimiter
+                    ,quote_symbol
+                    )
+                # the example row is written to the schema, so it has to be text
+                in_row = next(in_row_iter, None)
+                if (None != in_row):
+                    table_profile.example_row = [
+                        _decode_cell(cell_value, charset_name, charset_error_mode)
+                        for cell_value in in_row
+                        ]
+                    table_profile.update_rows(
+                        _chain_row(in_row, in_row_iter)
+                        ,in_row_count_max
+                        ,should_stop_when_settled
+                        )
+                in_row_iter.close()
+    table_profile.finalize()
+    return table_profile
+
+
+def _chain_row(first_row, in_row_iter):
+    yield first_row
+    yield from in_row_iter
+
+
+def _decode_cell(cell_value, charset_name, charset_error_mode):
+    if (bytes is type(cell_value)):
+        return cell_value.decode(charset_name, charset_error_mode)
+    return cell_value
@@ -0,0 +1,351 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Batch profiling of CSV rows with NumPy.
+## Rows are read in batches and transposed into one block of cells per column.
+## The lengths, blank cells and plain decimals (e.g. "-12.50") of a block
+## are found with array operations on the character codes of its cells,
+## and only the cells that could still be other kinds of numbers ("1e5", "nan", " 7")
+## are classified one at a time (see ColumnProfile.count_number_value()).
+
+import heapq
+import itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .table_profile import TableProfile
+
+batch_row_count_default = 64*1024
+
+# cells up to this long are classified with array operations, longer ones one at a time
+_code_cell_char_count_max = 64
+# decimals with up to this many digits have exact int64 values,
+#  and a fraction with up to _float_digit_count_max digits is exactly float() of the cell
+#  (both the digits and the power of ten are exact doubles, so one division rounds correctly)
+_int_digit_count_max = 18
+_float_digit_count_max = 15
+
+_code_zero = ord("0")
+_code_nine = ord("9")
+_code_point = ord(".")
+_code_plus = ord("+")
+_code_minus = ord("-")
+
+if (None != numpy):
+    _int_power_array = 10 ** numpy.arange(_int_digit_count_max + 1, dtype=numpy.int64)
+    _float_power_array = 10.0 ** numpy.arange(_int_digit_count_max + 1, dtype=numpy.float64)
+    # characters for which str.isspace() is True all have codes below U+3001
+    _space_code_count = 0x3001
+    _space_code_table = numpy.array(
+        [chr(char_code).isspace() for char_code in range(_space_code_count)] + [False]
+        ,dtype=bool
+        )
+    # ASCII characters that can be part of a number (see cell_classifier):
+    #  digits, whitespace, signs, points, exponents, underscores and the letters of "nan" and "infinity";
+    #  a cell with any other ASCII character is not a number (other characters could be digits or whitespace)
+    _number_code_table = numpy.array(
+        [
+            (chr(char_code).isdigit() or chr(char_code).isspace() or chr(char_code) in "+-._eEnNaAiIfFtTyY")
+            for char_code in range(128)
+        ] + [True]
+        ,dtype=bool
+        )
+
+
+def is_numpy_available():
+    return (None != numpy)
+
+
+def _get_column_value_tuple_list(row_list, column_count):
+    """ Transpose a list of rows into one tuple of cell values per column.
+
+        Like TableProfile.update_rows(), cells beyond the header are ignored,
+        and a short row has no cells in the columns it is missing.
+    """
+    if ({column_count} == set(map(len, row_list))):
+        return list(zip(*row_list))
+    column_value_tuple_list = list()
+    for (column_position, column_value_tuple) in enumerate(itertools.zip_longest(*row_list)):
+        if (column_position >= column_count):
+            break
+        column_value_tuple_list.append(tuple(
+            cell_value for cell_value in column_value_tuple if (None != cell_value)
+            ))
+    while (len(column_value_tuple_list) < column_count):
+        column_value_tuple_list.append(tuple())
+    return column_value_tuple_list
+
+
+def _get_code_array(value_list, char_count_max):
+    """ Make a (value count, char_count_max) array of the character codes of a list of strings,
+        padded with zero codes.
+    """
+    value_array = numpy.array(value_list, dtype="U{}".format(char_count_max))
+    return value_array.view(numpy.uint32).reshape(len(value_list), char_count_max)
+
+
+def _get_decimal_statistics(
+    decimal_value_list
+    ,code_array
+    ,char_count_array
+    ,sign_count_array
+    ,int_digit_count_array
+    ,frac_digit_count_array
+    ):
+    """ Summarize a block of plain decimals (the arrays have one row per decimal),
+        as the arguments of ColumnProfile.update_decimal_statistics() after not_number_count,
+        with the float values in an array.
+    """
+    position_array = numpy.arange(code_array.shape[1])
+    digit_count_array = int_digit_count_array + frac_digit_count_array
+    first_code_array = code_array[:, 0]
+    is_negative_array = (_code_minus == first_code_array)
+
+    # the digits of decimals that have an exact int64 value, each times the power of ten of its position
+    #  (the count of digits after it)
+    is_digit_array = (
+        (position_array < char_count_array[:, None])
+        & (_code_zero <= code_array)
+        & (code_array <= _code_nine)
+        & (digit_count_array <= _int_digit_count_max)[:, None]
+        )
+    digit_power_array = numpy.cumsum(is_digit_array[:, ::-1], axis=1)[:, ::-1] - is_digit_array
+    digit_power_array = numpy.minimum(digit_power_array, _int_digit_count_max)
+    digits_int_array = numpy.where(
+        is_digit_array
+        ,(code_array.astype(numpy.int64) - _code_zero) * _int_power_array[digit_power_array]
+        ,0
+        ).sum(axis=1)
+    digits_int_array = numpy.where(is_negative_array, -digits_int_array, digits_int_array)
+
+    float_array = (
+        digits_int_array.astype(numpy.float64)
+        / _float_power_array[numpy.minimum(frac_digit_count_array, _int_digit_count_max)]
+        )
+    # "-0" is -0.0, as float() has it
+    float_array = numpy.where(is_negative_array, -numpy.abs(float_array), float_array)
+    is_long_float_array = (_float_digit_count_max < digit_count_array)
+    if (is_long_float_array.any()):
+        float_array[is_long_float_array] = list(map(
+            float
+            ,itertools.compress(decimal_value_list, is_long_float_array.tolist())
+            ))
+
+    has_fraction_array = (0 < frac_digit_count_array)
+    is_long_int_array = ~has_fraction_array & (_int_digit_count_max < digit_count_array)
+    int_list = list()
+    int_array = digits_int_array[~has_fraction_array & ~is_long_int_array]
+    if (0 < len(int_array)):
+        int_list.extend((int(int_array.min()), int(int_array.max())))
+    if (is_long_int_array.any()):
+        int_list.extend(map(int, itertools.compress(decimal_value_list, is_long_int_array.tolist())))
+    int_min = None
+    int_max = None
+    if (0 < len(int_list)):
+        int_min = min(int_list)
+        int_max = max(int_list)
+    leading_zero_count = int((
+        (0 == sign_count_array)
+        & (1 < int_digit_count_array)
+        & (_code_zero == first_code_array)
+        ).sum())
+    return (
+        int_min
+        ,int_max
+        ,int(has_fraction_array.sum())
+        ,float_array
+        ,int(digit_count_array.min())
+        ,int(digit_count_array.max())
+        ,int(frac_digit_count_array.min())
+        ,int(frac_digit_count_array.max())
+        ,leading_zero_count
+        )
+
+
+def _update_number_statistics(column_profile, value_list, code_array, char_count_array):
+    """ Accumulate the number statistics of a block of not-null cells (see ColumnProfile.update_cells()).
+
+        Plain decimals (e.g. "-12.50") and cells that can't be numbers are counted with array operations,
+        and the other cells, which could be numbers written in other ways (e.g. "1e5", " 7", "nan"),
+        one at a time.
+    """
+    position_array = numpy.arange(code_array.shape[1])
+    is_char_array = (position_array < char_count_array[:, None])
+    is_digit_array = is_char_array & (_code_zero <= code_array) & (code_array <= _code_nine)
+    is_point_array = is_char_array & (_code_point == code_array)
+    first_code_array = code_array[:, 0]
+    sign_count_array = ((_code_plus == first_code_array) | (_code_minus == first_code_array)).astype(numpy.int64)
+
+    # a cell with an ASCII character that no number has
+    is_not_number_array = (
+        is_char_array
+        & ~_number_code_table[numpy.minimum(code_array, 128)]
+        ).any(axis=1)
+
+    # [sign] digits [point digits], with ASCII digits
+    other_char_array = is_char_array & ~is_digit_array & ~is_point_array
+    other_char_array[:, 0] &= (0 == sign_count_array)
+    point_count_array = is_point_array.sum(axis=1)
+    has_point_array = (1 == point_count_array)
+    point_position_array = numpy.where(has_point_array, is_point_array.argmax(axis=1), char_count_array)
+    int_digit_count_array = point_position_array - sign_count_array
+    frac_digit_count_array = numpy.where(has_point_array, char_count_array - point_position_array - 1, 0)
+    is_decimal_array = (
+        ~other_char_array.any(axis=1)
+        & (point_count_array <= 1)
+        & (1 <= int_digit_count_array)
+        & (~has_point_array | (1 <= frac_digit_count_array))
+        )
+
+    is_other_array = ~(is_decimal_array | is_not_number_array)
+    other_float_item_list = list()
+    for (value_position, cell_value) in zip(
+        numpy.flatnonzero(is_other_array).tolist()
+        ,itertools.compress(value_list, is_other_array.tolist())
+    ):
+        if (column_profile.is_settled):
+            break
+        cell_value_float = column_profile.count_number_value(cell_value)
+        if (None != cell_value_float):
+            other_float_item_list.append((value_position, cell_value_float))
+
+    decimal_statistics = (None, None, 0, numpy.empty(0), None, None, None, None, 0)
+    if (is_decimal_array.any()):
+        decimal_statistics = _get_decimal_statistics(
+            list(itertools.compress(value_list, is_decimal_array.tolist()))
+            ,code_array[is_decimal_array]
+            ,char_count_array[is_decimal_array]
+            ,sign_count_array[is_decimal_array]
+            ,int_digit_count_array[is_decimal_array]
+            ,frac_digit_count_array[is_decimal_array]
+            )
+    (
+        int_min
+        ,int_max
+        ,fraction_count
+        ,float_array
+        ,decimal_precision_digit_count_min
+        ,decimal_precision_digit_count_max
+        ,decimal_scale_digit_count_min
+        ,decimal_scale_digit_count_max
+        ,leading_zero_count
+        ) = decimal_statistics
+    float_value_list = float_array.tolist()
+    if (0 < len(other_float_item_list)):
+        # the numbers are counted in row order, as update() counts them
+        float_value_list = [
+            cell_value_float
+            for (value_position, cell_value_float) in heapq.merge(
+                zip(numpy.flatnonzero(is_decimal_array).tolist(), float_value_list)
+                ,other_float_item_list
+                )
+            ]
+    column_profile.update_decimal_statistics(
+        int(is_not_number_array.sum())
+        ,int_min
+        ,int_max
+        ,fraction_count
+        ,float_value_list
+        ,decimal_precision_digit_count_min
+        ,decimal_precision_digit_count_max
+        ,decimal_scale_digit_count_min
+        ,decimal_scale_digit_count_max
+        ,leading_zero_count
+        )
+
+
+def update_column_profile_block(column_profile, cell_value_list):
+    """ Accumulate statistics from a block of the cells (str values, in row order) of one column.
+
+        Gives the same datatype as calling column_profile.update() for each cell.
+    """
+    value_list = column_profile.update_cells(cell_value_list)
+    if (0 == len(value_list)):
+        return
+    char_count_array = numpy.fromiter(map(len, value_list), dtype=numpy.int64, count=len(value_list))
+    is_short_array = (char_count_array <= _code_cell_char_count_max)
+    short_value_list = value_list
+    long_value_list = list()
+    if (not is_short_array.all()):
+        short_value_list = list(itertools.compress(value_list, is_short_array.tolist()))
+        long_value_list = list(itertools.compress(value_list, (~is_short_array).tolist()))
+    short_char_count_array = char_count_array[is_short_array]
+    blank_cell_count = sum(map(str.isspace, long_value_list))
+    if (0 < len(short_value_list)):
+        code_array = _get_code_array(short_value_list, max(1, int(short_char_count_array.max())))
+        # blank cells have only whitespace (padding codes are zero, which isn't whitespace)
+        is_char_array = (numpy.arange(code_array.shape[1]) < short_char_count_array[:, None])
+        is_space_array = _space_code_table[numpy.minimum(code_array, _space_code_count)]
+        blank_cell_count += int((is_space_array | ~is_char_array).all(axis=1).sum())
+    column_profile.update_char_counts(
+        int(char_count_array.min())
+        ,int(char_count_array.max())
+        ,blank_cell_count
+        )
+    if (column_profile.is_settled):
+        return
+    if (not column_profile.update_time_formats(value_list)):
+        return
+    if (0 < len(short_value_list)):
+        _update_number_statistics(column_profile, short_value_list, code_array, short_char_count_array)
+    for cell_value in long_value_list:
+        if (column_profile.is_settled):
+            break
+        column_profile.update_number_statistics(cell_value)
+
+
+def update_table_profile_batch(table_profile, row_list):
+    """ Accumulate statistics from a batch of data rows.
+    """
+    if (0 == len(row_list)):
+        return
+    if (None == table_profile.example_row):
+        table_profile.example_row = list(row_list[0])
+    table_profile.row_count += len(row_list)
+    column_profile_list = table_profile.column_profile_list
+    column_value_tuple_list = _get_column_value_tuple_list(row_list, len(column_profile_list))
+    for (column_profile, column_value_tuple) in zip(column_profile_list, column_value_tuple_list):
+        if (0 == len(column_value_tuple)):
+            continue
+        update_column_profile_block(column_profile, column_value_tuple)
+
+
+def read_table_profile_numpy(
+    in_csv
+    ,in_row_count_max=None
+    ,should_stop_when_settled=False
+    ,batch_row_count=batch_row_count_default
+    ,should_sketch_values=False
+    ):
+    """ Read a header row and then data rows from a csv reader and profile them in batches.
+
+        The statistics are the same as those of read_table_profile(),
+        except that should_stop_when_settled is only checked between batches.
+        Requires NumPy (see is_numpy_available()).
+        Returns a finalized TableProfile, or None if the reader has no header row.
+    """
+    end_row = None
+    in_header_row = next(in_csv, end_row)
+    if (end_row == in_header_row):
+        return None
+    table_profile = TableProfile(in_header_row, should_sketch_values)
+    in_row_count = 0
+    while (None == in_row_count_max or in_row_count < in_row_count_max):
+        in_batch_row_count = batch_row_count
+        if (None != in_row_count_max):
+            in_batch_row_count = min(batch_row_count, in_row_count_max - in_row_count)
+        row_list = list(itertools.islice(in_csv, in_batch_row_count))
+        if (0 == len(row_list)):
+            break
+        update_table_profile_batch(table_profile, row_list)
+        in_row_count += len(row_list)
+        if (should_stop_when_settled and table_profile.is_settled()):
+            table_profile.stop_key_tracking()
+            break
+    if (None != in_row_count_max and in_row_count >= in_row_count_max):
+        table_profile.stop_key_tracking()
+    table_profile.finalize()
+    return table_profile
@@ -0,0 +1,342 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Multi-process profiling of a CSV table file.
+## The file is split into byte ranges that start and end on row boundaries,
+## each range is profiled by a worker process,
+## and the per-range TableProfile objects are merged in file order.
+
+import codecs
+import concurrent.futures
+import csv
+import io
+import os
+
+from .table_profile import TableProfile
+from .compressed_input import (
+    detect_file_compression_name
+    )
+
+# Splitting on raw bytes requires that quote, delimiter and newline characters
+#  are single bytes that never appear inside other characters.
+_splittable_codec_name_prefix_list = (
+     "utf-8"
+    ,"ascii"
+    ,"latin-1"
+    ,"iso8859-"
+    ,"cp125"
+    )
+
+chunk_byte_count_min = 1024*1024
+chunk_byte_count_max = 64*1024*1024
+_scan_block_byte_count = 1024*1024
+
+
+def can_split_table_file(
+    file_name
+    ,charset_name
+    ,newline
+    ,delimiter
+    ,quote_symbol
+    ):
+    """ Decide whether a table file can be split into byte ranges on row boundaries.
+
+        A compressed file can't be split (its bytes can only be read in order).
+    """
+    if (None == file_name
+        or not os.path.isfile(file_name)
+        or None != detect_file_compression_name(file_name)
+    ):
+        return False
+    if (newline not in ("\n", "\r\n")):
+        return False
+    if (1 != len(delimiter)
+        or 1 != len(quote_symbol)
+        or not delimiter.isascii()
+        or not quote_symbol.isascii()
+    ):
+        return False
+    try:
+        codec_name = codecs.lookup(charset_name).name
+    except LookupError:
+        return False
+    return codec_name.startswith(_splittable_codec_name_prefix_list)
+
+
+def split_row_byte_ranges(
+    in_file
+    ,start_offset
+    ,chunk_byte_count
+    ,quote_byte
+    ,newline_byte=b"\n"
+    ,range_count_max=None
+    ):
+    """ Split a binary file into byte ranges of about chunk_byte_count bytes each.
+
+        Each range ends just after a newline byte that is outside of a quoted cell.
+        Quoting is tracked by the parity of the count of quote bytes
+        since start_offset (which must be the start of a row);
+        doubled quotes inside quoted cells do not change the parity.
+        Quote characters that appear inside unquoted cells
+        are not valid CSV and can cause a split inside a row.
+
+        Returns a list of (start_offset, end_offset) tuples.
+    """
+    byte_range_list = list()
+    range_start_offset = start_offset
+    split_offset = start_offset + chunk_byte_count
+    quote_parity = 0
+    block_offset = start_offset
+    in_file.seek(start_offset)
+    block = in_file.read(_scan_block_byte_count)
+    while (0 < len(block)
+        and (None == range_count_max or len(byte_range_list) < range_count_max)
+    ):
+        block_end_offset = block_offset + len(block)
+        block_position = 0
+        while (split_offset < block_end_offset
+            and (None == range_count_max or len(byte_range_list) < range_count_max)
+        ):
+            # count quotes up to the split point, then look for an unquoted newline
+            split_position = max(block_position, split_offset - block_offset)
+            quote_parity ^= block.count(quote_byte, block_position, split_position) & 1
+            block_position = split_position
+            newline_position = block.find(newline_byte, block_position)
+            while (0 <= newline_position):
+                quote_parity ^= block.count(quote_byte, block_position, newline_position) & 1
+                block_position = newline_position + 1
+                if (0 == quote_parity):
+                    break
+                newline_position = block.find(newline_byte, block_position)
+            if (0 > newline_position):
+                # keep looking in the next block
+                split_offset = block_end_offset
+                break
+            range_end_offset = block_offset + block_position
+            byte_range_list.append((range_start_offset, range_end_offset))
+            range_start_offset = range_end_offset
+            split_offset = range_end_offset + chunk_byte_count
+        quote_parity ^= block.count(quote_byte, block_position) & 1
+        block_offset = block_end_offset
+        block = in_file.read(_scan_block_byte_count)
+    if (block_offset > range_start_offset
+        and (None == range_count_max or len(byte_range_list) < range_count_max)
+    ):
+        byte_range_list.append((range_start_offset, block_offset))
+    return byte_range_list
+
+
+def read_table_profile_byte_range(
+    file_name
+    ,start_offset
+    ,end_offset
+    ,column_name_list
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol
+    ,should_sketch_values=False
+    ):
+    """ Profile the data rows stored in a byte range of a table file.
+    """
+    with io.open(file_name, mode='rb') as in_file:
+        in_file.seek(start_offset)
+        in_bytes = in_file.read(end_offset - start_offset)
+    in_text = in_bytes.decode(charset_name, charset_error_mode)
+    in_bytes = None
+    # the csv module splits the rows itself, so keep the newlines of quoted cells as they are
+    in_csv = csv.reader(
+         io.StringIO(in_text, newline='')
+        ,delimiter=delimiter
+        ,quotechar=quote_symbol
+        )
+    table_profile = TableProfile(column_name_list, should_sketch_values)
+    table_profile.update_rows(in_csv)
+    return table_profile
+
+
+def find_row_end_offset(
+    in_file
+    ,start_offset
+    ,end_offset
+    ,quote_byte
+    ,newline_byte=b"\n"
+    ):
+    """ Find the end of the last complete row in a byte range of a binary file.
+
+        start_offset must be the start of a row.
+        Returns the offset just after the last newline byte that is outside of a quoted cell,
+        or start_offset if the range has no complete row.
+    """
+    # quote parity at the end of the range
+    quote_parity = 0
+    block_offset = start_offset
+    in_file.seek(start_offset)
+    while (block_offset < end_offset):
+        block = in_file.read(min(_scan_block_byte_count, end_offset - block_offset))
+        if (0 == len(block)):
+            end_offset = block_offset
+            break
+        quote_parity ^= block.count(quote_byte) & 1
+        block_offset += len(block)
+    # walk backwards until a newline with an even quote parity before it
+    block_end_offset = end_offset
+    while (block_end_offset > start_offset):
+        block_offset = max(start_offset, block_end_offset - _scan_block_byte_count)
+        in_file.seek(block_offset)
+        block = in_file.read(block_end_offset - block_offset)
+        block_position = len(block)
+        newline_position = block.rfind(newline_byte, 0, block_position)
+        while (0 <= newline_position):
+            quote_parity ^= block.count(quote_byte, newline_position, block_position) & 1
+            block_position = newline_position
+            if (0 == quote_parity):
+                return block_offset + newline_position + 1
+            newline_position = block.rfind(newline_byte, 0, block_position)
+        quote_parity ^= block.count(quote_byte, 0, block_position) & 1
+        block_end_offset = block_offset
+    return start_offset
+
+
+def read_table_header(
+    in_file
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol
+    ):
+    """ Read the header row of a binary table file.
+
+        Returns a tuple (column_name_list, data_start_offset),
+        or (None, None) if the file has no header row.
+    """
+    quote_byte = quote_symbol.encode("ascii")
+    header_range_list = split_row_byte_ranges(in_file, 0, 0, quote_byte, range_count_max=1)
+    if (0 == len(header_range_list)):
+        return (None, None)
+    (header_start_offset, data_start_offset) = header_range_list[0]
+    in_file.seek(header_start_offset)
+    header_text = in_file.read(data_start_offset).decode(charset_name, charset_error_mode)
+    in_csv = csv.reader(
+         io.StringIO(header_text, newline='')
+        ,delimiter=delimiter
+        ,quotechar=quote_symbol
+        )
+    column_name_list = next(in_csv, None)
+    if (None == column_name_list):
+        return (None, None)
+    return (column_name_list, data_start_offset)
+
+
+def get_chunk_byte_count(byte_count, job_count):
+    # use several chunks per job so that workers finish at about the same time
+    chunk_byte_count = byte_count // (max(1, job_count) * 4)
+    return max(chunk_byte_count_min, min(chunk_byte_count_max, chunk_byte_count))
+
+
+def read_table_profile_byte_range_list(
+    file_name
+    ,byte_range_list
+    ,column_name_list
+    ,job_count
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol
+    ,should_sketch_values=False
+    ):
+    """ Profile the data rows stored in a list of byte ranges of a table file.
+
+        Ranges are profiled by a pool of job_count worker processes
+        (or in this process if job_count is 1 or there is only one range)
+        and merged in list order.
+        Returns a TableProfile that has not been finalized.
+    """
+    table_profile = TableProfile(column_name_list, should_sketch_values)
+    if (1 >= job_count
+        or 1 >= len(byte_range_list)
+    ):
+        for (start_offset, end_offset) in byte_range_list:
+            table_profile.merge(read_table_profile_byte_range(
+                file_name
+                ,start_offset
+                ,end_offset
+                ,column_name_list
+                ,charset_name
+                ,charset_error_mode
+                ,newline
+                ,delimiter
+                ,quote_symbol
+                ,should_sketch_values
+                ))
+        return table_profile
+    with concurrent.futures.ProcessPoolExecutor(max_workers=job_count) as executor:
+        future_list = list()
+        for (start_offset, end_offset) in byte_range_list:
+            future = executor.submit(
+                read_table_profile_byte_range
+                ,file_name
+                ,start_offset
+                ,end_offset
+                ,column_name_list
+                ,charset_name
+                ,charset_error_mode
+                ,newline
+                ,delimiter
+                ,quote_symbol
+                ,should_sketch_values
+                )
+            future_list.append(future)
+        # merge in file order so that the example row is the first row of the table
+        for future in future_list:
+            table_profile.merge(future.result())
+    return table_profile
+
+
+def read_table_profile_parallel(
+    file_name
+    ,job_count
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol='"'
+    ,should_sketch_values=False
+    ):
+    """ Profile a table file with a pool of job_count worker processes.
+
+        Returns a finalized TableProfile, or None if the file has no header row.
+    """
+    quote_byte = quote_symbol.encode("ascii")
+    file_byte_count = os.path.getsize(file_name)
+    with io.open(file_name, mode='rb') as in_file:
+        (column_name_list, data_start_offset) = read_table_header(
+            in_file
+            ,charset_name
+            ,charset_error_mode
+            ,newline
+            ,delimiter
+            ,quote_symbol
+            )
+        if (None == column_name_list):
+            return None
+        chunk_byte_count = get_chunk_byte_count(file_byte_count - data_start_offset, job_count)
+        byte_range_list = split_row_byte_ranges(in_file, data_start_offset, chunk_byte_count, quote_byte)
+
+    table_profile = read_table_profile_byte_range_list(
+        file_name
+        ,byte_range_list
+        ,column_name_list
+        ,job_count
+        ,charset_name
+        ,charset_error_mode
+        ,newline
+        ,delimiter
+        ,quote_symbol
+        ,should_sketch_values
+        )
+    table_profile.finalize()
+    return table_profile
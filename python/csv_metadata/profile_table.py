@@ -0,0 +1,219 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Python API for profiling a table without the csv-mkmeta command line.
+
+import csv
+import io
+import os
+
+from ._csv_helpers import (
+    decode_delimiter_name
+    ,decode_charset_name
+    ,decode_newline
+    )
+from .charset_detection import (
+    charset_name_auto
+    ,charset_name_default
+    ,resolve_file_charset_name
+    )
+from .dialect_detection import (
+    dialect_name_auto
+    ,delimiter_default
+    ,newline_default
+    ,quote_symbol_default
+    ,resolve_file_dialect
+    )
+from .compressed_input import open_table_file
+from .table_profile import read_table_profile
+from .table_schema import table_schema_from_profile
+from .parallel_profile import (
+    can_split_table_file
+    ,read_table_profile_parallel
+    )
+from .sample_profile import read_table_profile_sample
+from .mmap_profile import read_table_profile_mmap
+from .numpy_profile import (
+    is_numpy_available
+    ,read_table_profile_numpy
+    )
+
+engine_name_csv = "csv"
+engine_name_mmap = "mmap"
+engine_name_numpy = "numpy"
+engine_name_list = (
+     engine_name_csv
+    ,engine_name_mmap
+    ,engine_name_numpy
+    )
+
+
+def profile(
+    source
+    ,*
+    ,encoding=charset_name_auto
+    ,errors='strict'
+    ,delimiter=dialect_name_auto
+    ,newline=dialect_name_auto
+    ,quote_symbol=None
+    ,max_rows=None
+    ,sample_rows=None
+    ,jobs=1
+    ,engine=engine_name_csv
+    ,approx_size=False
+    ,sketch=False
+    ):
+    """ Profile a table and return its TableSchema (or None if the table has no header row).
+
+        source is a file name, a binary or text file object, or an iterator of rows (lists of str);
+        the first row is the header row.
+        encoding, delimiter and newline accept the same names as the csv-mkmeta options,
+        and like them default to 'auto': detected from a sample of a file named by source
+        (see charset_detection and dialect_detection), and otherwise the csv-mkmeta defaults.
+        quote_symbol None is the quote detected along with the delimiter (or '"').
+        The other options match the csv-mkmeta options:
+        max_rows (-N), sample_rows (--sample), jobs (-j), engine (--engine), approx_size (--approx-size)
+        and sketch (--sketch).
+        Options that need random access to the table file
+        (sample_rows, jobs > 1 and the 'mmap' engine)
+        are only used when source is the name of a file that can be split on row boundaries;
+        otherwise sample_rows is treated like max_rows.
+        The 'numpy' engine is only used when NumPy is installed.
+
+        The schema statistics are in the table_profile attribute of the result.
+        Raises ValueError if engine is not one of engine_name_list,
+        and CharsetMismatchError (a ValueError) if errors is 'strict'
+        and a sample of the file doesn't decode with its charset.
+    """
+    if (engine not in engine_name_list):
+        raise ValueError("unknown engine: {}".format(engine))
+    charset_name = decode_charset_name(encoding)
+    delimiter = decode_delimiter_name(delimiter)
+    newline = decode_newline(newline)
+    if (isinstance(source, (str, bytes, os.PathLike))):
+        file_name = os.fsdecode(source)
+        charset_name = resolve_file_charset_name(file_name, charset_name, errors)
+        (delimiter, detected_quote_symbol, newline) = resolve_file_dialect(
+            file_name
+            ,charset_name
+            ,delimiter
+            ,newline
+            )
+        if (None == quote_symbol):
+            quote_symbol = detected_quote_symbol
+        if (can_split_table_file(file_name, charset_name, newline, delimiter, quote_symbol)
+            and None == max_rows
+        ):
+            table_profile = None
+            if (None != sample_rows):
+                table_profile = read_table_profile_sample(
+                    file_name
+                    ,sample_rows
+                    ,charset_name
+                    ,errors
+                    ,newline
+                    ,delimiter
+                    ,quote_symbol
+                    ,should_sketch_values=sketch
+                    )
+            elif (1 < jobs):
+                table_profile = read_table_profile_parallel(
+                    file_name
+                    ,jobs
+                    ,charset_name
+                    ,errors
+                    ,newline
+                    ,delimiter
+                    ,quote_symbol
+                    ,sketch
+                    )
+            elif (engine_name_mmap == engine):
+                table_profile = read_table_profile_mmap(
+                    file_name
+                    ,max_rows
+                    ,approx_size
+                    ,charset_name
+                    ,errors
+                    ,newline
+                    ,delimiter
+                    ,quote_symbol
+                    ,sketch
+                    )
+            if (None != table_profile):
+                return table_schema_from_profile(table_profile)
+        with io.TextIOWrapper(
+             open_table_file(file_name)
+            ,encoding=charset_name
+            ,newline=''  # don't translate newline chars
+            ,errors=errors
+        ) as in_file:
+            return _profile_rows(
+                _get_csv_reader(in_file, delimiter, newline, quote_symbol)
+                ,max_rows
+                ,sample_rows
+                ,engine
+                ,approx_size
+                ,sketch
+                )
+    # without a file to sample, 'auto' means the csv-mkmeta default
+    if (charset_name_auto == charset_name):
+        charset_name = charset_name_default
+    if (dialect_name_auto == delimiter):
+        delimiter = delimiter_default
+    if (dialect_name_auto == newline):
+        newline = newline_default
+    if (None == quote_symbol):
+        quote_symbol = quote_symbol_default
+    if (hasattr(source, "read")):
+        in_file = source
+        if (not isinstance(source, io.TextIOBase)):
+            # a binary file object
+            in_file = io.TextIOWrapper(
+                 source
+                ,encoding=charset_name
+                ,newline=''  # don't translate newline chars
+                ,errors=errors
+                )
+        try:
+            return _profile_rows(
+                _get_csv_reader(in_file, delimiter, newline, quote_symbol)
+                ,max_rows
+                ,sample_rows
+                ,engine
+                ,approx_size
+                ,sketch
+                )
+        finally:
+            if (in_file is not source):
+                # don't close the caller's file along with the wrapper
+                in_file.detach()
+    return _profile_rows(iter(source), max_rows, sample_rows, engine, approx_size, sketch)
+
+
+def _get_csv_reader(in_file, delimiter, newline, quote_symbol):
+    return csv.reader(
+         in_file
+        ,delimiter=delimiter
+        ,lineterminator=newline
+        ,quotechar=quote_symbol
+        )
+
+
+def _profile_rows(
+    in_csv
+    ,max_rows
+    ,sample_rows
+    ,engine
+    ,approx_size
+    ,sketch
+    ):
+    if (None != sample_rows and None == max_rows):
+        # without random access, the best we can do is the head of the input
+        max_rows = sample_rows
+    if (engine_name_numpy == engine and is_numpy_available()):
+        table_profile = read_table_profile_numpy(in_csv, max_rows, approx_size, should_sketch_values=sketch)
+    else:
+        table_profile = read_table_profile(in_csv, max_rows, approx_size, sketch)
+    if (None == table_profile):
+        return None
+    return table_schema_from_profile(table_profile)
@@ -0,0 +1,222 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Stratified sampling of the rows of a CSV table file.
+## The data rows of the file are divided into equal byte-size strata,
+## and a run of consecutive rows is profiled from the first row after a random offset within each stratum,
+## so that a fixed budget of rows represents the whole file, not just its head.
+
+import csv
+import io
+import os
+import random
+
+from .table_profile import TableProfile
+from .parallel_profile import (
+    find_row_end_offset
+    ,read_table_header
+    ,read_table_profile_byte_range_list
+    ,split_row_byte_ranges
+    )
+
+stratum_count_max = 64
+_window_byte_count_min = 64*1024
+
+
+def _read_window_rows(
+    in_file
+    ,start_offset
+    ,end_offset
+    ,file_byte_count
+    ,row_count_max
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol
+    ):
+    """ Read up to row_count_max rows (or all rows if it is None) of the complete rows between start_offset and end_offset.
+
+        start_offset must be the start of a row.
+        Returns a tuple (row_list, row_end_offset),
+        where row_end_offset is the end of the last complete row of the window (and so the start of a row).
+    """
+    if (end_offset < file_byte_count):
+        # don't cut the last row of the window, which may have quoted newlines
+        end_offset = find_row_end_offset(in_file, start_offset, end_offset, quote_symbol.encode("ascii"))
+    else:
+        end_offset = file_byte_count
+    in_file.seek(start_offset)
+    in_bytes = in_file.read(end_offset - start_offset)
+    in_text = in_bytes.decode(charset_name, charset_error_mode)
+    in_csv = csv.reader(
+         io.StringIO(in_text, newline='')
+        ,delimiter=delimiter
+        ,quotechar=quote_symbol
+        )
+    row_list = list()
+    for in_row in in_csv:
+        if (None != row_count_max and len(row_list) >= row_count_max):
+            break
+        row_list.append(in_row)
+    return (row_list, end_offset)
+
+
+def _find_line_row_start_offset(in_file, offset, byte_count, quote_byte):
+    """ Find the start of the first row after an offset, taking every newline for the end of a row:
+        the start of the next line, if none of the complete lines in the next byte_count bytes
+        has an odd number of quotes.
+
+        Returns None when a line has an odd number of quotes,
+        since the offset may then be inside a quoted cell with newlines.
+    """
+    in_file.seek(offset)
+    in_bytes = in_file.read(byte_count)
+    line_end_position = in_bytes.find(b"\n")
+    if (0 > line_end_position):
+        return None
+    # a quoted cell with newlines leaves an odd number of quotes on the line where it starts or ends
+    line_list = in_bytes[line_end_position + 1:].split(b"\n")
+    for line in line_list[:-1]:
+        if (line.count(quote_byte) & 1):
+            return None
+    return offset + line_end_position + 1
+
+
+def read_table_profile_sample(
+    file_name
+    ,row_count_budget
+    ,charset_name
+    ,charset_error_mode
+    ,newline
+    ,delimiter
+    ,quote_symbol='"'
+    ,random_seed=0
+    ,should_sketch_values=False
+    ):
+    """ Profile about row_count_budget rows sampled from across a table file.
+
+        Rows sampled from the middle of the file start at the first row that starts after a random offset.
+        That is the next line, unless the head of the file has quoted cells with newlines,
+        or a line near the offset has an odd number of quotes;
+        then the row start is found by tracking quotes from the last known row start
+        (see split_row_byte_ranges()), which reads the file up to the offset.
+        If the whole file looks like it has no more than row_count_budget rows,
+        all of its rows are profiled.
+        Returns a finalized TableProfile, or None if the file has no header row.
+    """
+    rng = random.Random(random_seed)
+    with io.open(file_name, mode='rb') as in_file:
+        (column_name_list, data_start_offset) = read_table_header(
+            in_file
+            ,charset_name
+            ,charset_error_mode
+            ,newline
+            ,delimiter
+            ,quote_symbol
+            )
+        if (None == column_name_list):
+            return None
+        file_byte_count = os.fstat(in_file.fileno()).st_size
+        data_byte_count = file_byte_count - data_start_offset
+        stratum_count = max(1, min(stratum_count_max, row_count_budget))
+        stratum_row_count_max = -(-row_count_budget // stratum_count)
+        stratum_byte_count = data_byte_count // stratum_count
+
+        # the first stratum is the head of the file, which also tells us the size of a row
+        (row_list, row_start_offset) = _read_window_rows(
+            in_file
+            ,data_start_offset
+            ,data_start_offset + _window_byte_count_min
+            ,file_byte_count
+            ,None
+            ,charset_name
+            ,charset_error_mode
+            ,newline
+            ,delimiter
+            ,quote_symbol
+            )
+        window_byte_count = row_start_offset - data_start_offset
+        if (0 == len(row_list)
+            or window_byte_count >= data_byte_count
+        ):
+            estimated_row_count = len(row_list)
+        else:
+            estimated_row_count = data_byte_count * len(row_list) // window_byte_count
+        if (1 == stratum_count
+            or estimated_row_count <= row_count_budget
+            or stratum_byte_count < window_byte_count
+        ):
+            # the file is small enough to read all of it
+            table_profile = read_table_profile_byte_range_list(
+                file_name
+                ,[(data_start_offset, file_byte_count)]
+                ,column_name_list
+                ,1
+                ,charset_name
+                ,charset_error_mode
+                ,newline
+                ,delimiter
+                ,quote_symbol
+                ,should_sketch_values
+                )
+            table_profile.finalize()
+            return table_profile
+
+        table_profile = TableProfile(column_name_list, should_sketch_values)
+        # a sample can't show that a column is unique
+        table_profile.stop_key_tracking()
+        table_profile.update_rows(iter(row_list), stratum_row_count_max)
+        # read twice the expected size of the rows we want from each stratum
+        row_byte_count = max(1, window_byte_count // len(row_list))
+        sample_byte_count = max(_window_byte_count_min, 2 * stratum_row_count_max * row_byte_count)
+        sample_byte_count = min(sample_byte_count, stratum_byte_count)
+        quote_byte = quote_symbol.encode("ascii")
+        has_quoted_newline = any(
+            ("\n" in cell_value or "\r" in cell_value)
+            for in_row in row_list
+            for cell_value in in_row
+            )
+        stratum_position = 1
+        while (stratum_position < stratum_count):
+            stratum_start_offset = data_start_offset + stratum_position * stratum_byte_count
+            sample_start_offset = stratum_start_offset + rng.randrange(stratum_byte_count - sample_byte_count + 1)
+            if (sample_start_offset > row_start_offset):
+                next_row_start_offset = None
+                if (not has_quoted_newline):
+                    next_row_start_offset = _find_line_row_start_offset(
+                        in_file
+                        ,sample_start_offset
+                        ,sample_byte_count
+                        ,quote_byte
+                        )
+                if (None == next_row_start_offset):
+                    # the quotes since the end of the last window tell where the next row after the random offset starts
+                    has_quoted_newline = True
+                    byte_range_list = split_row_byte_ranges(
+                        in_file
+                        ,row_start_offset
+                        ,sample_start_offset - row_start_offset
+                        ,quote_byte
+                        ,range_count_max=1
+                        )
+                    if (0 == len(byte_range_list)):
+                        break
+                    next_row_start_offset = byte_range_list[0][1]
+                row_start_offset = next_row_start_offset
+            (row_list, row_start_offset) = _read_window_rows(
+                in_file
+                ,row_start_offset
+                ,row_start_offset + sample_byte_count
+                ,file_byte_count
+                ,stratum_row_count_max
+                ,charset_name
+                ,charset_error_mode
+                ,newline
+                ,delimiter
+                ,quote_symbol
+                )
+            table_profile.update_rows(iter(row_list))
+            stratum_position += 1
+    table_profile.finalize()
+    return table_profile
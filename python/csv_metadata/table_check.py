@@ -0,0 +1,492 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Table checks: validating the rows of a table against the metafields of its schema.
+## The "type", "size" and "format" metafields of each column are compiled once into check functions,
+## and blocks of rows are checked one column at a time,
+## so that a block of valid cells costs a few C-level calls instead of one python call per cell.
+
+import itertools
+import re
+
+from .cell_classifier import (
+    classify_number
+    ,number_kind_none
+    ,number_kind_int
+    )
+from .typed_rows import (
+    as_bool
+    )
+from .key_hash_set import (
+    KeyHashSet
+    )
+from .time_format import (
+    get_time_format
+    )
+
+# metafields that mark the columns of a unique key with a "1"
+key_metafield_name_list = ("pkey", "key")
+
+_decimal_size_regex = re.compile(r"\s*(\d+)\s*(?:[,.]\s*(\d+)\s*)?")
+_int_byte_count_list = (1, 2, 4, 8)
+_float32_max = 3.4028234663852886e+38
+_float_inf = float("inf")
+
+# number of rows checked together, one column at a time
+check_block_row_count = 4096
+
+
+class TableCheckViolation(object):
+    """ A cell (or a table header or key) that does not agree with the schema.
+
+        row_number counts the header row as row 1 (and is None when the row is not known);
+        cell_value is None for violations that are not about one cell.
+    """
+    __slots__ = (
+         "row_number"
+        ,"column_name"
+        ,"cell_value"
+        ,"message"
+        )
+
+    def __init__(self, row_number, column_name, cell_value, message):
+        self.row_number = row_number
+        self.column_name = column_name
+        self.cell_value = cell_value
+        self.message = message
+
+
+class TableCheckResult(object):
+    """ Violations found by check_table_rows().
+
+        violation_list holds the first violations of each column (up to the limit given to check_table_rows()),
+        in row order;
+        violation_count_dict counts all of the violations of each column.
+    """
+    __slots__ = (
+         "row_count"
+        ,"violation_list"
+        ,"violation_count_dict"
+        )
+
+    def __init__(self):
+        self.row_count = 0
+        self.violation_list = list()
+        self.violation_count_dict = dict()
+
+    @property
+    def violation_count(self):
+        return sum(self.violation_count_dict.values())
+
+    def add_violation(self, violation, reported_violation_count_max):
+        violation_count = self.violation_count_dict.get(violation.column_name, 0)
+        if (None == reported_violation_count_max
+            or violation_count < reported_violation_count_max
+        ):
+            self.violation_list.append(violation)
+        self.violation_count_dict[violation.column_name] = violation_count + 1
+
+
+def get_column_checks(column_type_name, column_size, column_format=None):
+    """ Compile the metafields of a column into functions that check its non-empty cell values.
+
+        Returns a tuple (cell_check, block_check), or None if the metafields don't constrain the cell values
+        (e.g. a varchar column without a size, or an unknown type).
+        cell_check(cell_value) returns a message describing the problem with a value,
+        or None if the value agrees with the metafields.
+        block_check(cell_value_tuple) returns True if every non-empty value of a tuple of cells agrees,
+        using C-level operations (len(), set(), one regular expression match) over the whole tuple;
+        False means that some value may not agree, and the cells have to be checked one by one.
+        block_check is None when there is no faster way than checking each cell.
+    """
+    if (None != column_type_name):
+        column_type_name = column_type_name.lower()
+    if (None != column_size):
+        column_size = column_size.strip()
+        if (0 == len(column_size)):
+            column_size = None
+    if (column_type_name in (None, "varchar", "text")):
+        char_count_max = _parse_int(column_size)
+        if (None == char_count_max):
+            return None
+        return _get_varchar_checks(char_count_max)
+    if ("char" == column_type_name):
+        char_count = _parse_int(column_size)
+        if (None == char_count):
+            return None
+        return _get_char_checks(char_count)
+    if (column_type_name in ("integer", "int")):
+        byte_count = _parse_int(column_size)
+        if (byte_count not in _int_byte_count_list):
+            byte_count = None
+        return _get_int_checks(byte_count)
+    if (column_type_name in ("float", "real")):
+        return _get_float_checks(_parse_int(column_size))
+    if (column_type_name in ("decimal", "numeric")):
+        precision_digit_count_max = None
+        scale_digit_count_max = None
+        if (None != column_size):
+            size_match = _decimal_size_regex.fullmatch(column_size)
+            if (None != size_match):
+                precision_digit_count_max = int(size_match.group(1))
+                if (None != size_match.group(2)):
+                    scale_digit_count_max = int(size_match.group(2))
+        return _get_decimal_checks(precision_digit_count_max, scale_digit_count_max)
+    if (column_type_name in ("boolean", "bool")):
+        return _get_bool_checks(column_format)
+    if (column_type_name in ("time", "date", "datetime", "timestamp")):
+        time_format = get_time_format(column_format)
+        if (None == time_format):
+            return None
+        return _get_time_checks(time_format)
+    return None
+
+
+def _parse_int(s):
+    if (None == s or not s.isdigit()):
+        return None
+    return int(s)
+
+
+def _get_block_regex_check(cell_regex_pattern):
+    """ Make a block check that matches every cell of a block with a regular expression (empty cells match too).
+    """
+    cell_regex = re.compile("(?:" + cell_regex_pattern + ")?")
+    def check_block(cell_value_tuple):
+        # match objects are always true, so all() stops at the first cell that doesn't match
+        return all(map(cell_regex.fullmatch, cell_value_tuple))
+    return check_block
+
+
+def _get_varchar_checks(char_count_max):
+    def check_varchar(cell_value):
+        if (len(cell_value) > char_count_max):
+            return "longer than {} characters".format(char_count_max)
+        return None
+    def check_varchar_block(cell_value_tuple):
+        return (max(map(len, cell_value_tuple)) <= char_count_max)
+    return (check_varchar, check_varchar_block)
+
+
+def _get_char_checks(char_count):
+    def check_char(cell_value):
+        if (len(cell_value) != char_count):
+            return "not {} characters long".format(char_count)
+        return None
+    # empty cells are not checked
+    char_count_set = frozenset((0, char_count))
+    def check_char_block(cell_value_tuple):
+        return char_count_set.issuperset(map(len, cell_value_tuple))
+    return (check_char, check_char_block)
+
+
+def _get_int_checks(byte_count):
+    int_min = None
+    int_max = None
+    int_char_count_max = None
+    int_pattern = r"[-+]?\d+"
+    if (None != byte_count):
+        int_max = (1 << (8*byte_count - 1)) - 1
+        int_min = -int_max - 1
+        # digit counts that always fit (e.g. 9 digits for 4 bytes)
+        int_char_count_max = len(str(int_max)) - 1
+        int_pattern = r"[-+]?\d{{1,{}}}".format(int_char_count_max)
+    def check_int(cell_value):
+        if (number_kind_int != classify_number(cell_value)[0]):
+            return "not an integer"
+        if (None != int_max):
+            # int() can still refuse very long digit strings
+            try:
+                n = int(cell_value)
+            except ValueError:
+                return "not an integer"
+            if (n > int_max or n < int_min):
+                return "integer does not fit in {} bytes".format(byte_count)
+        return None
+    check_int_pattern_block = _get_block_regex_check(int_pattern)
+    def check_int_block(cell_value_tuple):
+        # unsigned integers (and empty cells) join into one string of decimal digits
+        if ("".join(cell_value_tuple).isdecimal()
+            and (None == int_char_count_max or max(map(len, cell_value_tuple)) <= int_char_count_max)
+        ):
+            return True
+        return check_int_pattern_block(cell_value_tuple)
+    return (check_int, check_int_block)
+
+
+def _get_float_checks(byte_count):
+    def check_float(cell_value):
+        if (number_kind_none == classify_number(cell_value)[0]):
+            return "not a number"
+        # infinities (and nan) are 4-byte floats too
+        if (4 == byte_count and _float32_max < abs(float(cell_value)) < _float_inf):
+            return "number does not fit in a 4-byte float"
+        return None
+    check_float_block = None
+    if (4 != byte_count):
+        check_float_block = _get_block_regex_check(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+    return (check_float, check_float_block)
+
+
+def _get_decimal_checks(precision_digit_count_max, scale_digit_count_max):
+    def check_decimal(cell_value):
+        (number_kind, sign_char, int_digit_count, frac_digit_count, has_leading_zero) = classify_number(cell_value)
+        if (number_kind_none == number_kind):
+            return "not a number"
+        # numbers that aren't written as plain decimals (e.g. "1e5") have no digit counts to check
+        if (None != int_digit_count):
+            if (None != precision_digit_count_max
+                and int_digit_count + frac_digit_count > precision_digit_count_max
+            ):
+                return "more than {} digits".format(precision_digit_count_max)
+            if (None != scale_digit_count_max
+                and frac_digit_count > scale_digit_count_max
+            ):
+                return "more than {} fraction digits".format(scale_digit_count_max)
+        return None
+    frac_pattern = r"\d+"
+    if (None != scale_digit_count_max):
+        frac_pattern = r"\d{{1,{}}}".format(scale_digit_count_max)
+    if (None == precision_digit_count_max):
+        decimal_pattern = r"[-+]?\d+(?:\." + frac_pattern + ")?"
+    else:
+        # with a decimal point, the digits and the point are at most one character more than the precision
+        decimal_pattern = (
+            r"[-+]?(?:\d{{1,{0}}}|(?=[\d.]{{1,{1}}}\Z)\d+\.".format(
+                precision_digit_count_max
+                ,precision_digit_count_max + 1
+                )
+            + frac_pattern + ")"
+            )
+    # numbers with an exponent are not digit-counted by check_decimal() either
+    decimal_pattern += r"|[-+]?(?:\d+\.?\d*|\.\d+)[eE][-+]?\d+"
+    return (check_decimal, _get_block_regex_check(decimal_pattern))
+
+
+def _get_bool_checks(column_format):
+    # a format like "Y/N" names the only allowed values
+    bool_value_set = None
+    if (None != column_format and "/" in column_format):
+        bool_value_set = frozenset(
+            bool_value.strip().lower()
+            for bool_value in column_format.split("/")
+            )
+    def check_bool(cell_value):
+        if (None != bool_value_set):
+            if (cell_value.strip().lower() not in bool_value_set):
+                return "not one of {}".format(column_format)
+            return None
+        try:
+            as_bool(cell_value)
+        except ValueError:
+            return "not a boolean value"
+        return None
+    def check_bool_block(cell_value_tuple):
+        # a boolean column has few distinct values
+        for cell_value in set(cell_value_tuple):
+            if (cell_value and None != check_bool(cell_value)):
+                return False
+        return True
+    return (check_bool, check_bool_block)
+
+
+def _get_time_checks(time_format):
+    # the same regular expression that csv-mkmeta matched the values with
+    cell_regex = time_format.cell_regex
+    def check_time(cell_value):
+        if (None == cell_regex.fullmatch(cell_value)):
+            return "not a time in the format {}".format(time_format.format_name)
+        return None
+    return (check_time, _get_block_regex_check(cell_regex.pattern))
+
+
+def get_key_list(table_schema, column_name_list):
+    """ Get the name and the column positions (in the table header) of each key of a schema.
+
+        Each "pkey" or "key" metafield that marks at least one column with a "1" is a key,
+        named by its column names (e.g. "state_code,county_code").
+        Returns a list of (key_name, column_position_list) tuples;
+        a key with a column that is missing from the table is left out.
+    """
+    column_position_dict = dict()
+    column_position = 0
+    for column_name in column_name_list:
+        column_position_dict.setdefault(column_name, column_position)
+        column_position += 1
+    key_list = list()
+    for (metafield_name, metafield_value_list) in zip(table_schema.metafield_name_list, table_schema.metafield_value_list_list):
+        if (metafield_name not in key_metafield_name_list):
+            continue
+        key_column_name_list = [
+            column_name
+            for (column_name, metafield_value) in zip(table_schema.column_name_list, metafield_value_list)
+            if (None != metafield_value and "1" == metafield_value.strip())
+            ]
+        if (0 == len(key_column_name_list)):
+            continue
+        key_column_position_list = [
+            column_position_dict.get(column_name, None)
+            for column_name in key_column_name_list
+            ]
+        if (None not in key_column_position_list):
+            key_list.append((",".join(key_column_name_list), key_column_position_list))
+    return key_list
+
+
+def check_table_rows(
+    in_csv
+    ,table_schema
+    ,reported_violation_count_max=None
+    ,in_row_count_max=None
+    ,block_row_count=check_block_row_count
+    ):
+    """ Check the rows of a table (from a csv reader positioned at the header row) against a schema.
+
+        Table columns are matched to schema columns by name.
+        Empty cells are not checked, except in key columns;
+        cells missing from the end of a short row count as empty.
+        Rows are checked in blocks of block_row_count rows, one column at a time
+        (see get_column_checks()).
+        Only the first reported_violation_count_max violations of each column are kept
+        (all of them are counted).
+        Returns a TableCheckResult.
+    """
+    check_result = TableCheckResult()
+    end_row = None
+    column_name_list = next(in_csv, end_row)
+    if (end_row == column_name_list):
+        return check_result
+    column_count = len(column_name_list)
+    column_check_list = list()
+    column_position = 0
+    for column_name in column_name_list:
+        if (None == table_schema.get_column_position(column_name)):
+            check_result.add_violation(
+                TableCheckViolation(1, column_name, None, "column is not in the schema")
+                ,reported_violation_count_max
+                )
+        else:
+            column_checks = get_column_checks(
+                 table_schema.get_metafield_value(column_name, "type")
+                ,table_schema.get_metafield_value(column_name, "size")
+                ,table_schema.get_metafield_value(column_name, "format")
+                )
+            if (None != column_checks):
+                (cell_check, block_check) = column_checks
+                column_check_list.append((column_position, column_name, cell_check, block_check))
+        column_position += 1
+    column_name_set = frozenset(column_name_list)
+    for column_name in table_schema.column_name_list:
+        if (column_name not in column_name_set):
+            check_result.add_violation(
+                TableCheckViolation(1, column_name, None, "column is missing from the table")
+                ,reported_violation_count_max
+                )
+    key_check_list = [
+        (key_name, key_column_position_list, KeyHashSet())
+        for (key_name, key_column_position_list) in get_key_list(table_schema, column_name_list)
+        ]
+    # row number of the row before the block, counting the header row as row 1
+    row_number = 1
+    while (None == in_row_count_max or check_result.row_count < in_row_count_max):
+        if (None != in_row_count_max):
+            block_row_count = min(block_row_count, in_row_count_max - check_result.row_count)
+        row_block = list(itertools.islice(in_csv, block_row_count))
+        if (0 == len(row_block)):
+            break
+        if (1 != len(set(map(len, row_block)))
+            or column_count != len(row_block[0])
+        ):
+            # pad short rows with empty cells and ignore the cells beyond the header
+            row_block = [
+                (in_row + [""] * (column_count - len(in_row)))[:column_count]
+                for in_row in row_block
+                ]
+        column_block = list(zip(*row_block))
+        if (0 == len(column_block)):
+            column_block = [()] * column_count
+        for (column_position, column_name, cell_check, block_check) in column_check_list:
+            cell_value_tuple = column_block[column_position]
+            if (None != block_check and block_check(cell_value_tuple)):
+                continue
+            cell_row_number = row_number
+            for cell_value in cell_value_tuple:
+                cell_row_number += 1
+                if (cell_value):
+                    message = cell_check(cell_value)
+                    if (None != message):
+                        check_result.add_violation(
+                            TableCheckViolation(cell_row_number, column_name, cell_value, message)
+                            ,reported_violation_count_max
+                            )
+        for (key_name, key_column_position_list, key_hash_set) in key_check_list:
+            _check_key_block(
+                 check_result
+                ,reported_violation_count_max
+                ,row_number
+                ,key_name
+                ,[column_block[column_position] for column_position in key_column_position_list]
+                ,key_hash_set
+                )
+        row_number += len(row_block)
+        check_result.row_count += len(row_block)
+    # violations were found one column at a time in each block
+    check_result.violation_list.sort(key=_get_violation_row_number)
+    for (key_name, key_column_position_list, key_hash_set) in key_check_list:
+        # values repeated after the hashes were spilled to disk are only found at the end, without their row
+        if (key_hash_set.has_repeated_hash()):
+            check_result.add_violation(
+                TableCheckViolation(None, key_name, None, "duplicate key (in a row not known)")
+                ,reported_violation_count_max
+                )
+        key_hash_set.close()
+    return check_result
+
+
+def _get_violation_row_number(violation):
+    return violation.row_number
+
+
+def _check_key_block(
+    check_result
+    ,reported_violation_count_max
+    ,row_number
+    ,key_name
+    ,key_cell_value_tuple_list
+    ,key_hash_set
+    ):
+    """ Check the key values of a block of rows for empty cells and values seen before.
+
+        Key values are kept in a bounded set (see key_hash_set.KeyHashSet),
+        which spills them to disk as 64-bit hashes when the table has too many rows to hold them in memory.
+    """
+    if (1 == len(key_cell_value_tuple_list)):
+        key_value_tuple = key_cell_value_tuple_list[0]
+    else:
+        key_value_tuple = tuple(zip(*key_cell_value_tuple_list))
+    has_empty_cell = False
+    for key_cell_value_tuple in key_cell_value_tuple_list:
+        if ("" in key_cell_value_tuple):
+            has_empty_cell = True
+    if (not has_empty_cell):
+        block_key_value_set = set(key_value_tuple)
+        if (len(block_key_value_set) == len(key_value_tuple)
+            and key_hash_set.update(block_key_value_set)
+        ):
+            return
+    for key_value in key_value_tuple:
+        row_number += 1
+        if (tuple is type(key_value)):
+            key_cell_value_tuple = key_value
+        else:
+            key_cell_value_tuple = (key_value,)
+        if ("" in key_cell_value_tuple):
+            message = "empty key cell"
+        elif (not key_hash_set.add(key_value)):
+            message = "duplicate key"
+        else:
+            continue
+        check_result.add_violation(
+            TableCheckViolation(row_number, key_name, ",".join(key_cell_value_tuple), message)
+            ,reported_violation_count_max
+            )
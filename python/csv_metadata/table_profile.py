@@ -0,0 +1,336 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Table-level statistics: one ColumnProfile per column plus row-level facts.
+
+import csv
+import io
+
+from .column_profile import (
+    ColumnProfile
+    ,column_stat_field_list
+    )
+
+
+class ProfileFormatError(ValueError):
+    """ Raised when a partial-profile file cannot be read or merged.
+    """
+    pass
+
+
+# integer statistics about the table file itself, saved only when they are known
+_table_file_stat_field_name_list = (
+     "byte_offset"
+    ,"header_checksum"
+    ,"tail_checksum"
+    )
+
+
+# partial-profile files are always written as utf-8 with ',' delimiters,
+#  so they read back the same whatever the charset and delimiter of the table
+profile_file_charset_name = "utf_8"
+profile_file_delimiter = ","
+
+
+# how often (in rows) to check whether all columns are settled
+settled_check_row_interval = 1024
+
+
+class TableProfile(object):
+    """ Accumulates statistics about the rows of a table.
+
+        Holds one ColumnProfile per header column,
+        the first data row (used for the schema "example" metafield),
+        and the number of data rows seen.
+        If should_sketch_values is True, the columns also keep value sketches
+        (see ColumnProfile.start_sketches()).
+
+        Profiles of a table file that is read incrementally also record
+        the byte offset just after the last profiled row
+        and checksums used to verify that the file was only appended to.
+        Rows after byte_offset that are not yet complete
+        can be kept in pending_table_profile;
+        they are not saved in partial-profile files.
+    """
+    __slots__ = (
+         "column_profile_list"
+        ,"example_row"
+        ,"row_count"
+        ,"byte_offset"
+        ,"header_checksum"
+        ,"tail_checksum"
+        ,"pending_table_profile"
+        )
+
+    def __init__(self, column_name_list, should_sketch_values=False):
+        self.column_profile_list = list()
+        for column_name in column_name_list:
+            column_profile = ColumnProfile(column_name)
+            if (should_sketch_values):
+                column_profile.start_sketches()
+            self.column_profile_list.append(column_profile)
+        self.example_row = None
+        self.row_count = 0
+        self.byte_offset = None
+        self.header_checksum = None
+        self.tail_checksum = None
+        self.pending_table_profile = None
+
+    @property
+    def column_name_list(self):
+        return [column_profile.column_name for column_profile in self.column_profile_list]
+
+    def update_rows(self, in_csv, in_row_count_max=None, should_stop_when_settled=False):
+        """ Accumulate statistics from the data rows of a csv reader.
+
+            Stops after in_row_count_max rows (counted by this call) when it is not None.
+            If should_stop_when_settled is True, also stops once every column is settled
+            (see ColumnProfile), in which case character counts are only approximate.
+            Stopping before the end of the rows also stops key tracking (see stop_key_tracking()).
+        """
+        end_row = None
+        column_profile_list = self.column_profile_list
+        in_row_count = 0
+        settled_check_row_count = 0
+        if (should_stop_when_settled):
+            settled_check_row_count = settled_check_row_interval
+        in_row = next (in_csv, end_row)
+        while (end_row != in_row
+            and (None == in_row_count_max  or in_row_count < in_row_count_max)
+        ):
+            if (in_row_count == settled_check_row_count
+                and should_stop_when_settled
+            ):
+                if (self.is_settled()):
+                    # the rows that are left could repeat a key value
+                    self.stop_key_tracking()
+                    break
+                settled_check_row_count += settled_check_row_interval
+            # remember an example row for later
+            if (None == self.example_row):
+                self.example_row = list(in_row)
+            # zip() stops at the shorter of the header and the row
+            for (column_profile, cell_value) in zip(column_profile_list, in_row):
+                column_profile.update(cell_value)
+            in_row_count += 1
+            if (None == in_row_count_max  or in_row_count < in_row_count_max):
+                in_row = next (in_csv, end_row)
+            else:
+                self.stop_key_tracking()
+            # end while (row)
+        self.row_count += in_row_count
+
+    def stop_key_tracking(self):
+        """ Stop collecting the key values of every column, because not every row of the table will be seen.
+
+            No column of the profile will then be found unique.
+        """
+        for column_profile in self.column_profile_list:
+            column_profile.stop_key_tracking()
+
+    def has_sketches(self):
+        """ Decide whether every column has value sketches (see ColumnProfile.start_sketches()).
+        """
+        for column_profile in self.column_profile_list:
+            if (None == column_profile.distinct_sketch):
+                return False
+        return True
+
+    def is_settled(self):
+        """ Decide whether every column is settled, so that later rows can't change any datatype name.
+        """
+        for column_profile in self.column_profile_list:
+            if (not column_profile.is_settled):
+                # the values of a column with few values are only counted in its small value set so far
+                column_profile.flush_small_values()
+                if (not column_profile.is_settled):
+                    return False
+        return True
+
+    def merge(self, other):
+        """ Combine the statistics of a profile of later rows of the same table into this one.
+        """
+        if (None == self.example_row):
+            self.example_row = other.example_row
+        self.row_count += other.row_count
+        for (column_profile, other_column_profile) in zip(self.column_profile_list, other.column_profile_list):
+            column_profile.merge(other_column_profile)
+        return self
+
+    def write_profile_rows(self, out_csv):
+        """ Write the statistics of this profile as partial-profile rows.
+
+            The layout follows the archive format of the CSV metadata spec:
+            a block of table-level (name,value) rows,
+            a blank row, and then one row of statistics per column.
+        """
+        out_csv.writerow(["name", "value"])
+        for (table_stat_field_name, table_stat_value) in self._get_table_stat_item_list():
+            out_csv.writerow([table_stat_field_name, table_stat_value])
+        out_csv.writerow([])
+        header_row = ["name"]
+        for (stat_field_name, parse_stat_value, default_stat_value) in column_stat_field_list:
+            header_row.append(stat_field_name)
+        header_row.append("example")
+        out_csv.writerow(header_row)
+        example_row = self.example_row
+        if (None == example_row):
+            example_row = list()
+        column_position = 0
+        for column_profile in self.column_profile_list:
+            out_row = [column_profile.column_name]
+            out_row += column_profile.get_stat_value_list()
+            example_value = None
+            if (column_position < len(example_row)):
+                example_value = example_row[column_position]
+            out_row.append(example_value)
+            out_csv.writerow(out_row)
+            column_position += 1
+
+    def merge_pending(self):
+        """ Merge the pending (incomplete) rows into this profile.
+
+            Call this after saving the profile, since the result no longer
+            corresponds to byte_offset.
+        """
+        if (None != self.pending_table_profile):
+            self.merge(self.pending_table_profile)
+            self.pending_table_profile = None
+            self.finalize()
+        return self
+
+    def _get_table_stat_item_list(self):
+        table_stat_item_list = [
+             ("row_count", str(self.row_count))
+            ]
+        for table_stat_field_name in _table_file_stat_field_name_list:
+            table_stat_value = getattr(self, table_stat_field_name)
+            if (None != table_stat_value):
+                table_stat_item_list.append((table_stat_field_name, str(table_stat_value)))
+        return table_stat_item_list
+
+    def _set_table_stat_value(self, table_stat_field_name, table_stat_value_str):
+        if ("row_count" == table_stat_field_name):
+            self.row_count = int(table_stat_value_str)
+        elif (table_stat_field_name in _table_file_stat_field_name_list):
+            setattr(self, table_stat_field_name, int(table_stat_value_str))
+
+    def finalize(self):
+        """ Decide the datatype of every column.
+        """
+        for column_profile in self.column_profile_list:
+            column_profile.finalize()
+        return self
+
+
+def read_table_profile(in_csv, in_row_count_max=None, should_stop_when_settled=False, should_sketch_values=False):
+    """ Read a header row and then data rows from a csv reader and profile them.
+
+        Returns a finalized TableProfile, or None if the reader has no header row.
+    """
+    end_row = None
+    table_profile = None
+    in_header_row = next(in_csv, end_row)
+    if (end_row != in_header_row):
+        table_profile = TableProfile(in_header_row, should_sketch_values)
+        table_profile.update_rows(in_csv, in_row_count_max, should_stop_when_settled)
+        table_profile.finalize()
+    return table_profile
+
+
+def read_profile_rows(in_csv):
+    """ Read a TableProfile from partial-profile rows written by TableProfile.write_profile_rows().
+
+        Raises ProfileFormatError if the rows are not a partial profile.
+    """
+    end_row = None
+    in_row = next(in_csv, end_row)
+    if (None == in_row or ["name", "value"] != in_row[:2]):
+        raise ProfileFormatError("missing table statistics header row")
+    table_stat_list = list()
+    in_row = next(in_csv, end_row)
+    while (end_row != in_row and 0 < len(in_row)):
+        if (2 <= len(in_row)):
+            table_stat_list.append((in_row[0], in_row[1]))
+        in_row = next(in_csv, end_row)
+    in_header_row = next(in_csv, end_row)
+    if (None == in_header_row or 0 == len(in_header_row) or "name" != in_header_row[0]):
+        raise ProfileFormatError("missing column statistics header row")
+    stat_field_name_list = in_header_row[1:]
+    column_name_list = list()
+    column_stat_row_list = list()
+    in_row = next(in_csv, end_row)
+    while (end_row != in_row):
+        if (0 < len(in_row)):
+            column_name_list.append(in_row[0])
+            column_stat_row_list.append(in_row[1:])
+        in_row = next(in_csv, end_row)
+
+    table_profile = TableProfile(column_name_list)
+    # key values are not saved, so a saved profile can't tell whether a column is unique
+    table_profile.stop_key_tracking()
+    for (table_stat_field_name, table_stat_value_str) in table_stat_list:
+        table_profile._set_table_stat_value(table_stat_field_name, table_stat_value_str)
+    example_row = list()
+    for (column_profile, column_stat_row) in zip(table_profile.column_profile_list, column_stat_row_list):
+        example_value = ""
+        for (stat_field_name, stat_value_str) in zip(stat_field_name_list, column_stat_row):
+            if ("example" == stat_field_name):
+                example_value = stat_value_str
+            else:
+                column_profile.set_stat_value(stat_field_name, stat_value_str)
+        example_row.append(example_value)
+    # a profile saved without time formats or small value sets can't tell whether a column has times or few values
+    for column_profile in table_profile.column_profile_list:
+        if ("time_format_set" not in stat_field_name_list):
+            column_profile.time_format_set = None
+        if ("small_value_set" not in stat_field_name_list):
+            column_profile.small_value_set = None
+    if (0 < table_profile.row_count):
+        table_profile.example_row = example_row
+    return table_profile
+
+
+def merge_profile_list(table_profile_list):
+    """ Merge partial profiles of tables that have the same columns.
+
+        Profiles are merged in list order, so the example row comes from the first profile that has one.
+        Raises ProfileFormatError if the column names of the profiles differ.
+    """
+    table_profile = None
+    for other_table_profile in table_profile_list:
+        if (None == table_profile):
+            table_profile = other_table_profile
+        elif (table_profile.column_name_list != other_table_profile.column_name_list):
+            raise ProfileFormatError("column names do not match: {} != {}".format(
+                table_profile.column_name_list
+                ,other_table_profile.column_name_list
+                ))
+        else:
+            table_profile.merge(other_table_profile)
+    return table_profile
+
+
+def read_profile_file_list(file_name_list):
+    """ Read and merge partial-profile files
+        (written with profile_file_charset_name and profile_file_delimiter).
+
+        Returns a finalized TableProfile, or None if the list is empty.
+    """
+    table_profile_list = list()
+    for file_name in file_name_list:
+        with io.open(
+            file_name
+            ,mode='rt'
+            ,encoding=profile_file_charset_name
+            ,newline=''
+            ,errors='strict'
+        ) as in_file:
+            try:
+                table_profile_list.append(read_profile_rows(csv.reader(in_file, delimiter=profile_file_delimiter)))
+            except (ProfileFormatError, UnicodeDecodeError) as e:
+                raise ProfileFormatError("{}: {}".format(file_name, e))
+    table_profile = merge_profile_list(table_profile_list)
+    if (None != table_profile):
+        table_profile.finalize()
+    return table_profile
@@ -0,0 +1,356 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## In-memory table schema: the metafield values of each column of a table.
+
+import csv
+import io
+import math
+
+# metafields written to new schema files, after the column "name"
+schema_metafield_name_list = (
+     "type"
+    ,"size"
+    ,"pkey"
+    ,"unit"
+    ,"format"
+    ,"title"
+    ,"example"
+    )
+
+# optional metafields written after the others when the profile has value sketches (see column_sketch):
+# the estimated number of distinct values,
+# the most frequent values with their (lower bound) counts, each written as a csv row in one cell,
+# and the values of a column that has only a few (see ColumnProfile.get_code_list()), also as a csv row
+sketch_metafield_name_list = (
+     "distinct_approx"
+    ,"top_values"
+    ,"top_value_counts"
+    ,"code_list"
+    )
+# most values written to "top_values"; only values seen more than once are written
+top_value_metafield_value_count_max = 5
+# optional metafields of the number columns, written with the sketch metafields:
+# the range, mean and sample standard deviation, and the estimated quartiles (as a csv row in one cell)
+number_metafield_name_list = (
+     "min"
+    ,"max"
+    ,"mean"
+    ,"stddev"
+    ,"quartiles"
+    )
+quartile_fraction_list = (0.25, 0.5, 0.75)
+_number_type_name_list = ("integer", "float", "decimal")
+
+# column types that are not chosen as a "pkey" even when their values are unique
+_not_key_type_name_list = ("float", "decimal")
+
+
+class TableSchema(object):
+    """ Column metadata of a table.
+
+        Metafield values are stored by metafield:
+        metafield_value_list_list holds one list of values (in column order)
+        for each name in metafield_name_list.
+        A metafield name may appear more than once (e.g. several "example" metafields),
+        in which case each occurrence keeps its own list of values.
+
+        table_profile holds the column statistics when the schema was made by profiling a table,
+        and is None otherwise.
+    """
+    __slots__ = (
+         "column_name_list"
+        ,"metafield_name_list"
+        ,"metafield_value_list_list"
+        ,"table_profile"
+        ,"_column_position_dict"
+        ,"_metafield_position_list_dict"
+        )
+
+    def __init__(self, column_name_list):
+        self.column_name_list = list(column_name_list)
+        self.metafield_name_list = list()
+        self.metafield_value_list_list = list()
+        self.table_profile = None
+        self._column_position_dict = dict()
+        self._metafield_position_list_dict = dict()
+        column_position = 0
+        for column_name in self.column_name_list:
+            # the first of several columns with the same name is the one found by name
+            self._column_position_dict.setdefault(column_name, column_position)
+            column_position += 1
+
+    @property
+    def column_count(self):
+        return len(self.column_name_list)
+
+    def add_metafield(self, metafield_name, metafield_value_list):
+        """ Append a metafield with one value per column (in column order).
+
+            Missing values at the end of metafield_value_list are set to None,
+            and extra values are ignored.
+        """
+        column_count = len(self.column_name_list)
+        metafield_value_list = list(metafield_value_list[:column_count])
+        if (len(metafield_value_list) < column_count):
+            metafield_value_list += [None] * (column_count - len(metafield_value_list))
+        metafield_position = len(self.metafield_name_list)
+        self.metafield_name_list.append(metafield_name)
+        self.metafield_value_list_list.append(metafield_value_list)
+        self._metafield_position_list_dict.setdefault(metafield_name, list()).append(metafield_position)
+        return metafield_value_list
+
+    def get_column_position(self, column_name):
+        """ Get the position of a column, or None if the schema has no column with that name.
+        """
+        return self._column_position_dict.get(column_name, None)
+
+    def has_metafield(self, metafield_name):
+        return (metafield_name in self._metafield_position_list_dict)
+
+    def get_metafield_value_list(self, metafield_name):
+        """ Get the values of the first metafield with this name, in column order.
+
+            Returns None if the schema has no such metafield.
+        """
+        metafield_position_list = self._metafield_position_list_dict.get(metafield_name, None)
+        if (None == metafield_position_list):
+            return None
+        return self.metafield_value_list_list[metafield_position_list[0]]
+
+    def get_metafield_value(self, column_name, metafield_name, default_value=None):
+        """ Get the value of the first metafield with this name for a column.
+        """
+        column_position = self._column_position_dict.get(column_name, None)
+        metafield_position_list = self._metafield_position_list_dict.get(metafield_name, None)
+        if (None == column_position or None == metafield_position_list):
+            return default_value
+        metafield_value = self.metafield_value_list_list[metafield_position_list[0]][column_position]
+        if (None == metafield_value):
+            return default_value
+        return metafield_value
+
+    def get_metafield_value_all(self, column_name, metafield_name):
+        """ Get the values of every metafield with this name for a column (e.g. all examples).
+        """
+        column_position = self._column_position_dict.get(column_name, None)
+        metafield_position_list = self._metafield_position_list_dict.get(metafield_name, ())
+        if (None == column_position):
+            return list()
+        return [
+            self.metafield_value_list_list[metafield_position][column_position]
+            for metafield_position in metafield_position_list
+            ]
+
+    def get_column_dict(self, column_name):
+        """ Get a dict of the metafield values of a column.
+
+            When a metafield name appears more than once, the last value is kept.
+            Returns None if the schema has no column with that name,
+            and the first column if several columns have the name.
+        """
+        column_position = self._column_position_dict.get(column_name, None)
+        if (None == column_position):
+            return None
+        return self.get_column_dict_at(column_position)
+
+    def get_column_dict_at(self, column_position):
+        """ Get a dict of the metafield values of the column at a position.
+
+            Metafields that have no value for the column (None) are left out of the dict.
+        """
+        column_dict = dict()
+        for (metafield_name, metafield_value_list) in zip(self.metafield_name_list, self.metafield_value_list_list):
+            metafield_value = metafield_value_list[column_position]
+            if (None != metafield_value):
+                column_dict[metafield_name] = metafield_value
+        return column_dict
+
+    def get_schema_row_list(self, file_format_variant=0):
+        """ Get the rows of a schema file.
+
+            In variant 0, there is a header row of metafield names and one row per column;
+            in variant 1 (transposed), there is a header row of column names and one row per metafield.
+        """
+        row_list = list()
+        if (1 == file_format_variant):
+            # header row, first cell is empty
+            row_head_cell_value = None
+            row_list.append([row_head_cell_value] + self.column_name_list)
+            for (metafield_name, metafield_value_list) in zip(self.metafield_name_list, self.metafield_value_list_list):
+                row_list.append([metafield_name] + metafield_value_list)
+        else:
+            row_list.append(["name"] + self.metafield_name_list)
+            column_position = 0
+            for column_name in self.column_name_list:
+                out_row = [column_name]
+                for metafield_value_list in self.metafield_value_list_list:
+                    out_row.append(metafield_value_list[column_position])
+                row_list.append(out_row)
+                column_position += 1
+        return row_list
+
+    def write_schema_rows(self, out_csv, file_format_variant=0):
+        for out_row in self.get_schema_row_list(file_format_variant):
+            out_csv.writerow(out_row)
+
+
+def table_schema_from_profile(table_profile):
+    """ Make a TableSchema with the metafields that csv-mkmeta writes, from a finalized TableProfile.
+    """
+    column_profile_list = table_profile.column_profile_list
+    table_schema = TableSchema(table_profile.column_name_list)
+    table_schema.table_profile = table_profile
+    example_row = table_profile.example_row
+    if (None == example_row):
+        example_row = list()
+    for metafield_name in schema_metafield_name_list:
+        if ("type" == metafield_name):
+            metafield_value_list = [column_profile.data_type_name for column_profile in column_profile_list]
+        elif ("size" == metafield_name):
+            metafield_value_list = [column_profile.data_type_size for column_profile in column_profile_list]
+        elif ("format" == metafield_name):
+            metafield_value_list = [column_profile.data_type_format for column_profile in column_profile_list]
+        elif ("pkey" == metafield_name):
+            metafield_value_list = get_pkey_value_list(column_profile_list)
+        elif ("example" == metafield_name):
+            metafield_value_list = example_row
+        else:
+            metafield_value_list = list()
+        table_schema.add_metafield(metafield_name, metafield_value_list)
+    if (table_profile.has_sketches()
+        and 0 < len(column_profile_list)
+    ):
+        top_value_count_list_list = [
+            column_profile.get_top_value_count_list(top_value_metafield_value_count_max, 2)
+            for column_profile in column_profile_list
+            ]
+        for metafield_name in sketch_metafield_name_list:
+            if ("distinct_approx" == metafield_name):
+                metafield_value_list = [str(column_profile.get_distinct_count()) for column_profile in column_profile_list]
+            elif ("top_values" == metafield_name):
+                metafield_value_list = [
+                    _format_value_list([value for (value, value_count) in top_value_count_list])
+                    for top_value_count_list in top_value_count_list_list
+                    ]
+            elif ("code_list" == metafield_name):
+                metafield_value_list = [
+                    _format_value_list(column_profile.get_code_list() or list())
+                    for column_profile in column_profile_list
+                    ]
+            else:
+                metafield_value_list = [
+                    _format_value_list([value_count for (value, value_count) in top_value_count_list])
+                    for top_value_count_list in top_value_count_list_list
+                    ]
+            table_schema.add_metafield(metafield_name, metafield_value_list)
+        number_metafield_value_list_list = [
+            _get_number_metafield_value_list(column_profile)
+            for column_profile in column_profile_list
+            ]
+        for (metafield_position, metafield_name) in enumerate(number_metafield_name_list):
+            table_schema.add_metafield(metafield_name, [
+                number_metafield_value_list[metafield_position]
+                for number_metafield_value_list in number_metafield_value_list_list
+                ])
+    return table_schema
+
+
+def _get_number_metafield_value_list(column_profile):
+    """ Get the values of number_metafield_name_list for a finalized column profile (all None if it isn't a number column).
+    """
+    if (column_profile.data_type_name not in _number_type_name_list):
+        return [None] * len(number_metafield_name_list)
+    value_min = column_profile.int_min
+    value_max = column_profile.int_max
+    if ("integer" != column_profile.data_type_name):
+        value_min = column_profile.float_min
+        value_max = column_profile.float_max
+    float_variance = column_profile.get_float_variance()
+    float_quantile_list = column_profile.get_float_quantile_list(quartile_fraction_list)
+    return [
+         _format_number(value_min)
+        ,_format_number(value_max)
+        ,_format_number(column_profile.get_float_mean())
+        ,_format_number(None if (None == float_variance) else math.sqrt(float_variance))
+        ,(None if (None == float_quantile_list) else _format_value_list(list(map(_format_number, float_quantile_list))))
+        ]
+
+
+def _format_number(value):
+    """ Write an int, or a float with up to 15 significant digits (None stays None).
+    """
+    if (None == value):
+        return None
+    if (int is type(value)):
+        return str(value)
+    return "{:.15g}".format(value)
+
+
+def _format_value_list(value_list):
+    """ Write values as a csv row in one cell (None if there are no values).
+    """
+    if (0 == len(value_list)):
+        return None
+    out_io = io.StringIO()
+    csv.writer(out_io, lineterminator="").writerow(value_list)
+    return out_io.getvalue()
+
+
+def get_pkey_value_list(column_profile_list):
+    """ Get the "pkey" metafield values for finalized column profiles.
+
+        The first column found unique (see ColumnProfile.finalize()) is marked with a "1",
+        skipping float and decimal columns, whose values are more likely to be unique by chance
+        than to identify a row.
+        Every other value is None, and so are all of them if no column qualifies.
+    """
+    pkey_value_list = [None] * len(column_profile_list)
+    column_position = 0
+    for column_profile in column_profile_list:
+        if (column_profile.is_unique
+            and column_profile.data_type_name not in _not_key_type_name_list
+        ):
+            pkey_value_list[column_position] = "1"
+            break
+        column_position += 1
+    return pkey_value_list
+
+
+def read_table_schema(in_csv):
+    """ Read a schema file (in either the canonical or the transposed format) from a csv reader.
+
+        In the canonical format, the header row starts with "name"
+        and each following row holds the metafields of one table column;
+        in the transposed format, the header row starts with an empty cell
+        followed by the table column names,
+        and each following row holds the values of one metafield.
+        Repeated metafield names (e.g. several "example" metafields) are kept.
+        Returns a TableSchema, or None if the schema has no header row or an unknown format.
+    """
+    end_row = None
+    in_header_row = next(in_csv, end_row)
+    if (end_row == in_header_row):
+        return None
+    initial_cell_value = None
+    if (0 < len(in_header_row)):
+        initial_cell_value = in_header_row[0]
+    table_schema = None
+    if (None == initial_cell_value or 0 == len(initial_cell_value)):
+        # transposed format: table columns declared in subsequent columns of schema
+        table_schema = TableSchema(in_header_row[1:])
+        for in_row in in_csv:
+            if (0 < len(in_row)):
+                table_schema.add_metafield(in_row[0], in_row[1:])
+    elif ("name" == initial_cell_value):
+        # canonical format: table columns declared per row of schema
+        in_row_list = [in_row for in_row in in_csv if (0 < len(in_row))]
+        table_schema = TableSchema([in_row[0] for in_row in in_row_list])
+        metafield_position = 1
+        for metafield_name in in_header_row[1:]:
+            table_schema.add_metafield(metafield_name, [
+                (in_row[metafield_position] if (metafield_position < len(in_row)) else None)
+                for in_row in in_row_list
+                ])
+            metafield_position += 1
+    return table_schema
@@ -0,0 +1,245 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Time formats: the date and time formats that csv-mkmeta recognizes in "time" columns,
+## named by format strings for the "format" metafield (e.g. "YYYY-MM-DD").
+## Each format is one regular expression that also checks the ranges of months, days, hours, etc.,
+## so a cell is checked against a format with a single fullmatch() (and no strptime()).
+## A TimeFormatSet holds the formats that every cell of a column agreed with so far,
+## and drops a format for good at the first cell that doesn't agree with it.
+## A cell is first matched against one alternation of the remaining formats (in order of preference),
+## so a cell that is not a time drops them all with one fullmatch(),
+## and the formats before the alternative that matched are dropped without matching them again.
+
+import re
+
+_year_pattern = r"\d{4}"
+_month_pattern = r"(?:0[1-9]|1[0-2])"
+_day_pattern = r"(?:0[1-9]|[12]\d|3[01])"
+# month and day numbers of US and European dates may leave out the leading zero
+_short_month_pattern = r"(?:0?[1-9]|1[0-2])"
+_short_day_pattern = r"(?:0?[1-9]|[12]\d|3[01])"
+_hour_pattern = r"(?:[01]\d|2[0-3])"
+_minute_pattern = r"[0-5]\d"
+# seconds may have a fraction (and a leap second is 60)
+_second_pattern = r"(?:[0-5]\d|60)(?:[.,]\d+)?"
+_zone_pattern = r"(?:Z|[-+](?:[01]\d|2[0-3]):?[0-5]\d)"
+_clock_pattern = _hour_pattern + ":" + _minute_pattern + ":" + _second_pattern
+_iso_date_pattern = _year_pattern + "-" + _month_pattern + "-" + _day_pattern
+_us_date_pattern = _short_month_pattern + "/" + _short_day_pattern + "/" + _year_pattern
+_eu_date_pattern = _short_day_pattern + "/" + _short_month_pattern + "/" + _year_pattern
+
+
+# words of column names that hold times (e.g. "created_at", "EventTime", "ts")
+_time_column_name_word_set = frozenset((
+     "time"
+    ,"timestamp"
+    ,"date"
+    ,"datetime"
+    ,"epoch"
+    ,"ts"
+    ,"at"
+    ,"when"
+    ,"created"
+    ,"updated"
+    ,"modified"
+    ,"deleted"
+    ,"expires"
+    ,"unix"
+    ))
+# words of a column name: runs of lower case letters (after one upper case letter), upper case letters, or digits
+_column_name_word_regex = re.compile(r"[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+")
+
+
+def is_time_column_name(column_name):
+    """ Decide whether a column name has a word that names a time (e.g. "created_at", "EventTime").
+    """
+    if (None == column_name):
+        return False
+    for column_name_word in _column_name_word_regex.findall(column_name):
+        if (column_name_word.lower() in _time_column_name_word_set):
+            return True
+    return False
+
+
+class TimeFormat(object):
+    """ A time format: its format string and the regular expression of the cell values it allows.
+
+        is_number is True if the values are also numbers (e.g. "20180105"),
+        and False if they have separators that no number has (e.g. "2018-01-05").
+        needs_time_column_name is True if the values are too much like other numbers
+        for the format to be detected in a column without a time-like name (see is_time_column_name()).
+    """
+    __slots__ = (
+         "format_name"
+        ,"cell_regex"
+        ,"is_number"
+        ,"needs_time_column_name"
+        )
+
+    def __init__(self, format_name, cell_regex_pattern, is_number=False, needs_time_column_name=False):
+        self.format_name = format_name
+        self.cell_regex = re.compile(cell_regex_pattern)
+        self.is_number = is_number
+        self.needs_time_column_name = needs_time_column_name
+
+    def __repr__(self):
+        return "TimeFormat({!r})".format(self.format_name)
+
+
+# formats in order of preference, for columns that agree with more than one
+#  (e.g. "01/02/2018" is taken as a US date)
+time_format_list = (
+     TimeFormat("YYYY-MM-DD", _iso_date_pattern)
+    ,TimeFormat("YYYY-MM-DD hh:mm:ss", _iso_date_pattern + " " + _clock_pattern)
+    ,TimeFormat("YYYY-MM-DD hh:mm", _iso_date_pattern + " " + _hour_pattern + ":" + _minute_pattern)
+    ,TimeFormat("YYYY-MM-DDThh:mm:ss", _iso_date_pattern + "T" + _clock_pattern)
+    ,TimeFormat("YYYY-MM-DDThh:mm:ssZ", _iso_date_pattern + "T" + _clock_pattern + _zone_pattern)
+    ,TimeFormat("YYYYMMDD", _year_pattern + _month_pattern + _day_pattern, True)
+    ,TimeFormat("YYYYMMDDhhmmss", _year_pattern + _month_pattern + _day_pattern + _hour_pattern + _minute_pattern + r"[0-5]\d", True)
+    ,TimeFormat("MM/DD/YYYY", _us_date_pattern)
+    ,TimeFormat("MM/DD/YYYY hh:mm:ss", _us_date_pattern + " " + _clock_pattern)
+    ,TimeFormat("DD/MM/YYYY", _eu_date_pattern)
+    ,TimeFormat("DD/MM/YYYY hh:mm:ss", _eu_date_pattern + " " + _clock_pattern)
+    ,TimeFormat("DD.MM.YYYY", _short_day_pattern + r"\." + _short_month_pattern + r"\." + _year_pattern)
+    ,TimeFormat("hh:mm:ss", _clock_pattern)
+    # seconds since 1970-01-01 UTC, limited to 2001-09-09 through 2033-05-18,
+    #  and only in columns with time-like names, so that 10-digit IDs and phone numbers don't look like times
+    ,TimeFormat("epoch seconds", r"1\d{9}(?:\.\d+)?", True, True)
+    )
+
+_time_format_dict = dict((time_format.format_name, time_format) for time_format in time_format_list)
+
+
+def get_column_time_format_list(column_name):
+    """ Get the time formats that may be detected in a column, in order of preference.
+    """
+    if (is_time_column_name(column_name)):
+        return time_format_list
+    return tuple(
+        time_format
+        for time_format in time_format_list
+        if (not time_format.needs_time_column_name)
+        )
+
+
+# alternation regex of each list of format names that a TimeFormatSet has held
+_time_format_list_regex_dict = dict()
+
+
+def _get_time_format_list_regex(time_format_list):
+    format_name_tuple = tuple(time_format.format_name for time_format in time_format_list)
+    time_format_list_regex = _time_format_list_regex_dict.get(format_name_tuple, None)
+    if (None == time_format_list_regex):
+        # group "f3" is the fourth format of the list
+        time_format_list_regex = re.compile("|".join(
+            "(?P<f{}>{})".format(time_format_position, time_format.cell_regex.pattern)
+            for (time_format_position, time_format) in enumerate(time_format_list)
+            ))
+        _time_format_list_regex_dict[format_name_tuple] = time_format_list_regex
+    return time_format_list_regex
+
+
+def get_time_format(format_name):
+    """ Get the TimeFormat named by a format string, or None if it isn't known.
+    """
+    if (None == format_name):
+        return None
+    return _time_format_dict.get(format_name.strip(), None)
+
+
+class TimeFormatSet(object):
+    """ The time formats that every cell value of a column seen so far agrees with.
+
+        update() checks a cell value against the remaining formats only,
+        so once the values have ruled out all but one format, each cell costs one regular expression match;
+        before that, it matches the alternation of the remaining formats first (see the module comment).
+        Merging two sets keeps the formats that are in both.
+        has_number_format is False once the remaining formats have no number format,
+        so that a value that agrees with them is known not to be a number.
+    """
+    __slots__ = (
+         "time_format_list"
+        ,"time_format_list_regex"
+        ,"has_number_format"
+        )
+
+    def __init__(self, time_format_list=time_format_list):
+        self._set_time_format_list(list(time_format_list))
+
+    def _set_time_format_list(self, time_format_list):
+        self.time_format_list = time_format_list
+        self.time_format_list_regex = None
+        if (1 < len(time_format_list)):
+            self.time_format_list_regex = _get_time_format_list_regex(time_format_list)
+        self.has_number_format = any(time_format.is_number for time_format in time_format_list)
+
+    def update(self, cell_value):
+        """ Drop the formats that a (not empty) cell value doesn't agree with.
+
+            cell_value may also be a bytes object (time formats are all ASCII).
+            Returns False if no format is left.
+        """
+        if (bytes is type(cell_value)):
+            cell_value = cell_value.decode("latin_1")
+        time_format_list = self.time_format_list
+        if (1 == len(time_format_list)):
+            return (None != time_format_list[0].cell_regex.fullmatch(cell_value))
+        if (0 == len(time_format_list)):
+            return False
+        cell_match = self.time_format_list_regex.fullmatch(cell_value)
+        if (None == cell_match):
+            self._set_time_format_list(list())
+            return False
+        # the formats before the first one that matched didn't match
+        time_format_position = int(cell_match.lastgroup[1:])
+        matched_time_format_list = [time_format_list[time_format_position]]
+        for time_format in time_format_list[time_format_position + 1:]:
+            if (None != time_format.cell_regex.fullmatch(cell_value)):
+                matched_time_format_list.append(time_format)
+        if (len(matched_time_format_list) < len(time_format_list)):
+            self._set_time_format_list(matched_time_format_list)
+        return True
+
+    def update_values(self, cell_value_list):
+        """ Drop the formats that any of a list of (not empty, str) cell values doesn't agree with.
+
+            Returns False if no format is left.
+        """
+        self._set_time_format_list([
+            time_format
+            for time_format in self.time_format_list
+            if (None not in map(time_format.cell_regex.fullmatch, cell_value_list))
+            ])
+        return (0 < len(self.time_format_list))
+
+    def merge(self, other):
+        # by name, since the other set may have been unpickled from a worker process
+        other_format_name_set = set(time_format.format_name for time_format in other.time_format_list)
+        self._set_time_format_list([
+            time_format
+            for time_format in self.time_format_list
+            if (time_format.format_name in other_format_name_set)
+            ])
+        return self
+
+    def get_time_format(self):
+        """ Get the preferred remaining TimeFormat, or None if there is none.
+        """
+        if (0 == len(self.time_format_list)):
+            return None
+        return self.time_format_list[0]
+
+    def __str__(self):
+        # saved in partial-profile files
+        return "|".join(time_format.format_name for time_format in self.time_format_list)
+
+
+def parse_time_format_set(s):
+    """ Read a TimeFormatSet saved with str() (format names that are not known are left out).
+    """
+    return TimeFormatSet(
+        time_format
+        for time_format in map(get_time_format, s.split("|"))
+        if (None != time_format)
+        )
@@ -0,0 +1,254 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Typed rows: converting the cells of a table to python values using the column types of its schema.
+## Each column gets one converter function, chosen once from its "type" metafield,
+## so converting a row never has to look at the type names again.
+
+import array
+import csv
+import decimal
+import io
+import os
+
+from ._csv_helpers import (
+    decode_delimiter_name
+    ,decode_charset_name
+    ,decode_newline
+    )
+from .charset_detection import (
+    charset_name_auto
+    ,resolve_file_charset_name
+    )
+from .dialect_detection import (
+    dialect_name_auto
+    ,resolve_file_dialect
+    )
+from .compressed_input import (
+    open_table_file
+    ,strip_compressed_file_ext
+    )
+from .table_schema import read_table_schema
+
+_bool_value_dict = {
+     "true": True
+    ,"t": True
+    ,"yes": True
+    ,"y": True
+    ,"1": True
+    ,"false": False
+    ,"f": False
+    ,"no": False
+    ,"n": False
+    ,"0": False
+    }
+
+
+def as_bool(s):
+    """ Convert a boolean cell value (e.g. "true", "N", "0") to a bool.
+    """
+    try:
+        return _bool_value_dict[s.strip().lower()]
+    except KeyError:
+        raise ValueError("invalid boolean value: {!r}".format(s))
+
+
+def as_decimal(s):
+    try:
+        return decimal.Decimal(s)
+    except decimal.InvalidOperation:
+        raise ValueError("invalid decimal value: {!r}".format(s))
+
+
+# converter function of each column type name; other types are left as strings
+column_type_converter_dict = {
+     "int": int
+    ,"integer": int
+    ,"decimal": as_decimal
+    ,"numeric": as_decimal
+    ,"float": float
+    ,"real": float
+    ,"bool": as_bool
+    ,"boolean": as_bool
+    }
+
+# array.array typecode of each converter, for columnar output
+_converter_typecode_dict = {
+     int: 'q'
+    ,float: 'd'
+    }
+
+
+def get_column_converter_tuple(table_schema, column_name_list=None):
+    """ Get a tuple of converter functions, one per column.
+
+        column_name_list is the header row of the table;
+        columns are matched to the schema by name,
+        and columns that are not in the schema are left as strings.
+        If column_name_list is None, the columns of the schema are used.
+    """
+    if (None == column_name_list):
+        column_name_list = table_schema.column_name_list
+    converter_list = list()
+    for column_name in column_name_list:
+        column_type_name = table_schema.get_metafield_value(column_name, "type")
+        converter = str
+        if (None != column_type_name):
+            converter = column_type_converter_dict.get(column_type_name.lower(), str)
+        converter_list.append(converter)
+    return tuple(converter_list)
+
+
+def iter_typed_rows(in_csv, converter_tuple, column_name_list):
+    """ Generate the converted data rows of a csv reader (positioned after the header row).
+
+        Empty cells become None,
+        and cells beyond the converters are left out (like cells beyond the header).
+        Raises ValueError (naming the row and column) if a cell can't be converted.
+    """
+    row_number = 1
+    for in_row in in_csv:
+        row_number += 1
+        try:
+            out_row = [
+                (converter(cell_value) if (cell_value) else None)
+                for (converter, cell_value) in zip(converter_tuple, in_row)
+                ]
+        except ValueError as e:
+            raise ValueError("row {}, column {}: {}".format(
+                row_number
+                ,_find_bad_column_name(converter_tuple, column_name_list, in_row)
+                ,e
+                ))
+        yield out_row
+
+
+def _find_bad_column_name(converter_tuple, column_name_list, in_row):
+    for (converter, column_name, cell_value) in zip(converter_tuple, column_name_list, in_row):
+        if (cell_value):
+            try:
+                converter(cell_value)
+            except ValueError:
+                return column_name
+    return None
+
+
+def read_typed_columns(in_csv, converter_tuple, column_name_list):
+    """ Read the converted data rows of a csv reader into one sequence per column.
+
+        Columns of int or float type are array.array buffers
+        ('q' for int, 'd' for float, with NaN for empty float cells);
+        an int column becomes a list if it has an empty cell or a value that doesn't fit in 64 bits,
+        and so does every column of another type.
+        A short row leaves None in the columns it is missing.
+    """
+    column_list = list()
+    for converter in converter_tuple:
+        typecode = _converter_typecode_dict.get(converter, None)
+        if (None == typecode):
+            column_list.append(list())
+        else:
+            column_list.append(array.array(typecode))
+    column_count = len(column_list)
+    nan = float('nan')
+    for out_row in iter_typed_rows(in_csv, converter_tuple, column_name_list):
+        if (len(out_row) < column_count):
+            out_row += [None] * (column_count - len(out_row))
+        column_position = 0
+        for (column, cell_value) in zip(column_list, out_row):
+            try:
+                column.append(cell_value)
+            except TypeError:
+                if ('d' == column.typecode):
+                    column.append(nan)
+                else:
+                    column = column_list[column_position] = column.tolist()
+                    column.append(cell_value)
+            except OverflowError:
+                column = column_list[column_position] = column.tolist()
+                column.append(cell_value)
+            column_position += 1
+    return column_list
+
+
+def read_typed_table(
+    table_file_name
+    ,schema_file_name=None
+    ,charset_name=charset_name_auto
+    ,charset_error_mode='strict'
+    ,newline=dialect_name_auto
+    ,delimiter=dialect_name_auto
+    ,as_columns=False
+    ,quote_symbol=None
+    ):
+    """ Read a table file and convert its cells with the types of its .schema.csv file.
+
+        schema_file_name defaults to the .schema.csv file next to the table file
+        (named without the extension of a compressed table file, like csv-mkmeta names it).
+        charset_name, newline and delimiter accept the same names as the csv-mkmeta options,
+        and like them default to 'auto' (see profile());
+        quote_symbol None is the quote detected along with the delimiter (or '"').
+        The schema file is read with the charset of the table file,
+        and with its own delimiter, quote and newline (as csv-mkmeta writes it with its output options).
+        Returns a tuple (column_name_list, typed_rows),
+        where typed_rows is a list of converted rows,
+        or a list of columns if as_columns is True (see read_typed_columns()).
+    """
+    charset_name = resolve_file_charset_name(
+        table_file_name
+        ,decode_charset_name(charset_name)
+        ,charset_error_mode
+        )
+    (delimiter, detected_quote_symbol, newline) = resolve_file_dialect(
+        table_file_name
+        ,charset_name
+        ,decode_delimiter_name(delimiter)
+        ,decode_newline(newline)
+        )
+    if (None == quote_symbol):
+        quote_symbol = detected_quote_symbol
+    if (None == schema_file_name):
+        (table_base_name, table_file_ext) = os.path.splitext(strip_compressed_file_ext(table_file_name))
+        schema_file_name = table_base_name + ".schema.csv"
+    (schema_delimiter, schema_quote_symbol, schema_newline) = resolve_file_dialect(
+        schema_file_name
+        ,charset_name
+        ,dialect_name_auto
+        ,dialect_name_auto
+        )
+    with io.open(
+         schema_file_name
+        ,mode='rt'
+        ,encoding=charset_name
+        ,newline=''  # don't translate newline chars
+        ,errors=charset_error_mode
+    ) as in_file:
+        table_schema = read_table_schema(csv.reader(
+             in_file
+            ,delimiter=schema_delimiter
+            ,lineterminator=schema_newline
+            ,quotechar=schema_quote_symbol
+            ))
+    if (None == table_schema):
+        raise ValueError("{}: not a schema file".format(schema_file_name))
+    with io.TextIOWrapper(
+         open_table_file(table_file_name)
+        ,encoding=charset_name
+        ,newline=''  # don't translate newline chars
+        ,errors=charset_error_mode
+    ) as in_file:
+        in_csv = csv.reader(
+             in_file
+            ,delimiter=delimiter
+            ,lineterminator=newline
+            ,quotechar=quote_symbol
+            )
+        column_name_list = next(in_csv, None)
+        if (None == column_name_list):
+            return (list(), list())
+        converter_tuple = get_column_converter_tuple(table_schema, column_name_list)
+        if (as_columns):
+            typed_rows = read_typed_columns(in_csv, converter_tuple, column_name_list)
+        else:
+            typed_rows = list(iter_typed_rows(in_csv, converter_tuple, column_name_list))
+    return (column_name_list, typed_rows)
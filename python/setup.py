@@ -19,8 +19,9 @@ setup(
         ,'Environment :: Console'
         ,'License :: OSI Approved :: MIT License'
         ,'Programming Language :: Python'
-        ,'Programming Language :: Python :: 3.5'
+        ,'Programming Language :: Python :: 3.7'
         ]
+    ,python_requires = '>=3.7'
     ,packages = [ 
         'csv_metadata' 
         ]
@@ -28,6 +29,7 @@ setup(
         'console_scripts': [
              'csv-mkmeta = csv_metadata.csv_mkmeta:console_main'
             ,'csv-meta2csvt = csv_metadata.csv_meta2csvt:console_main'
+            ,'csv-metacheck = csv_metadata.csv_metacheck:console_main'
             ]
         }
     ,long_description = '''
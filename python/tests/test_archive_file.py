@@ -0,0 +1,95 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that csv-mkmeta --format archive writes archives whose data rows read back as the table rows,
+## with the output row terminator, and that batch mode treats archives as outputs, not tables.
+
+import csv
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from csv_metadata import csv_mkmeta
+from csv_metadata.archive_file import read_archive
+
+# the quoted cells have newlines that are part of the cell values
+table_row_list = [
+     ["id", "text", "v"]
+    ,["1", "plain", "10"]
+    ,["2", "line\nnext", "20"]
+    ,["3", "crlf\r\nnext", "30"]
+    ,["4", "", "40"]
+    ]
+
+
+def _get_csv_bytes(row_list, row_terminator, first_cell_list=()):
+    out_io = io.StringIO(newline='')
+    out_csv = csv.writer(out_io, lineterminator=row_terminator)
+    for in_row in row_list:
+        out_csv.writerow(list(first_cell_list) + in_row)
+    return out_io.getvalue().encode("utf_8")
+
+
+class ArchiveFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+        self.archive_file_name = os.path.join(self.dir_name, "t.archive.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _write_table_file(self, row_terminator):
+        with io.open(self.table_file_name, mode='wb') as out_file:
+            out_file.write(_get_csv_bytes(table_row_list, row_terminator))
+
+    def _run_mkmeta(self, *arg_list):
+        err_io = io.StringIO()
+        csv_mkmeta.main(["csv-mkmeta", "--format", "archive"] + list(arg_list), io.StringIO(), io.StringIO(), err_io)
+        return err_io.getvalue()
+
+    def _read_archive_bytes(self):
+        with io.open(self.archive_file_name, mode='rb') as in_file:
+            return in_file.read()
+
+    def _assert_archive_rows(self, row_terminator):
+        archive_bytes = self._read_archive_bytes()
+        # the data rows are at the end of the archive, each after an empty cell
+        self.assertTrue(archive_bytes.endswith(_get_csv_bytes(table_row_list[1:], row_terminator, [None])))
+        with io.open(self.archive_file_name, mode='rt', encoding="utf_8", newline='') as in_file:
+            (table_meta_row_list, table_schema, data_row_iter) = read_archive(csv.reader(in_file))
+            self.assertEqual(table_row_list[0], table_schema.column_name_list)
+            self.assertEqual(table_row_list[1:], list(data_row_iter))
+
+    def test_crlf_table_lf_archive(self):
+        self._write_table_file("\r\n")
+        self.assertEqual("", self._run_mkmeta("-q", self.table_file_name))
+        self._assert_archive_rows("\n")
+
+    def test_lf_table_crlf_archive(self):
+        self._write_table_file("\n")
+        self.assertEqual("", self._run_mkmeta("-q", "-w", "crlf", self.table_file_name))
+        self._assert_archive_rows("\r\n")
+
+    def test_batch_skips_archives(self):
+        self._write_table_file("\n")
+        self.assertIn("Analyzed 1 files, skipped 0", self._run_mkmeta(self.dir_name))
+        self._assert_archive_rows("\n")
+        # the archive is up to date, and is not a table of its own
+        self.assertIn("Analyzed 0 files, skipped 1", self._run_mkmeta(self.dir_name))
+        self.assertEqual(
+            ["t.archive.csv", "t.csv"]
+            ,sorted(os.listdir(self.dir_name))
+            )
+        # a newer table is archived again
+        table_mtime = time.time() + 10
+        os.utime(self.table_file_name, (table_mtime, table_mtime))
+        self.assertIn("Analyzed 1 files, skipped 0", self._run_mkmeta(self.dir_name))
+
+
+if __name__ == "__main__":
+    unittest.main()
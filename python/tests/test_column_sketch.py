@@ -0,0 +1,175 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that the column sketches stay within their error bounds,
+## give the same answers after merging (as parallel workers merge them) and after saving and reading them back,
+## and that profile(sketch=True) gets the same estimates with one job or two.
+
+import collections
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import profile
+from csv_metadata.column_sketch import (
+    DistinctSketch
+    ,QuantileSketch
+    ,SmallValueSet
+    ,TopValueSketch
+    ,parse_distinct_sketch
+    ,parse_quantile_sketch
+    ,parse_small_value_set
+    ,parse_top_value_sketch
+    )
+
+
+def _get_value_list(value_start, value_count):
+    return ["v{}".format(value_position) for value_position in range(value_start, value_start + value_count)]
+
+
+class DistinctSketchTest(unittest.TestCase):
+
+    def _get_sketch(self, value_list):
+        distinct_sketch = DistinctSketch()
+        distinct_sketch.update_values(value_list)
+        return distinct_sketch
+
+    def test_estimate(self):
+        for value_count in (10, 1000, 100000):
+            distinct_count = self._get_sketch(_get_value_list(0, value_count)).get_distinct_count()
+            self.assertLess(abs(distinct_count - value_count), 0.05 * value_count + 1, value_count)
+        # repeats don't count
+        self.assertEqual(
+            self._get_sketch(_get_value_list(0, 5000)).get_distinct_count()
+            ,self._get_sketch(_get_value_list(0, 5000) * 3).get_distinct_count()
+            )
+
+    def test_merge(self):
+        # the halves overlap, like the values of two chunks of rows
+        distinct_sketch = self._get_sketch(_get_value_list(0, 30000))
+        distinct_sketch.merge(self._get_sketch(_get_value_list(20000, 30000)))
+        self.assertEqual(
+            self._get_sketch(_get_value_list(0, 50000)).register_array
+            ,distinct_sketch.register_array
+            )
+        parsed_sketch = parse_distinct_sketch(str(distinct_sketch))
+        self.assertEqual(distinct_sketch.register_array, parsed_sketch.register_array)
+
+
+class TopValueSketchTest(unittest.TestCase):
+
+    def _get_value_list(self):
+        # a few frequent values among many values seen once
+        value_list = _get_value_list(0, 20000) + ["a"] * 3000 + ["b"] * 2000 + ["c"] * 1000
+        random.Random(7).shuffle(value_list)
+        return value_list
+
+    def _get_sketch(self, value_list, block_value_count=4096):
+        top_value_sketch = TopValueSketch()
+        for value_position in range(0, len(value_list), block_value_count):
+            top_value_sketch.update_counts(collections.Counter(value_list[value_position:value_position + block_value_count]))
+        return top_value_sketch
+
+    def _assert_top_values(self, top_value_sketch, value_list):
+        value_count_dict = collections.Counter(value_list)
+        top_value_count_list = top_value_sketch.get_top_value_count_list(3)
+        self.assertEqual(["a", "b", "c"], [value for (value, value_count) in top_value_count_list])
+        for (value, value_count) in top_value_count_list:
+            # counts are lower bounds, off by at most error_count
+            self.assertLessEqual(value_count, value_count_dict[value])
+            self.assertLessEqual(value_count_dict[value], value_count + top_value_sketch.error_count)
+
+    def test_heavy_hitters(self):
+        value_list = self._get_value_list()
+        self._assert_top_values(self._get_sketch(value_list), value_list)
+
+    def test_merge(self):
+        value_list = self._get_value_list()
+        top_value_sketch = self._get_sketch(value_list[:len(value_list) // 3])
+        top_value_sketch.merge(parse_top_value_sketch(str(self._get_sketch(value_list[len(value_list) // 3:]))))
+        self._assert_top_values(top_value_sketch, value_list)
+
+
+class QuantileSketchTest(unittest.TestCase):
+
+    def _assert_quantiles(self, quantile_sketch, value_count):
+        self.assertEqual(value_count, quantile_sketch.get_value_count())
+        # the values are 0 .. value_count-1, so a quantile is its own rank
+        for (fraction, quantile) in zip((0.1, 0.5, 0.9), quantile_sketch.get_quantile_list((0.1, 0.5, 0.9))):
+            self.assertLess(abs(quantile - fraction * value_count), 0.02 * value_count, fraction)
+
+    def test_quantiles(self):
+        value_list = [float(value) for value in range(100000)]
+        random.Random(3).shuffle(value_list)
+        quantile_sketch = QuantileSketch()
+        for value_position in range(0, len(value_list), 4096):
+            quantile_sketch.update_values(value_list[value_position:value_position + 4096])
+        self._assert_quantiles(quantile_sketch, len(value_list))
+        self.assertIsNone(QuantileSketch().get_quantile_list((0.5,)))
+
+    def test_merge(self):
+        value_list = [float(value) for value in range(60000)]
+        random.Random(5).shuffle(value_list)
+        quantile_sketch_list = list()
+        for value_position in range(0, len(value_list), 20000):
+            quantile_sketch = QuantileSketch()
+            quantile_sketch.update_values(value_list[value_position:value_position + 20000])
+            quantile_sketch_list.append(parse_quantile_sketch(str(quantile_sketch)))
+        merged_quantile_sketch = quantile_sketch_list[0]
+        for quantile_sketch in quantile_sketch_list[1:]:
+            merged_quantile_sketch.merge(quantile_sketch)
+        self._assert_quantiles(merged_quantile_sketch, len(value_list))
+
+
+class SmallValueSetTest(unittest.TestCase):
+
+    def test_overflow(self):
+        small_value_set = SmallValueSet(3)
+        self.assertTrue(small_value_set.add("x"))
+        # the bytes and str forms of an ASCII value are one value
+        self.assertTrue(small_value_set.add(b"x", 2))
+        self.assertTrue(small_value_set.add("y"))
+        self.assertTrue(small_value_set.add("é"))
+        self.assertEqual({"x": 3, "y": 1, "é": 1}, small_value_set.get_value_count_dict())
+        self.assertEqual(
+            small_value_set.get_value_count_dict()
+            ,parse_small_value_set(str(small_value_set)).get_value_count_dict()
+            )
+        self.assertFalse(small_value_set.add("z"))
+
+
+class ProfileSketchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def test_sketch_statistics(self):
+        value_random = random.Random(9)
+        with io.open(self.table_file_name, mode='wt', newline='') as out_file:
+            out_file.write("id,code,n\n")
+            for row_position in range(20000):
+                out_file.write("{},{},{}\n".format(
+                    row_position
+                    ,("A0" if (1 == row_position % 2) else value_random.choice("AB") + str(row_position // 2 % 50))
+                    ,value_random.uniform(0, 1000)
+                    ))
+        for job_count in (1, 2):
+            table_schema = profile(self.table_file_name, sketch=True, jobs=job_count)
+            (id_profile, code_profile, n_profile) = table_schema.table_profile.column_profile_list
+            self.assertLess(abs(id_profile.get_distinct_count() - 20000), 1000)
+            self.assertLess(abs(code_profile.get_distinct_count() - 100), 10)
+            # "A0" is in more than half of the rows, and the other 99 codes in about 100 rows each
+            self.assertEqual(["A0"], [value for (value, value_count) in code_profile.get_top_value_count_list(5, 2)])
+            median = n_profile.get_float_quantile_list((0.5,))[0]
+            self.assertLess(abs(median - 500), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that compressed table files are recognized by their magic bytes, read back whole
+## (through the background reader), described like the same table uncompressed,
+## and reported as errors when their data is damaged.
+
+import bz2
+import gzip
+import io
+import lzma
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import csv_mkmeta
+from csv_metadata.compressed_input import (
+    CompressedFileError
+    ,background_chunk_byte_count
+    ,detect_file_compression_name
+    ,open_table_file
+    ,strip_compressed_file_ext
+    )
+
+_compress_dict = {
+     "gzip": (".gz", gzip.compress)
+    ,"bz2": (".bz2", bz2.compress)
+    ,"xz": (".xz", lzma.compress)
+    }
+
+
+def _get_table_bytes(row_count):
+    out_io = io.StringIO(newline='')
+    out_io.write("id,name,n\n")
+    for row_position in range(row_count):
+        out_io.write("{},\"name, {}\",{}\n".format(row_position, row_position % 97, row_position * 0.5))
+    return out_io.getvalue().encode("utf_8")
+
+
+class CompressedInputTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _write_file(self, file_name, file_bytes):
+        file_name = os.path.join(self.dir_name, file_name)
+        with io.open(file_name, mode='wb') as out_file:
+            out_file.write(file_bytes)
+        return file_name
+
+    def _read_file(self, file_name):
+        with io.open(os.path.join(self.dir_name, file_name), mode='rb') as in_file:
+            return in_file.read()
+
+    def _run_mkmeta(self, *arg_list):
+        err_io = io.StringIO()
+        csv_mkmeta.main(["csv-mkmeta", "-q", "-f"] + list(arg_list), io.StringIO(), io.StringIO(), err_io)
+        return err_io.getvalue()
+
+    def test_detect(self):
+        table_bytes = _get_table_bytes(10)
+        self.assertIsNone(detect_file_compression_name(self._write_file("t.csv", table_bytes)))
+        for (compression_name, (file_ext, compress)) in _compress_dict.items():
+            # the name doesn't matter, only the magic bytes
+            self.assertEqual(
+                compression_name
+                ,detect_file_compression_name(self._write_file("t.csv", compress(table_bytes)))
+                )
+        self.assertEqual("x.csv", strip_compressed_file_ext("x.csv.gz"))
+        self.assertEqual("x.csv", strip_compressed_file_ext("x.csv"))
+
+    def test_read_whole(self):
+        # several chunks of the background reader
+        table_bytes = _get_table_bytes(40000)
+        self.assertLess(3 * background_chunk_byte_count, len(table_bytes))
+        for (compression_name, (file_ext, compress)) in _compress_dict.items():
+            table_file_name = self._write_file("t.csv" + file_ext, compress(table_bytes))
+            with open_table_file(table_file_name) as in_file:
+                self.assertEqual(table_bytes, in_file.read(), compression_name)
+            # closing before the end stops the background thread
+            with open_table_file(table_file_name) as in_file:
+                self.assertEqual(table_bytes[:10], in_file.read(10))
+
+    def test_same_metadata(self):
+        table_bytes = _get_table_bytes(5000)
+        self.assertEqual("", self._run_mkmeta(self._write_file("t.csv", table_bytes)))
+        meta_bytes_list = [self._read_file("t.schema.csv"), self._read_file("t.meta.csv")]
+        os.remove(os.path.join(self.dir_name, "t.csv"))
+        for (compression_name, (file_ext, compress)) in _compress_dict.items():
+            table_file_name = self._write_file("t.csv" + file_ext, compress(table_bytes))
+            # (-j doesn't apply, and is ignored)
+            self.assertEqual("", self._run_mkmeta("-j", "2", table_file_name))
+            self.assertEqual(
+                meta_bytes_list
+                ,[self._read_file("t.schema.csv"), self._read_file("t.meta.csv")]
+                ,compression_name
+                )
+            os.remove(table_file_name)
+
+    def test_damaged(self):
+        compressed_bytes = gzip.compress(_get_table_bytes(40000))
+        table_file_name = self._write_file("t.csv.gz", compressed_bytes[:len(compressed_bytes) // 2])
+        with open_table_file(table_file_name) as in_file:
+            self.assertRaises(CompressedFileError, in_file.read)
+        self.assertIn("cannot decompress gzip data", self._run_mkmeta(table_file_name))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that the delimiter, quote, newline and charset of a table file are detected from a sample,
+## also when quoted cells hold the other candidate delimiters,
+## and that profile() detects them like csv-mkmeta does.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import (
+    csv_mkmeta
+    ,profile
+    )
+from csv_metadata.charset_detection import resolve_file_charset_name
+from csv_metadata.dialect_detection import (
+    detect_delimiter
+    ,resolve_file_dialect
+    )
+
+
+def _get_table_text(delimiter, text_value, row_count=50, newline="\n", quote_symbol='"'):
+    row_list = [delimiter.join(["id", "text", "v"])]
+    for row_position in range(row_count):
+        row_list.append(delimiter.join([
+            str(row_position)
+            ,quote_symbol + text_value + quote_symbol
+            ,str(row_position % 10)
+            ]))
+    return newline.join(row_list) + newline
+
+
+class DetectDelimiterTest(unittest.TestCase):
+
+    def test_quoted_other_delimiters(self):
+        # the quoted cells would split into more cells on ';' or '|' than the rows do on ','
+        self.assertEqual(",", detect_delimiter(_get_table_text(",", "a;b;c;d;e")))
+        self.assertEqual(",", detect_delimiter(_get_table_text(",", "a|b|c|d;e;f")))
+        self.assertEqual(";", detect_delimiter(_get_table_text(";", "a,b,c,d,e")))
+        self.assertEqual("\t", detect_delimiter(_get_table_text("\t", "a, b; c|d")))
+
+    def test_header_agrees(self):
+        # the data rows split on ';' into 2 cells, but the header has one
+        sample_text = "id,v\n" + "".join("{};{},{}\n".format(i, i, i) for i in range(50))
+        self.assertEqual(",", detect_delimiter(sample_text))
+
+    def test_single_column(self):
+        self.assertEqual(",", detect_delimiter("id\n1\n2\n"))
+
+    def test_quote_symbol(self):
+        self.assertEqual(";", detect_delimiter(_get_table_text(";", "a,b,c,d", quote_symbol="'"), "'"))
+
+
+class TableFileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _write_table_file(self, table_text, charset_name="utf_8"):
+        with io.open(self.table_file_name, mode='wt', encoding=charset_name, newline='') as out_file:
+            out_file.write(table_text)
+
+    def _get_type_list(self, **option_dict):
+        table_schema = profile(self.table_file_name, **option_dict)
+        return [
+            (column_profile.column_name, column_profile.data_type_name)
+            for column_profile in table_schema.table_profile.column_profile_list
+            ]
+
+    def test_resolve_dialect(self):
+        self._write_table_file(_get_table_text("|", "a,b;c", newline="\r\n"))
+        self.assertEqual(
+            ("|", '"', "\r\n")
+            ,resolve_file_dialect(self.table_file_name, "utf_8", "auto", "auto")
+            )
+        self._write_table_file(_get_table_text(";", "a,b,c", quote_symbol="'"))
+        self.assertEqual(
+            (";", "'", "\n")
+            ,resolve_file_dialect(self.table_file_name, "utf_8", "auto", "auto")
+            )
+        # given values are kept
+        self.assertEqual(
+            (",", '"', "\n")
+            ,resolve_file_dialect(self.table_file_name, "utf_8", ",", "\n")
+            )
+
+    def test_resolve_charset(self):
+        self._write_table_file(_get_table_text(",", "café"), "utf_8")
+        self.assertIn(resolve_file_charset_name(self.table_file_name, "auto"), ("utf_8", "utf_8_sig"))
+        self._write_table_file(_get_table_text(",", "café"), "cp1252")
+        self.assertEqual("cp1252", resolve_file_charset_name(self.table_file_name, "auto"))
+        self._write_table_file(_get_table_text(",", "café"), "utf_16")
+        self.assertEqual("utf_16", resolve_file_charset_name(self.table_file_name, "auto"))
+
+    def test_profile_detects_like_mkmeta(self):
+        self._write_table_file(_get_table_text(";", "café,b,c"), "cp1252")
+        expected_type_list = [("id", "integer"), ("text", "char"), ("v", "integer")]
+        self.assertEqual(expected_type_list, self._get_type_list())
+        self.assertEqual(expected_type_list, self._get_type_list(engine="mmap"))
+
+        err_io = io.StringIO()
+        csv_mkmeta.main(["csv-mkmeta", "-q", self.table_file_name], io.StringIO(), io.StringIO(), err_io)
+        self.assertEqual("", err_io.getvalue())
+        with io.open(os.path.join(self.dir_name, "t.schema.csv"), mode='rt', encoding="cp1252") as in_file:
+            schema_text = in_file.read()
+        for (column_name, data_type_name) in expected_type_list:
+            self.assertIn(column_name, schema_text)
+            self.assertIn(data_type_name, schema_text)
+
+    def test_profile_given_dialect(self):
+        self._write_table_file(_get_table_text(";", "a,b,c"))
+        self.assertEqual([("id;text;v", "varchar")], self._get_type_list(delimiter=",", quote_symbol="'"))
+
+
+if __name__ == "__main__":
+    unittest.main()
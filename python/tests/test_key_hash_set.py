@@ -0,0 +1,95 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that KeyHashSet finds repeated key values once it has spilled them to disk,
+## also after merging sets, and that integer IDs spread over the spill partitions.
+
+import collections
+import os
+import pickle
+import unittest
+
+from csv_metadata.key_hash_set import (
+    KeyHashSet
+    ,get_value_hash
+    )
+
+value_count_max = 1000
+
+
+def _get_id_list(id_start, id_count):
+    return [str(id_value) for id_value in range(id_start, id_start + id_count)]
+
+
+class KeyHashSetTest(unittest.TestCase):
+
+    def _get_spilled_set(self, key_value_list):
+        key_hash_set = KeyHashSet(value_count_max)
+        self.addCleanup(key_hash_set.close)
+        for key_value in key_value_list:
+            self.assertTrue(key_hash_set.add(key_value))
+        return key_hash_set
+
+    def test_partition_spread(self):
+        # short values are packed into their hash, which must still spread them over the partitions
+        for hash_bit_shift in (58, 52):
+            partition_count_dict = collections.Counter(
+                (get_value_hash(key_value) >> hash_bit_shift) & 63
+                for key_value in _get_id_list(0, 64000)
+                )
+            self.assertEqual(64, len(partition_count_dict))
+            self.assertLess(max(partition_count_dict.values()), 2 * 1000)
+
+    def test_short_values_dont_collide(self):
+        key_value_list = _get_id_list(0, 100000) + ["", "a", "ab", "abcdefg", "é"]
+        self.assertEqual(len(key_value_list), len(set(map(get_value_hash, key_value_list))))
+
+    def test_spill_distinct(self):
+        key_hash_set = self._get_spilled_set(_get_id_list(0, 10 * value_count_max))
+        self.assertNotEqual([], key_hash_set._spill_dir_name_list)
+        self.assertFalse(key_hash_set.has_repeated_hash())
+
+    def test_spill_repeated(self):
+        key_hash_set = self._get_spilled_set(_get_id_list(0, 10 * value_count_max))
+        # the first values were spilled, so add() can't see the repeat
+        self.assertTrue(key_hash_set.add("7"))
+        self.assertTrue(key_hash_set.has_repeated_hash())
+
+    def test_split_partition(self):
+        # partitions with more than value_count_max hashes are split by the next bits of the hash
+        key_hash_set = self._get_spilled_set(_get_id_list(0, 100 * value_count_max) + ["12345 "])
+        self.assertFalse(key_hash_set.has_repeated_hash())
+        key_hash_set.add("12345")
+        self.assertTrue(key_hash_set.has_repeated_hash())
+
+    def test_merge(self):
+        key_hash_set = self._get_spilled_set(_get_id_list(0, 5 * value_count_max))
+        other_key_hash_set = self._get_spilled_set(_get_id_list(5 * value_count_max, 5 * value_count_max))
+        spill_dir_name_list = list(other_key_hash_set._spill_dir_name_list)
+        self.assertTrue(key_hash_set.merge(other_key_hash_set))
+        self.assertEqual([], other_key_hash_set._spill_dir_name_list)
+        self.assertFalse(key_hash_set.has_repeated_hash())
+        # the spill files of the other set now belong to this one
+        other_key_hash_set.close()
+        for spill_dir_name in spill_dir_name_list:
+            self.assertTrue(os.path.isdir(spill_dir_name))
+
+        repeat_key_hash_set = self._get_spilled_set(_get_id_list(9 * value_count_max, 2 * value_count_max))
+        key_hash_set.merge(repeat_key_hash_set)
+        self.assertTrue(key_hash_set.has_repeated_hash())
+        key_hash_set.close()
+        for spill_dir_name in spill_dir_name_list:
+            self.assertFalse(os.path.exists(spill_dir_name))
+
+    def test_pickle(self):
+        key_hash_set = self._get_spilled_set(_get_id_list(0, 3 * value_count_max))
+        copy_key_hash_set = pickle.loads(pickle.dumps(key_hash_set))
+        self.addCleanup(copy_key_hash_set.close)
+        # the copy takes over the spill files
+        key_hash_set.close()
+        copy_key_hash_set.add("1")
+        self.assertTrue(copy_key_hash_set.has_repeated_hash())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that the numpy engine, which classifies blocks of cells with array operations,
+## writes the same metadata as the csv engine, which classifies one cell at a time.
+
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import csv_mkmeta
+from csv_metadata.numpy_profile import is_numpy_available
+
+# values that are only numbers in some spellings, or that look like plain decimals and aren't
+_odd_value_list = (
+    "1e5", " 7", "7 ", "nan", "-inf", "1_000", ".5", "5.", "١٢", "+-1", "1.2.3",
+    "-0", "+0", "007", " ", "abc", "99999999999999999999", "1.0000000000000001", "-3.25",
+    )
+# numbers that are not written as plain decimals
+_odd_number_list = ("1e5", " 7", "nan", "-0", "+0", "1_000", ".5", "١٢", "99999999999999999999", "1.0000000000000001")
+
+
+def _write_table_file(file_name, row_count):
+    value_random = random.Random(11)
+    with io.open(file_name, mode='wt', newline='') as out_file:
+        out_file.write("id,n,d,x,t,c,f,z\n")
+        for row_position in range(row_count):
+            odd_value = ""
+            odd_number = ""
+            if (0 == row_position % 997):
+                odd_value = value_random.choice(_odd_value_list)
+                odd_number = value_random.choice(_odd_number_list)
+            out_file.write("{},{},{},{},{},{},{},{}\n".format(
+                row_position
+                ,value_random.randint(-10**6, 10**6)
+                ,"{:.3f}".format(value_random.uniform(-100, 100))
+                ,odd_value or str(value_random.randint(0, 10**15))
+                ,"w" * value_random.randint(1, 90)
+                ,odd_value or value_random.choice("ABC")
+                ,odd_number or "{:.2f}".format(value_random.uniform(-1, 1))
+                ,"{:05d}".format(value_random.randint(0, 99999))
+                ))
+
+
+@unittest.skipUnless(is_numpy_available(), "NumPy is not installed")
+class NumpyProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+        _write_table_file(self.table_file_name, 100000)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _read_meta_bytes(self, engine_name):
+        err_io = io.StringIO()
+        csv_mkmeta.main(
+            ["csv-mkmeta", "-q", "-f", "--sketch", "--engine", engine_name, self.table_file_name]
+            ,io.StringIO()
+            ,io.StringIO()
+            ,err_io
+            )
+        self.assertEqual("", err_io.getvalue())
+        meta_bytes_list = list()
+        for file_ext in (".schema.csv", ".meta.csv"):
+            with io.open(os.path.join(self.dir_name, "t" + file_ext), mode='rb') as in_file:
+                meta_bytes_list.append(in_file.read())
+        return meta_bytes_list
+
+    def test_same_as_csv_engine(self):
+        self.assertEqual(self._read_meta_bytes("csv"), self._read_meta_bytes("numpy"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that --sample windows start at real rows, also in files with quoted newlines.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import profile
+
+
+def _write_table_file(file_name, plain_row_count, row_count):
+    # rows after the first plain_row_count have quoted cells with newlines and commas,
+    #  so that pieces of them look like rows of three cells
+    with io.open(file_name, mode='wt', newline='') as out_file:
+        out_file.write("id,text,v\n")
+        for row_position in range(row_count):
+            if (row_position < plain_row_count):
+                text_value = "plain {}".format(row_position)
+            else:
+                text_value = '"note {0},a,b\nnote {0},c,d\nend"'.format(row_position)
+            out_file.write("{},{},{}\n".format(row_position, text_value, row_position % 10))
+
+
+# enough rows for the sample to be taken from 64 strata, rather than from the whole file
+row_count = 200000
+
+
+class SampleProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _get_type_list(self, **option_dict):
+        table_schema = profile(self.table_file_name, **option_dict)
+        return [
+            (column_profile.column_name, column_profile.data_type_name)
+            for column_profile in table_schema.table_profile.column_profile_list
+            ]
+
+    def assert_sample_types(self):
+        self.assertEqual(
+            [("id", "integer"), ("text", "varchar"), ("v", "integer")]
+            ,self._get_type_list(sample_rows=500)
+            )
+
+    def test_quoted_newline(self):
+        _write_table_file(self.table_file_name, 0, row_count)
+        self.assert_sample_types()
+
+    def test_quoted_newline_after_head(self):
+        # the head of the file doesn't show the quoted newlines
+        _write_table_file(self.table_file_name, 5000, row_count)
+        self.assert_sample_types()
+
+    def test_plain(self):
+        _write_table_file(self.table_file_name, row_count, row_count)
+        self.assert_sample_types()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that the csv-mkmeta modes that split the table file on raw bytes
+## write the same schema as the csv engine.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import csv_mkmeta
+from csv_metadata.parallel_profile import chunk_byte_count_min
+
+
+def _write_crlf_table_file(file_name):
+    # rows end in CRLF, and every tenth row has a quoted cell with a bare LF in it,
+    #  big enough for -j to split the file into several byte ranges
+    with io.open(file_name, mode='wb') as out_file:
+        out_file.write(b"id,c1,c2\r\n")
+        row_position = 0
+        while (out_file.tell() < 3 * chunk_byte_count_min):
+            if (0 == row_position % 10):
+                text_value = '"line {}\nnext"'.format(row_position)
+            else:
+                text_value = "word{}".format(row_position % 7)
+            out_file.write("{},{},{}\r\n".format(row_position, text_value, row_position % 3).encode("ascii"))
+            row_position += 1
+
+
+class SplitEngineSchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+        _write_crlf_table_file(self.table_file_name)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _read_schema_bytes(self, *arg_list):
+        err_io = io.StringIO()
+        csv_mkmeta.main(
+            ["csv-mkmeta", "-q", "-f"] + list(arg_list) + [self.table_file_name]
+            ,io.StringIO()
+            ,io.StringIO()
+            ,err_io
+            )
+        self.assertEqual("", err_io.getvalue())
+        with io.open(os.path.join(self.dir_name, "t.schema.csv"), mode='rb') as in_file:
+            return in_file.read()
+
+    def test_crlf_quoted_newline(self):
+        schema_bytes = self._read_schema_bytes()
+        self.assertIn(b"c1,varchar,", schema_bytes)
+        self.assertEqual(schema_bytes, self._read_schema_bytes("-j", "2"))
+        self.assertEqual(schema_bytes, self._read_schema_bytes("--engine", "mmap"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that csv-metacheck accepts the table that csv-mkmeta described,
+## reports the cells, keys and header that don't agree with its schema,
+## and reads the table like csv-mkmeta does (detected charset and dialect, compressed files).
+
+import csv
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import (
+    csv_metacheck
+    ,csv_mkmeta
+    )
+from csv_metadata.table_check import (
+    check_table_rows
+    ,get_column_checks
+    )
+from csv_metadata.table_schema import read_table_schema
+
+table_text = (
+    "id;name;n;d\r\n"
+    "1;\"ab;\r\nc\";10;1.5\r\n"
+    "2;café;20;-2.25\r\n"
+    "3;zz;30;\r\n"
+    )
+
+
+class ColumnChecksTest(unittest.TestCase):
+
+    def _get_cell_check(self, column_type_name, column_size):
+        (cell_check, block_check) = get_column_checks(column_type_name, column_size)
+        return cell_check
+
+    def test_cell_checks(self):
+        check_int = self._get_cell_check("integer", "1")
+        self.assertIsNone(check_int("127"))
+        self.assertIsNotNone(check_int("128"))
+        self.assertIsNotNone(check_int("1.5"))
+        check_varchar = self._get_cell_check("varchar", "3")
+        self.assertIsNone(check_varchar("abc"))
+        self.assertIsNotNone(check_varchar("abcd"))
+        check_decimal = self._get_cell_check("decimal", "4,2")
+        self.assertIsNone(check_decimal("-12.25"))
+        self.assertIsNotNone(check_decimal("1.234"))
+
+
+class MetacheckTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _write_file(self, file_name, file_bytes):
+        file_name = os.path.join(self.dir_name, file_name)
+        with io.open(file_name, mode='wb') as out_file:
+            out_file.write(file_bytes)
+        return file_name
+
+    def _run_mkmeta(self, *arg_list):
+        err_io = io.StringIO()
+        csv_mkmeta.main(["csv-mkmeta", "-q"] + list(arg_list), io.StringIO(), io.StringIO(), err_io)
+        self.assertEqual("", err_io.getvalue())
+
+    def _run_metacheck(self, *arg_list):
+        out_io = io.StringIO()
+        err_io = io.StringIO()
+        exit_status = csv_metacheck.main(["csv-metacheck", "-q"] + list(arg_list), None, out_io, err_io)
+        self.assertEqual("", err_io.getvalue())
+        return (exit_status, list(csv.reader(io.StringIO(out_io.getvalue()))))
+
+    def test_agrees(self):
+        # the schema is written with other row terminators than the table
+        table_file_name = self._write_file("t.csv", table_text.encode("cp1252"))
+        self._run_mkmeta("-w", "cr", table_file_name)
+        self.assertEqual((csv_metacheck.exit_status_ok, []), self._run_metacheck(table_file_name))
+
+    def test_compressed(self):
+        table_file_name = self._write_file("t.csv.gz", gzip.compress(table_text.encode("utf_8")))
+        self._run_mkmeta(table_file_name)
+        self.assertEqual((csv_metacheck.exit_status_ok, []), self._run_metacheck(table_file_name))
+
+    def test_violations(self):
+        self._run_mkmeta(self._write_file("t.csv", table_text.encode("utf_8")))
+        other_table_file_name = self._write_file("other.csv", (
+            "id;name;n;d\n"
+            "1;ab;10;1.5\n"
+            "1;toolong;x;1.255\n"
+            ).encode("utf_8"))
+        (exit_status, out_row_list) = self._run_metacheck(
+            "--schema"
+            ,os.path.join(self.dir_name, "t.schema.csv")
+            ,other_table_file_name
+            )
+        self.assertEqual(csv_metacheck.exit_status_violation, exit_status)
+        self.assertEqual(["row", "column", "value", "problem"], out_row_list[0])
+        self.assertEqual(
+            [("3", "d"), ("3", "id"), ("3", "n"), ("3", "name")]
+            ,sorted((out_row[0], out_row[1]) for out_row in out_row_list[1:])
+            )
+
+    def test_header(self):
+        table_schema = read_table_schema(iter([
+             ["name", "type", "size"]
+            ,["id", "integer", "4"]
+            ]))
+        check_result = check_table_rows(iter([["id", "extra"], ["1", "2"]]), table_schema, None, None)
+        self.assertEqual(1, check_result.row_count)
+        self.assertEqual(["extra"], [violation.column_name for violation in check_result.violation_list])
+
+
+if __name__ == "__main__":
+    unittest.main()
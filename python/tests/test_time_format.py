@@ -0,0 +1,80 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that time formats are dropped by the first value that doesn't agree with them,
+## and that 10-digit numbers are only taken as epoch seconds in columns with time-like names.
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import profile
+from csv_metadata.time_format import (
+    TimeFormatSet
+    ,is_time_column_name
+    ,time_format_list
+    )
+
+
+class TimeFormatSetTest(unittest.TestCase):
+
+    def _get_format_name_list(self, cell_value_list):
+        time_format_set = TimeFormatSet(time_format_list)
+        for cell_value in cell_value_list:
+            if (not time_format_set.update(cell_value)):
+                return []
+        return [time_format.format_name for time_format in time_format_set.time_format_list]
+
+    def test_update(self):
+        self.assertEqual(["MM/DD/YYYY", "DD/MM/YYYY"], self._get_format_name_list(["01/02/2018"]))
+        self.assertEqual(["DD/MM/YYYY"], self._get_format_name_list(["01/02/2018", "13/02/2018"]))
+        self.assertEqual(["YYYYMMDD"], self._get_format_name_list(["20180105"]))
+        self.assertEqual(["epoch seconds"], self._get_format_name_list(["1500000000", "1500000000.5"]))
+        self.assertEqual([], self._get_format_name_list(["2018-01-05", "abc", "2018-01-06"]))
+        self.assertEqual([], self._get_format_name_list(["2018-13-01"]))
+
+    def test_update_values(self):
+        time_format_set = TimeFormatSet(time_format_list)
+        self.assertTrue(time_format_set.update_values(["01/02/2018", "1/2/2018", "12/31/2018"]))
+        self.assertEqual("MM/DD/YYYY", time_format_set.get_time_format().format_name)
+        self.assertFalse(time_format_set.update_values(["01/02/2018", "x"]))
+
+    def test_time_column_name(self):
+        for column_name in ("created_at", "createdAt", "EventTime", "ts", "timestamp", "Modified Date"):
+            self.assertTrue(is_time_column_name(column_name), column_name)
+        for column_name in ("id", "user_id", "candidate", "validated", "phone", "Stats"):
+            self.assertFalse(is_time_column_name(column_name), column_name)
+
+
+class ColumnTimeFormatTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+        self.table_file_name = os.path.join(self.dir_name, "t.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def test_epoch_seconds(self):
+        with io.open(self.table_file_name, mode='wt', newline='') as out_file:
+            out_file.write("id,created_at,d\n")
+            for row_position in range(50):
+                out_file.write("{},{},2018-01-{:02d}\n".format(
+                    1500000000 + row_position * 7919
+                    ,1500000000 + row_position * 60
+                    ,row_position % 28 + 1
+                    ))
+        table_schema = profile(self.table_file_name)
+        self.assertEqual(
+            [("id", "integer", None), ("created_at", "time", "epoch seconds"), ("d", "time", "YYYY-MM-DD")]
+            ,[
+                (column_profile.column_name, column_profile.data_type_name, column_profile.data_type_format)
+                for column_profile in table_schema.table_profile.column_profile_list
+                ]
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+##  Copyright (c) 2018 Upstream Research, Inc.  All Rights Reserved.  ##
+##  Subject to an 'MIT' License.  See LICENSE file in top-level directory  ##
+
+## Checks that read_typed_table reads a table like csv-mkmeta does
+## (detected charset and dialect, quoted newlines, compressed files)
+## and converts its cells with the types of the schema that csv-mkmeta wrote.
+
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from csv_metadata import (
+    csv_mkmeta
+    ,read_typed_table
+    )
+
+table_text = (
+    "id;name;price\r\n"
+    "1;\"café; bar\r\nnext\";1.5\r\n"
+    "2;plain;\r\n"
+    "3;'quoted';-2.25\r\n"
+    )
+table_row_list = [
+     [1, "café; bar\r\nnext", 1.5]
+    ,[2, "plain", None]
+    ,[3, "'quoted'", -2.25]
+    ]
+
+
+class TypedRowsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir_name = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name)
+
+    def _write_table_file(self, file_name, table_bytes):
+        table_file_name = os.path.join(self.dir_name, file_name)
+        with io.open(table_file_name, mode='wb') as out_file:
+            out_file.write(table_bytes)
+        err_io = io.StringIO()
+        csv_mkmeta.main(["csv-mkmeta", "-q", table_file_name], io.StringIO(), io.StringIO(), err_io)
+        self.assertEqual("", err_io.getvalue())
+        return table_file_name
+
+    def _assert_typed_table(self, table_file_name, **option_dict):
+        (column_name_list, typed_row_list) = read_typed_table(table_file_name, **option_dict)
+        self.assertEqual(["id", "name", "price"], column_name_list)
+        self.assertEqual(table_row_list, typed_row_list)
+        (column_name_list, typed_column_list) = read_typed_table(table_file_name, as_columns=True, **option_dict)
+        self.assertEqual([1, 2, 3], list(typed_column_list[0]))
+
+    def test_detected_dialect(self):
+        table_file_name = self._write_table_file("t.csv", table_text.encode("cp1252"))
+        self._assert_typed_table(table_file_name)
+        self._assert_typed_table(table_file_name, charset_name="windows-1252", delimiter="semicolon", newline="crlf")
+
+    def test_compressed(self):
+        table_file_name = self._write_table_file("t.csv.gz", gzip.compress(table_text.encode("utf_8")))
+        self.assertTrue(os.path.isfile(os.path.join(self.dir_name, "t.schema.csv")))
+        self._assert_typed_table(table_file_name)
+
+
+if __name__ == "__main__":
+    unittest.main()